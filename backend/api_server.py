@@ -8,20 +8,46 @@ MinerU Tianshu - API Server
 企业级认证授权: JWT Token + API Key + SSO
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Depends, Request, WebSocket
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.websockets import WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 from loguru import logger
 import uvicorn
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
 import os
 import re
+import tarfile
+import time
 import uuid
+import zipfile
 from minio import Minio
 
-from task_db import TaskDB
+from task_queue import AsyncTaskQueue, create_task_queue, encode_cursor, result_cache_key
+from task_events import FINAL_STATUSES, TaskEventBroker
+from task_notifier import TaskNotifier
+from upload_sessions import DEFAULT_CHUNK_SIZE, UploadSessionStore
+from metrics_exporter import (
+    PROMETHEUS_AVAILABLE,
+    UPLOAD_BYTES,
+    UPLOAD_SECONDS,
+    register_queue_collector,
+    render_metrics,
+)
+from result_files import (
+    ResultCache,
+    file_etag,
+    find_result_files,
+    json_fragment,
+    markdown_fragment,
+    read_markdown,
+    render_json,
+)
 
 # 导入认证模块
 from auth import (
@@ -29,9 +55,11 @@ from auth import (
     Permission,
     get_current_active_user,
     require_permission,
+    verify_token,
 )
 from auth.routes import router as auth_router
 from auth.auth_db import AuthDB
+from utils import is_archive, iter_archive_members
 
 # 初始化 FastAPI 应用
 app = FastAPI(
@@ -55,13 +83,214 @@ db_path_env = os.getenv("DATABASE_PATH")
 if db_path_env:
     db_path = str(Path(db_path_env).resolve())
     logger.info(f"📊 API Server using DATABASE_PATH: {db_path_env} -> {db_path}")
-    db = TaskDB(db_path)
+    db = create_task_queue(db_path)
 else:
     logger.warning("⚠️  DATABASE_PATH not set in API Server, using default")
     # 使用与 Worker 一致的默认路径
     db_path = "/app/data/db/mineru_tianshu.db"
-    db = TaskDB(db_path)
+    db = create_task_queue(db_path)
 auth_db = AuthDB()
+register_queue_collector(db)
+
+# 接口中的队列操作在专用线程池中执行（await adb.xxx），SQLite 锁等待不阻塞事件循环
+adb = AsyncTaskQueue(db, max_workers=int(os.getenv("API_DB_THREADS", "8")))
+
+# 任务唤醒通知（创建任务后唤醒空闲 Worker）
+task_notifier = TaskNotifier()
+
+
+def notify_workers():
+    """唤醒空闲 Worker（通知失败不影响请求，Worker 会兜底轮询）"""
+    try:
+        task_notifier.notify()
+    except Exception as e:
+        logger.debug(f"Task notify failed: {e}")
+
+
+# 任务状态推送：每个进程一个后台协程读取任务变更流，分发给 SSE / WebSocket 连接
+task_event_broker = TaskEventBroker(adb, interval=float(os.getenv("TASK_EVENTS_POLL_INTERVAL", "0.5")))
+# 单个连接最多订阅的任务数
+TASK_EVENTS_MAX_IDS = int(os.getenv("TASK_EVENTS_MAX_IDS", "100"))
+# 没有事件时的心跳间隔（秒），保持代理连接并及时发现客户端断开
+TASK_EVENTS_HEARTBEAT = 15
+
+# 结果缓存：相同文件 + 后端 + 选项的任务直接复用已有结果
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() not in ("false", "0", "no")
+
+# 结果内容的内存缓存（MB）：轮询任务状态时不重复读取、解析和序列化结果文件
+result_content_cache = ResultCache(int(os.getenv("RESULT_MEMORY_CACHE_MB", "256")) * 1024 * 1024)
+
+# 结果文件下载的媒体类型
+RESULT_MEDIA_TYPES = {"markdown": "text/markdown; charset=utf-8", "json": "application/json"}
+
+
+async def get_result_files(task: dict):
+    """
+    任务的结果文件 (markdown_path, json_path)
+
+    优先使用 Worker 完成任务时记录的路径；记录之前完成的任务遍历一次结果目录并补记
+    """
+    if task.get("markdown_path") or task.get("json_path"):
+        return task.get("markdown_path"), task.get("json_path")
+    markdown_path, json_path = await run_in_threadpool(find_result_files, task["result_path"])
+    if markdown_path or json_path:
+        await adb.set_result_files(task["task_id"], markdown_path, json_path)
+    return markdown_path, json_path
+
+
+def _write_upload_chunk(temp_file, content_hash, chunk: bytes):
+    """写入上传分块并更新内容哈希（在线程池中执行）"""
+    content_hash.update(chunk)
+    temp_file.write(chunk)
+
+
+# 批量提交单次请求最多创建的任务数（压缩包按展开后的文件计数）
+SUBMIT_BATCH_MAX_FILES = int(os.getenv("SUBMIT_BATCH_MAX_FILES", "5000"))
+
+
+def build_task_options(
+    lang: str,
+    method: str,
+    formula_enable: bool,
+    table_enable: bool,
+    keep_audio: bool,
+    enable_keyframe_ocr: bool,
+    ocr_backend: str,
+    keep_keyframes: bool,
+    remove_watermark: bool,
+    watermark_conf_threshold: float,
+    watermark_dilation: int,
+) -> dict:
+    """组装任务处理选项（单个提交和批量提交共用）"""
+    return {
+        "lang": lang,
+        "method": method,
+        "formula_enable": formula_enable,
+        "table_enable": table_enable,
+        # 视频处理参数
+        "keep_audio": keep_audio,
+        "enable_keyframe_ocr": enable_keyframe_ocr,
+        "ocr_backend": ocr_backend,
+        "keep_keyframes": keep_keyframes,
+        # 水印去除参数
+        "remove_watermark": remove_watermark,
+        "watermark_conf_threshold": watermark_conf_threshold,
+        "watermark_dilation": watermark_dilation,
+    }
+
+
+def _store_stream(src, file_name: str, upload_dir: Path) -> dict:
+    """将文件流按 8MB 分块写入上传目录并计算内容哈希（同步，在线程池中执行）"""
+    path = upload_dir / f"{uuid.uuid4().hex}_{file_name}"
+    content_hash = hashlib.sha256()
+    upload_start = time.monotonic()
+    with open(path, "wb") as dst:
+        while True:
+            chunk = src.read(1 << 23)
+            if not chunk:
+                break
+            _write_upload_chunk(dst, content_hash, chunk)
+            UPLOAD_BYTES.inc(len(chunk))
+    UPLOAD_SECONDS.observe(time.monotonic() - upload_start)
+    return {"file_name": file_name, "file_path": path, "content_hash": content_hash.hexdigest()}
+
+
+def _store_batch_upload(upload: UploadFile, upload_dir: Path, expand_archives: bool, limit: int) -> List[dict]:
+    """
+    保存批量提交中的一个上传文件（同步，在线程池中执行）
+
+    expand_archives 时 zip / tar 压缩包按成员流式解压，每个成员作为一个文件
+
+    Raises:
+        ValueError: 文件数超过 limit
+        zipfile.BadZipFile / tarfile.TarError: 压缩包损坏
+    """
+    if not (expand_archives and is_archive(upload.filename)):
+        if limit < 1:
+            raise ValueError(f"Too many files in one batch (max {SUBMIT_BATCH_MAX_FILES})")
+        return [_store_stream(upload.file, upload.filename, upload_dir)]
+
+    stored = []
+    try:
+        for file_name, member in iter_archive_members(upload.file, upload.filename):
+            if len(stored) >= limit:
+                raise ValueError(f"Too many files in one batch (max {SUBMIT_BATCH_MAX_FILES})")
+            stored.append(_store_stream(member, file_name, upload_dir))
+    except Exception:
+        _remove_stored(stored)
+        raise
+    return stored
+
+
+def _remove_stored(stored: List[dict]):
+    """删除已保存的上传文件（批量提交失败时回滚）"""
+    for item in stored:
+        item["file_path"].unlink(missing_ok=True)
+
+
+async def create_uploaded_task(
+    file_name: str,
+    file_path: Path,
+    content_hash: str,
+    backend: str,
+    options: dict,
+    priority: int,
+    current_user: User,
+) -> dict:
+    """为已保存的上传文件创建任务（结果缓存命中时直接创建为 completed），返回提交接口的响应"""
+    # 查询结果缓存：命中时任务直接完成，复用已有结果目录
+    cache_key = None
+    cached_result = None
+    if RESULT_CACHE_ENABLED:
+        cache_key = result_cache_key(content_hash, backend, options, file_path.suffix)
+        cached_result = await adb.get_cached_result(cache_key)
+        if cached_result:
+            # 上传文件不再需要，任务不记录 file_path
+            await run_in_threadpool(file_path.unlink, missing_ok=True)
+
+    # 创建任务 (关联用户)
+    markdown_path, json_path = await run_in_threadpool(find_result_files, cached_result)
+    task_id = await adb.create_task(
+        file_name=file_name,
+        file_path=None if cached_result else str(file_path),
+        backend=backend,
+        options=options,
+        priority=priority,
+        user_id=current_user.user_id,  # 关联用户
+        cache_key=cache_key,
+        result_path=cached_result,
+        markdown_path=markdown_path,
+        json_path=json_path,
+    )
+    if not cached_result:
+        notify_workers()
+
+    logger.info(f"✅ Task submitted: {task_id} - {file_name}")
+    logger.info(f"   User: {current_user.username} ({current_user.role.value})")
+    logger.info(f"   Backend: {backend}")
+    logger.info(f"   Priority: {priority}")
+    if cached_result:
+        logger.info(f"   ⚡ Result cache hit: {cached_result}")
+
+    return {
+        "success": True,
+        "task_id": task_id,
+        "status": "completed" if cached_result else "pending",
+        "cached": bool(cached_result),
+        "message": "Task submitted successfully",
+        "file_name": file_name,
+        "user_id": current_user.user_id,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+# 可续传分块上传：会话状态和分块保存在上传目录下，多个 API 进程共享
+upload_sessions = UploadSessionStore(
+    Path("/app/uploads"),
+    ttl_seconds=int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600,
+    max_size=int(os.getenv("UPLOAD_SESSION_MAX_SIZE_GB", "50")) << 30,
+)
+
 
 # 注册认证路由
 app.include_router(auth_router)
@@ -197,69 +426,385 @@ async def submit_task(
     try:
         # 创建共享的上传目录（Backend 和 Worker 都能访问）
         upload_dir = Path("/app/uploads")
-        upload_dir.mkdir(parents=True, exist_ok=True)
+        await run_in_threadpool(upload_dir.mkdir, parents=True, exist_ok=True)
 
         # 生成唯一的文件名（避免冲突）
         unique_filename = f"{uuid.uuid4().hex}_{file.filename}"
         temp_file_path = upload_dir / unique_filename
 
-        # 流式写入文件到磁盘，避免高内存使用
-        with open(temp_file_path, "wb") as temp_file:
+        # 流式写入文件到磁盘，避免高内存使用（同时计算内容哈希用于结果缓存）
+        # 打开、写入和关闭文件都在线程池中执行，不阻塞事件循环
+        content_hash = hashlib.sha256()
+        upload_start = time.monotonic()
+        temp_file = await run_in_threadpool(open, temp_file_path, "wb")
+        try:
             while True:
                 chunk = await file.read(1 << 23)  # 8MB chunks
                 if not chunk:
                     break
-                temp_file.write(chunk)
+                await run_in_threadpool(_write_upload_chunk, temp_file, content_hash, chunk)
+                UPLOAD_BYTES.inc(len(chunk))
+        finally:
+            await run_in_threadpool(temp_file.close)
+        UPLOAD_SECONDS.observe(time.monotonic() - upload_start)
+
+        options = build_task_options(
+            lang,
+            method,
+            formula_enable,
+            table_enable,
+            keep_audio,
+            enable_keyframe_ocr,
+            ocr_backend,
+            keep_keyframes,
+            remove_watermark,
+            watermark_conf_threshold,
+            watermark_dilation,
+        )
+        return await create_uploaded_task(
+            file.filename, temp_file_path, content_hash.hexdigest(), backend, options, priority, current_user
+        )
 
-        # 创建任务 (关联用户)
-        task_id = db.create_task(
-            file_name=file.filename,
-            file_path=str(temp_file_path),
-            backend=backend,
-            options={
-                "lang": lang,
-                "method": method,
-                "formula_enable": formula_enable,
-                "table_enable": table_enable,
-                # 视频处理参数
-                "keep_audio": keep_audio,
-                "enable_keyframe_ocr": enable_keyframe_ocr,
-                "ocr_backend": ocr_backend,
-                "keep_keyframes": keep_keyframes,
-                # 水印去除参数
-                "remove_watermark": remove_watermark,
-                "watermark_conf_threshold": watermark_conf_threshold,
-                "watermark_dilation": watermark_dilation,
-            },
-            priority=priority,
-            user_id=current_user.user_id,  # 关联用户
+    except Exception as e:
+        logger.error(f"❌ Failed to submit task: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/v1/tasks/submit-batch")
+async def submit_batch(
+    files: List[UploadFile] = File(..., description="多个文件，或 zip/tar 压缩包（服务端流式解压，每个文件一个任务）"),
+    expand_archives: bool = Form(True, description="是否将 zip/tar 压缩包展开为多个任务"),
+    backend: str = Form(
+        "auto",
+        description="处理后端: auto (自动选择) | pipeline/paddleocr-vl (文档) | sensevoice (音频) | video (视频) | fasta/genbank (专业格式)",
+    ),
+    lang: str = Form("auto", description="语言: auto/ch/en/korean/japan等"),
+    method: str = Form("auto", description="解析方法: auto/txt/ocr"),
+    formula_enable: bool = Form(True, description="是否启用公式识别"),
+    table_enable: bool = Form(True, description="是否启用表格识别"),
+    priority: int = Form(0, description="优先级，数字越大越优先"),
+    # 视频处理专用参数
+    keep_audio: bool = Form(False, description="视频处理时是否保留提取的音频文件"),
+    enable_keyframe_ocr: bool = Form(False, description="是否启用视频关键帧OCR识别（实验性功能）"),
+    ocr_backend: str = Form("paddleocr-vl", description="关键帧OCR引擎: paddleocr-vl"),
+    keep_keyframes: bool = Form(False, description="是否保留提取的关键帧图像"),
+    # 水印去除专用参数
+    remove_watermark: bool = Form(False, description="是否启用水印去除（支持 PDF/图片）"),
+    watermark_conf_threshold: float = Form(0.35, description="水印检测置信度阈值（0.0-1.0，推荐 0.35）"),
+    watermark_dilation: int = Form(10, description="水印掩码膨胀大小（像素，推荐 10）"),
+    # 认证依赖
+    current_user: User = Depends(require_permission(Permission.TASK_SUBMIT)),
+):
+    """
+    批量提交任务（所有文件共用一组处理选项）
+
+    需要认证和 TASK_SUBMIT 权限。
+    一次请求只做一次认证，所有任务在同一个事务中创建；任一文件保存失败时不创建任何任务。
+    zip/tar 压缩包默认在服务端流式解压，压缩包中的每个文件（忽略目录结构和隐藏文件）作为一个任务。
+    """
+    upload_dir = Path("/app/uploads")
+    await run_in_threadpool(upload_dir.mkdir, parents=True, exist_ok=True)
+
+    # 保存上传文件（压缩包逐个成员解压写入，不在内存中展开）
+    stored = []
+    try:
+        for upload in files:
+            stored.extend(
+                await run_in_threadpool(
+                    _store_batch_upload, upload, upload_dir, expand_archives, SUBMIT_BATCH_MAX_FILES - len(stored)
+                )
+            )
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        await run_in_threadpool(_remove_stored, stored)
+        raise HTTPException(status_code=400, detail=f"Invalid batch upload: {e}")
+    except Exception as e:
+        await run_in_threadpool(_remove_stored, stored)
+        logger.error(f"❌ Failed to store batch upload: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not stored:
+        raise HTTPException(status_code=400, detail="No files to submit")
+
+    try:
+        options = build_task_options(
+            lang,
+            method,
+            formula_enable,
+            table_enable,
+            keep_audio,
+            enable_keyframe_ocr,
+            ocr_backend,
+            keep_keyframes,
+            remove_watermark,
+            watermark_conf_threshold,
+            watermark_dilation,
         )
 
-        logger.info(f"✅ Task submitted: {task_id} - {file.filename}")
-        logger.info(f"   User: {current_user.username} ({current_user.role.value})")
-        logger.info(f"   Backend: {backend}")
-        logger.info(f"   Priority: {priority}")
+        # 查询结果缓存：命中的文件直接创建为 completed 任务
+        specs = []
+        for item in stored:
+            spec = {
+                "file_name": item["file_name"],
+                "file_path": str(item["file_path"]),
+                "backend": backend,
+                "options": options,
+                "priority": priority,
+                "user_id": current_user.user_id,
+            }
+            if RESULT_CACHE_ENABLED:
+                spec["cache_key"] = result_cache_key(item["content_hash"], backend, options, item["file_path"].suffix)
+                cached_result = await adb.get_cached_result(spec["cache_key"])
+                if cached_result:
+                    await run_in_threadpool(item["file_path"].unlink, missing_ok=True)
+                    markdown_path, json_path = await run_in_threadpool(find_result_files, cached_result)
+                    spec.update(
+                        file_path=None, result_path=cached_result, markdown_path=markdown_path, json_path=json_path
+                    )
+            specs.append(spec)
+
+        # 单个事务创建全部任务
+        task_ids = await adb.create_tasks(specs)
+    except Exception as e:
+        await run_in_threadpool(_remove_stored, stored)
+        logger.error(f"❌ Failed to submit batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    cached_count = sum(1 for spec in specs if spec.get("result_path"))
+    if cached_count < len(specs):
+        notify_workers()
+
+    logger.info(f"✅ Batch submitted: {len(task_ids)} tasks ({cached_count} cached)")
+    logger.info(f"   User: {current_user.username} ({current_user.role.value})")
+    logger.info(f"   Backend: {backend}")
+    logger.info(f"   Priority: {priority}")
+
+    return {
+        "success": True,
+        "count": len(task_ids),
+        "cached_count": cached_count,
+        "tasks": [
+            {
+                "task_id": task_id,
+                "file_name": spec["file_name"],
+                "status": "completed" if spec.get("result_path") else "pending",
+                "cached": bool(spec.get("result_path")),
+            }
+            for task_id, spec in zip(task_ids, specs)
+        ],
+        "message": "Batch submitted successfully",
+        "user_id": current_user.user_id,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+async def get_upload_session(upload_id: str, current_user: User) -> dict:
+    """读取上传会话（只有创建者可以访问）"""
+    session = await run_in_threadpool(upload_sessions.get, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    if session["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Permission denied: You can only access your own uploads")
+    return session
+
+
+def upload_session_status(session: dict, chunks: dict) -> dict:
+    """上传会话的进度（missing_chunks 为尚未接收的分块序号，续传时只需上传这些分块）"""
+    missing = [index for index in range(session["chunk_count"]) if index not in chunks]
+    received_bytes = sum(
+        min(session["chunk_size"], session["file_size"] - index * session["chunk_size"]) for index in chunks
+    )
+    return {
+        "success": True,
+        "upload_id": session["upload_id"],
+        "file_name": session["file_name"],
+        "file_size": session["file_size"],
+        "chunk_size": session["chunk_size"],
+        "chunk_count": session["chunk_count"],
+        "received_count": len(chunks),
+        "received_bytes": received_bytes,
+        "missing_chunks": missing,
+        "expires_at": datetime.fromtimestamp(session["expires_at"], timezone.utc).isoformat(),
+    }
 
-        return {
-            "success": True,
-            "task_id": task_id,
-            "status": "pending",
-            "message": "Task submitted successfully",
-            "file_name": file.filename,
-            "user_id": current_user.user_id,
-            "created_at": datetime.now().isoformat(),
-        }
 
+@app.post("/api/v1/uploads")
+async def create_upload(
+    file_name: str = Form(..., description="文件名"),
+    file_size: int = Form(..., description="文件大小（字节）"),
+    chunk_size: int = Form(DEFAULT_CHUNK_SIZE, description="分块大小（字节，1MB-64MB，默认 8MB）"),
+    sha256: Optional[str] = Form(None, description="整个文件的 SHA-256（可选，完成上传时校验）"),
+    current_user: User = Depends(require_permission(Permission.TASK_SUBMIT)),
+):
+    """
+    创建可续传的分块上传会话（用于数 GB 的音视频等大文件）
+
+    需要认证和 TASK_SUBMIT 权限。流程：
+    1. POST /api/v1/uploads 创建会话，服务端预分配文件
+    2. PUT /api/v1/uploads/{upload_id}?offset=N 上传分块（请求体为分块原始字节，可并发、可乱序）
+    3. POST /api/v1/uploads/{upload_id}/complete 校验并创建任务（参数与 /api/v1/tasks/submit 相同）
+    连接中断后通过 GET /api/v1/uploads/{upload_id} 查询缺失的分块继续上传
+    """
+    try:
+        session = await run_in_threadpool(
+            upload_sessions.create, current_user.user_id, file_name, file_size, chunk_size, sha256
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(
+        f"📤 Upload session created: {session['upload_id']} - {session['file_name']} "
+        f"({session['file_size']} bytes, {session['chunk_count']} chunks)"
+    )
+    return upload_session_status(session, {})
+
+
+@app.get("/api/v1/uploads/{upload_id}")
+async def get_upload(upload_id: str, current_user: User = Depends(get_current_active_user)):
+    """查询上传会话进度（已接收和缺失的分块）"""
+    session = await get_upload_session(upload_id, current_user)
+    chunks = await run_in_threadpool(upload_sessions.received_chunks, upload_id)
+    return upload_session_status(session, chunks)
+
+
+@app.put("/api/v1/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., description="分块在文件中的字节偏移（分块大小的整数倍）"),
+    current_user: User = Depends(require_permission(Permission.TASK_SUBMIT)),
+):
+    """
+    上传一个分块
+
+    请求体为分块的原始字节，长度必须等于分块大小（最后一个分块为剩余长度）。
+    请求头 X-Chunk-SHA256 提供分块的 SHA-256 时进行校验，不一致返回 400 且分块不被记录。
+    同一分块可以重复上传（覆盖），不同分块可以并发上传。
+    """
+    session = await get_upload_session(upload_id, current_user)
+    try:
+        index, expected_size = upload_sessions.chunk_range(session, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 分块直接写入目标文件的对应位置（按 8MB 批量写入，在线程池中执行）
+    content_hash = hashlib.sha256()
+    received = 0
+    buffer = bytearray()
+    upload_start = time.monotonic()
+    chunk_file = await run_in_threadpool(upload_sessions.open_chunk, upload_id, index, offset)
+    try:
+        async for piece in request.stream():
+            received += len(piece)
+            if received > expected_size:
+                raise HTTPException(status_code=400, detail=f"Chunk too large (expected {expected_size} bytes)")
+            buffer += piece
+            if len(buffer) >= 1 << 23:
+                await run_in_threadpool(_write_upload_chunk, chunk_file, content_hash, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write_upload_chunk, chunk_file, content_hash, bytes(buffer))
+    finally:
+        await run_in_threadpool(chunk_file.close)
+    UPLOAD_BYTES.inc(received)
+    UPLOAD_SECONDS.observe(time.monotonic() - upload_start)
+
+    if received != expected_size:
+        raise HTTPException(status_code=400, detail=f"Chunk size mismatch (expected {expected_size}, got {received})")
+    digest = content_hash.hexdigest()
+    expected_sha256 = request.headers.get("x-chunk-sha256")
+    if expected_sha256 and expected_sha256.lower() != digest:
+        raise HTTPException(
+            status_code=400, detail=f"Chunk checksum mismatch: expected {expected_sha256}, got {digest}"
+        )
+
+    await run_in_threadpool(upload_sessions.mark_chunk, upload_id, index, digest)
+    return {
+        "success": True,
+        "upload_id": upload_id,
+        "index": index,
+        "offset": offset,
+        "size": received,
+        "sha256": digest,
+    }
+
+
+@app.post("/api/v1/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    backend: str = Form(
+        "auto",
+        description="处理后端: auto (自动选择) | pipeline/paddleocr-vl (文档) | sensevoice (音频) | video (视频) | fasta/genbank (专业格式)",
+    ),
+    lang: str = Form("auto", description="语言: auto/ch/en/korean/japan等"),
+    method: str = Form("auto", description="解析方法: auto/txt/ocr"),
+    formula_enable: bool = Form(True, description="是否启用公式识别"),
+    table_enable: bool = Form(True, description="是否启用表格识别"),
+    priority: int = Form(0, description="优先级，数字越大越优先"),
+    # 视频处理专用参数
+    keep_audio: bool = Form(False, description="视频处理时是否保留提取的音频文件"),
+    enable_keyframe_ocr: bool = Form(False, description="是否启用视频关键帧OCR识别（实验性功能）"),
+    ocr_backend: str = Form("paddleocr-vl", description="关键帧OCR引擎: paddleocr-vl"),
+    keep_keyframes: bool = Form(False, description="是否保留提取的关键帧图像"),
+    # 水印去除专用参数
+    remove_watermark: bool = Form(False, description="是否启用水印去除（支持 PDF/图片）"),
+    watermark_conf_threshold: float = Form(0.35, description="水印检测置信度阈值（0.0-1.0，推荐 0.35）"),
+    watermark_dilation: int = Form(10, description="水印掩码膨胀大小（像素，推荐 10）"),
+    # 认证依赖
+    current_user: User = Depends(require_permission(Permission.TASK_SUBMIT)),
+):
+    """
+    完成分块上传并创建任务
+
+    需要认证和 TASK_SUBMIT 权限。检查分块齐全并计算整个文件的 SHA-256
+    （创建会话时提供了 sha256 则校验），文件移动到上传目录后创建任务，响应与 /api/v1/tasks/submit 相同。
+    分块缺失或校验失败时返回 409，会话保留，可补传后重试。
+    """
+    session = await get_upload_session(upload_id, current_user)
+    file_path = upload_sessions.upload_dir / f"{uuid.uuid4().hex}_{session['file_name']}"
+    try:
+        content_hash = await run_in_threadpool(upload_sessions.complete, upload_id, file_path)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    options = build_task_options(
+        lang,
+        method,
+        formula_enable,
+        table_enable,
+        keep_audio,
+        enable_keyframe_ocr,
+        ocr_backend,
+        keep_keyframes,
+        remove_watermark,
+        watermark_conf_threshold,
+        watermark_dilation,
+    )
+    try:
+        return await create_uploaded_task(
+            session["file_name"], file_path, content_hash, backend, options, priority, current_user
+        )
     except Exception as e:
-        logger.error(f"❌ Failed to submit task: {e}")
+        await run_in_threadpool(file_path.unlink, missing_ok=True)
+        logger.error(f"❌ Failed to submit uploaded file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.delete("/api/v1/uploads/{upload_id}")
+async def abort_upload(upload_id: str, current_user: User = Depends(get_current_active_user)):
+    """放弃上传会话并删除已上传的分块"""
+    await get_upload_session(upload_id, current_user)
+    await run_in_threadpool(upload_sessions.delete, upload_id)
+    logger.info(f"🗑️  Upload session aborted: {upload_id}")
+    return {"success": True, "message": "Upload aborted"}
+
+
 @app.get("/api/v1/tasks/{task_id}")
 async def get_task_status(
     task_id: str,
     upload_images: bool = Query(False, description="是否上传图片到MinIO并替换链接（仅当任务完成时有效）"),
-    format: str = Query("markdown", description="返回格式: markdown(默认)/json/both"),
+    format: str = Query("markdown", description="返回格式: markdown(默认)/json/both/none"),
     current_user: User = Depends(get_current_active_user),
 ):
     """
@@ -270,9 +815,11 @@ async def get_task_status(
     - format=markdown: 只返回 Markdown 内容（默认）
     - format=json: 只返回 JSON 结构化数据（MinerU 和 PaddleOCR-VL 支持）
     - format=both: 同时返回 Markdown 和 JSON
+    - format=none: 不返回内容，只返回结果文件的下载地址（轮询状态时使用）
     可选择是否上传图片到 MinIO 并替换为 URL
+    结果文件可通过 GET /api/v1/tasks/{task_id}/result 流式下载
     """
-    task = db.get_task(task_id)
+    task = await adb.get_task(task_id)
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -297,6 +844,12 @@ async def get_task_status(
         "retry_count": task["retry_count"],
         "user_id": task.get("user_id"),
     }
+    # 处理进度：processing 时包含当前阶段和预计剩余时间（eta_seconds），结束后保留各阶段耗时
+    if task["status"] != "pending":
+        response["progress"] = await adb.get_progress(task_id)
+    # 资源统计：任务结束后包含墙钟/CPU 时间、峰值内存和输入输出规模
+    if task["status"] in ("completed", "failed"):
+        response["metrics"] = await adb.get_task_metrics(task_id)
     logger.info(f"✅ Task status: {task['status']} - (result_path: {task['result_path']})")
 
     # 如果任务已完成，尝试返回解析内容
@@ -307,97 +860,319 @@ async def get_task_status(
             response["message"] = "Task completed but result files have been cleaned up (older than retention period)"
             return response
 
-        result_dir = Path(task["result_path"])
-        logger.info(f"📂 Checking result directory: {result_dir}")
-
-        if result_dir.exists():
-            logger.info("✅ Result directory exists")
-            # 递归查找 Markdown 文件（MinerU 输出结构：task_id/filename/auto/*.md）
-            md_files = list(result_dir.rglob("*.md"))
-            # 递归查找 JSON 文件
-            # MinerU 输出格式: {filename}_content_list.json (主要的结构化内容)
-            # 也支持其他引擎的: content.json, result.json
-            json_files = [
-                f
-                for f in result_dir.rglob("*.json")
-                if not f.parent.name.startswith("page_")
-                and (f.name in ["content.json", "result.json"] or "_content_list.json" in f.name)
-            ]
-            logger.info(f"📄 Found {len(md_files)} markdown files and {len(json_files)} json files")
-
-            if md_files:
-                try:
-                    # 初始化 data 字段
-                    response["data"] = {}
-
-                    # 标记 JSON 是否可用
-                    response["data"]["json_available"] = len(json_files) > 0
-
-                    # 根据 format 参数决定返回内容
-                    if format in ["markdown", "both"]:
-                        # 读取 Markdown 内容
-                        md_file = md_files[0]
-                        logger.info(f"📖 Reading markdown file: {md_file}")
-                        with open(md_file, "r", encoding="utf-8") as f:
-                            md_content = f.read()
-
-                        logger.info(f"✅ Markdown content loaded, length: {len(md_content)} characters")
-
-                        # 查找图片目录（在 markdown 文件的同级目录下）
-                        image_dir = md_file.parent / "images"
-
-                        # 处理图片（如果需要）
-                        if upload_images and image_dir.exists():
-                            logger.info(f"🖼️  Processing images for task {task_id}, upload_images={upload_images}")
-                            md_content = process_markdown_images(md_content, image_dir, upload_images)
-
-                        # 添加 Markdown 相关字段
-                        response["data"]["markdown_file"] = md_file.name
-                        response["data"]["content"] = md_content
-                        response["data"]["images_uploaded"] = upload_images
-                        response["data"]["has_images"] = image_dir.exists() if not upload_images else None
-
-                    # 如果用户请求 JSON 格式
-                    if format in ["json", "both"] and json_files:
-                        import json as json_lib
-
-                        json_file = json_files[0]
-                        logger.info(f"📖 Reading JSON file: {json_file}")
-                        try:
-                            with open(json_file, "r", encoding="utf-8") as f:
-                                json_content = json_lib.load(f)
-                            response["data"]["json_file"] = json_file.name
-                            response["data"]["json_content"] = json_content
-                            logger.info("✅ JSON content loaded successfully")
-                        except Exception as json_e:
-                            logger.warning(f"⚠️  Failed to load JSON: {json_e}")
-                    elif format == "json" and not json_files:
-                        # 用户请求 JSON 但没有 JSON 文件
-                        logger.warning("⚠️  JSON format requested but no JSON file available")
-                        response["data"]["message"] = "JSON format not available for this backend"
-
-                    # 如果没有返回任何内容，添加提示
-                    if not response["data"]:
-                        response["data"] = None
-                        logger.warning(f"⚠️  No data returned for format: {format}")
+        md_path, json_path = await get_result_files(task)
+        md_file = Path(md_path) if md_path else None
+        json_file = Path(json_path) if json_path else None
+
+        if md_file:
+            try:
+                # 初始化 data 字段
+                response["data"] = {}
+
+                # 标记 JSON 是否可用，并给出结果文件的下载地址
+                response["data"]["json_available"] = json_file is not None
+                response["data"]["markdown_url"] = f"/api/v1/tasks/{task_id}/result?file=markdown"
+                if json_file:
+                    response["data"]["json_url"] = f"/api/v1/tasks/{task_id}/result?file=json"
+
+                # 根据 format 参数决定返回内容
+                if format in ["markdown", "both"]:
+                    # 查找图片目录（在 markdown 文件的同级目录下）
+                    image_dir = md_file.parent / "images"
+
+                    if upload_images and image_dir.exists():
+                        # 上传图片并替换链接（每次重新读取原文，结果不缓存）
+                        logger.info(f"🖼️  Processing images for task {task_id}, upload_images={upload_images}")
+                        md_content = await run_in_threadpool(read_markdown, str(md_file))
+                        md_content = await run_in_threadpool(
+                            process_markdown_images, md_content, image_dir, upload_images
+                        )
                     else:
-                        logger.info(f"✅ Response data field added successfully (format={format})")
-
-                except Exception as e:
-                    logger.error(f"❌ Failed to read content: {e}")
-                    logger.exception(e)
-                    # 读取失败不影响状态查询，只是不返回 data
-                    response["data"] = None
-            else:
-                logger.warning(f"⚠️  No markdown files found in {result_dir}")
+                        # 读取 Markdown 内容（命中内存缓存时不读取文件）
+                        md_content = await run_in_threadpool(
+                            result_content_cache.load, task_id, "markdown", str(md_file), markdown_fragment
+                        )
+
+                    # 添加 Markdown 相关字段
+                    response["data"]["markdown_file"] = md_file.name
+                    response["data"]["content"] = md_content
+                    response["data"]["images_uploaded"] = upload_images
+                    response["data"]["has_images"] = image_dir.exists() if not upload_images else None
+
+                # 如果用户请求 JSON 格式
+                if format in ["json", "both"] and json_file:
+                    try:
+                        json_content = await run_in_threadpool(
+                            result_content_cache.load, task_id, "json", str(json_file), json_fragment
+                        )
+                        response["data"]["json_file"] = json_file.name
+                        response["data"]["json_content"] = json_content
+                    except Exception as json_e:
+                        logger.warning(f"⚠️  Failed to load JSON: {json_e}")
+                elif format == "json" and not json_file:
+                    # 用户请求 JSON 但没有 JSON 文件
+                    logger.warning("⚠️  JSON format requested but no JSON file available")
+                    response["data"]["message"] = "JSON format not available for this backend"
+
+            except Exception as e:
+                logger.error(f"❌ Failed to read content: {e}")
+                logger.exception(e)
+                # 读取失败不影响状态查询，只是不返回 data
+                response["data"] = None
         else:
-            logger.error(f"❌ Result directory does not exist: {result_dir}")
+            logger.warning(f"⚠️  No markdown file found in {task['result_path']}")
     elif task["status"] == "completed":
         logger.warning("⚠️  Task completed but result_path is empty")
     else:
         logger.info(f"ℹ️  Task status is {task['status']}, skipping content loading")
 
-    return response
+    # 内联的结果内容可能有数十 MB：内容以缓存的 JSON 片段原样拼接，在线程池中完成
+    body = await run_in_threadpool(render_json, response)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/v1/tasks/{task_id}/result")
+async def download_task_result(
+    task_id: str,
+    request: Request,
+    file: str = Query("markdown", description="结果文件: markdown(默认)/json"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    流式下载任务结果文件
+
+    需要认证。用户只能下载自己的任务结果，管理员可以下载所有任务结果。
+    支持 ETag（If-None-Match 未变化时返回 304）和 Range 分段下载（断点续传）。
+    """
+    if file not in RESULT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid file, must be one of: markdown, json")
+
+    task = await adb.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if not current_user.has_permission(Permission.TASK_VIEW_ALL):
+        if task.get("user_id") != current_user.user_id:
+            raise HTTPException(status_code=403, detail="Permission denied: You can only view your own tasks")
+
+    if task["status"] != "completed":
+        raise HTTPException(status_code=400, detail=f"Task is not completed (status: {task['status']})")
+    if not task["result_path"]:
+        raise HTTPException(status_code=404, detail="Result files have been cleaned up")
+
+    md_path, json_path = await get_result_files(task)
+    path = md_path if file == "markdown" else json_path
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None:
+        raise HTTPException(status_code=404, detail=f"No {file} result available for this task")
+
+    etag = file_etag(stat)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse 分块发送文件，并处理 Range / If-Range 请求
+    return FileResponse(
+        path,
+        media_type=RESULT_MEDIA_TYPES[file],
+        filename=Path(path).name,
+        headers=headers,
+        stat_result=stat,
+    )
+
+
+def parse_task_ids(task_ids: str) -> List[str]:
+    """解析逗号分隔的任务 ID（去重并保持顺序）"""
+    ids = list(dict.fromkeys(task_id.strip() for task_id in task_ids.split(",") if task_id.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="task_ids is required")
+    if len(ids) > TASK_EVENTS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many task_ids (max {TASK_EVENTS_MAX_IDS})")
+    return ids
+
+
+def task_state(task: dict) -> dict:
+    """推送给客户端的任务状态"""
+    return {
+        "task_id": task["task_id"],
+        "status": task["status"],
+        "error_message": task["error_message"],
+        "started_at": task["started_at"],
+        "completed_at": task["completed_at"],
+    }
+
+
+async def task_snapshot(task_id: str, current_user: User) -> dict:
+    """任务当前状态和进度（订阅之后读取，作为推送的第一个事件）"""
+    task = await adb.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+
+    if not current_user.has_permission(Permission.TASK_VIEW_ALL):
+        if task.get("user_id") != current_user.user_id:
+            raise HTTPException(status_code=403, detail="Permission denied: You can only view your own tasks")
+
+    state = task_state(task)
+    if task["status"] != "pending":
+        state["progress"] = await adb.get_progress(task_id)
+    return state
+
+
+async def subscribe_task_events(task_ids: List[str], current_user: User):
+    """订阅任务事件并读取快照（先订阅再读快照，快照之后的变更不会遗漏）"""
+    subscription = await task_event_broker.subscribe(task_ids)
+    try:
+        snapshots = [await task_snapshot(task_id, current_user) for task_id in task_ids]
+    except BaseException:
+        task_event_broker.unsubscribe(subscription)
+        raise
+    return subscription, snapshots
+
+
+async def task_event_stream(subscription, snapshots: List[dict]):
+    """
+    任务事件流，产出 (事件名, 数据)
+
+    - status: 状态变化（首先推送每个任务的快照；结束状态附带 error_message 和 completed_at）
+    - progress: 进度更新（阶段、已完成数、总数）
+    - ping: 心跳（数据为 None）
+    - end: 所有任务都已结束，随后关闭连接
+    """
+    statuses = {state["task_id"]: state["status"] for state in snapshots}
+    for state in snapshots:
+        yield "status", state
+
+    while any(status not in FINAL_STATUSES for status in statuses.values()):
+        if subscription.lagged:
+            # 消费过慢丢弃了事件：清空积压，重新推送仍在处理中的任务的状态
+            subscription.lagged = False
+            while not subscription.events.empty():
+                subscription.events.get_nowait()
+            for task_id in [t for t, status in statuses.items() if status not in FINAL_STATUSES]:
+                task = await adb.get_task(task_id)
+                if not task:
+                    statuses.pop(task_id)
+                    continue
+                statuses[task_id] = task["status"]
+                yield "status", task_state(task)
+            continue
+
+        event = await subscription.get(timeout=TASK_EVENTS_HEARTBEAT)
+        if event is None:
+            yield "ping", None
+            continue
+
+        task_id = event["task_id"]
+        if statuses.get(task_id) in FINAL_STATUSES:
+            continue
+        if event["type"] == "status":
+            data = {"task_id": task_id, "status": event["status"], "updated_at": event["created_at"]}
+            if event["status"] in FINAL_STATUSES:
+                task = await adb.get_task(task_id)
+                if task:
+                    data.update(error_message=task["error_message"], completed_at=task["completed_at"])
+            statuses[task_id] = event["status"]
+            yield "status", data
+        else:
+            progress = {
+                "task_id": task_id,
+                "stage": event["stage"],
+                "done": event["done"],
+                "total": event["total"],
+                "updated_at": event["created_at"],
+            }
+            yield "progress", progress
+
+    yield "end", {"tasks": statuses}
+
+
+@app.get("/api/v1/task-events")
+async def stream_task_events(
+    request: Request,
+    task_ids: str = Query(..., description="任务ID，多个以逗号分隔"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    订阅任务状态和进度（Server-Sent Events）
+
+    需要认证。用户只能订阅自己的任务，管理员可以订阅所有任务。
+    先推送每个任务的当前状态，之后推送状态变化（event: status）和进度更新（event: progress），
+    所有任务结束后推送 event: end 并关闭连接。用于替代轮询 GET /api/v1/tasks/{task_id}。
+    """
+    ids = parse_task_ids(task_ids)
+    subscription, snapshots = await subscribe_task_events(ids, current_user)
+
+    async def body():
+        try:
+            async for name, data in task_event_stream(subscription, snapshots):
+                if await request.is_disconnected():
+                    break
+                if data is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            task_event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def authenticate_websocket(websocket: WebSocket) -> Optional[User]:
+    """WebSocket 认证：Bearer Token / X-API-Key 请求头，或 token / api_key 查询参数（浏览器无法设置请求头）"""
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    api_key = websocket.query_params.get("api_key") or websocket.headers.get("x-api-key")
+
+    user = None
+    if token:
+        token_data = verify_token(token)
+        if token_data:
+            user = await run_in_threadpool(auth_db.get_user_by_id, token_data.user_id)
+    if user is None and api_key:
+        user = await run_in_threadpool(auth_db.verify_api_key, api_key)
+    return user if user and user.is_active else None
+
+
+@app.websocket("/api/v1/task-events/ws")
+async def task_events_websocket(websocket: WebSocket, task_ids: str = Query(..., description="任务ID，多个以逗号分隔")):
+    """
+    订阅任务状态和进度（WebSocket）
+
+    消息格式为 {"event": "status" | "progress" | "ping" | "end", "data": {...}}，事件含义与 SSE 接口相同；
+    认证或参数错误时发送 {"event": "error", "detail": ...} 并以 1008 关闭
+    """
+    await websocket.accept()
+    user = await authenticate_websocket(websocket)
+    if user is None:
+        await websocket.send_json({"event": "error", "detail": "Could not validate credentials"})
+        await websocket.close(code=1008)
+        return
+
+    try:
+        subscription, snapshots = await subscribe_task_events(parse_task_ids(task_ids), user)
+    except HTTPException as e:
+        await websocket.send_json({"event": "error", "detail": e.detail})
+        await websocket.close(code=1008)
+        return
+
+    try:
+        async for name, data in task_event_stream(subscription, snapshots):
+            await websocket.send_json({"event": name, "data": data})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        task_event_broker.unsubscribe(subscription)
 
 
 @app.delete("/api/v1/tasks/{task_id}")
@@ -407,7 +1182,7 @@ async def cancel_task(task_id: str, current_user: User = Depends(get_current_act
 
     需要认证。用户只能取消自己的任务，管理员可以取消任何任务。
     """
-    task = db.get_task(task_id)
+    task = await adb.get_task(task_id)
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -418,12 +1193,11 @@ async def cancel_task(task_id: str, current_user: User = Depends(get_current_act
             raise HTTPException(status_code=403, detail="Permission denied: You can only cancel your own tasks")
 
     if task["status"] == "pending":
-        db.update_task_status(task_id, "cancelled")
+        await adb.update_task_status(task_id, "cancelled")
 
-        # 删除临时文件
-        file_path = Path(task["file_path"])
-        if file_path.exists():
-            file_path.unlink()
+        # 删除临时文件（在线程池中执行）
+        if task.get("file_path"):
+            await run_in_threadpool(Path(task["file_path"]).unlink, missing_ok=True)
 
         logger.info(f"⏹️  Task cancelled: {task_id} by user {current_user.username}")
         return {"success": True, "message": "Task cancelled successfully"}
@@ -438,7 +1212,7 @@ async def get_queue_stats(current_user: User = Depends(require_permission(Permis
 
     需要认证和 QUEUE_VIEW 权限。
     """
-    stats = db.get_queue_stats()
+    stats = await adb.get_queue_stats()
 
     return {
         "success": True,
@@ -449,61 +1223,84 @@ async def get_queue_stats(current_user: User = Depends(require_permission(Permis
     }
 
 
+def _to_db_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """将查询参数中的时间转换为数据库使用的 UTC 'YYYY-MM-DD HH:MM:SS' 格式（无时区视为 UTC）"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
 @app.get("/api/v1/queue/tasks")
 async def list_tasks(
     status: Optional[str] = Query(None, description="筛选状态: pending/processing/completed/failed"),
-    limit: int = Query(100, description="返回数量限制", le=1000),
+    limit: int = Query(100, description="返回数量限制", ge=1, le=1000),
+    backend: Optional[str] = Query(None, description="筛选处理引擎"),
+    created_after: Optional[datetime] = Query(None, description="创建时间下限（含，ISO 8601，无时区视为 UTC）"),
+    created_before: Optional[datetime] = Query(None, description="创建时间上限（不含）"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔（如 status,file_name），默认全部"),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     获取任务列表
 
     需要认证。普通用户只能看到自己的任务，管理员/经理可以看到所有任务。
+    按创建时间倒序返回，使用 next_cursor 翻页（为 null 表示没有更多数据）。
     """
     # 检查用户权限
     can_view_all = current_user.has_permission(Permission.TASK_VIEW_ALL)
 
-    if can_view_all:
-        # 管理员/经理查看所有任务
-        if status:
-            tasks = db.get_tasks_by_status(status, limit)
-        else:
-            with db.get_cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT * FROM tasks
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                """,
-                    (limit,),
-                )
-                tasks = [dict(row) for row in cursor.fetchall()]
-    else:
-        # 普通用户只能看到自己的任务
-        with db.get_cursor() as cursor:
-            if status:
-                cursor.execute(
-                    """
-                    SELECT * FROM tasks
-                    WHERE user_id = ? AND status = ?
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                """,
-                    (current_user.user_id, status, limit),
-                )
-            else:
-                cursor.execute(
-                    """
-                    SELECT * FROM tasks
-                    WHERE user_id = ?
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                """,
-                    (current_user.user_id, limit),
-                )
-            tasks = [dict(row) for row in cursor.fetchall()]
+    # 管理员/经理查看所有任务，普通用户只能看到自己的任务
+    user_id = None if can_view_all else current_user.user_id
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        tasks = await adb.list_tasks(
+            user_id=user_id,
+            status=status,
+            limit=limit,
+            backend=backend,
+            created_after=_to_db_timestamp(created_after),
+            created_before=_to_db_timestamp(created_before),
+            cursor=cursor,
+            fields=field_list,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = encode_cursor(tasks[-1]) if len(tasks) == limit else None
+
+    return {
+        "success": True,
+        "count": len(tasks),
+        "tasks": tasks,
+        "next_cursor": next_cursor,
+        "can_view_all": can_view_all,
+    }
+
+
+@app.get("/api/v1/admin/task-metrics")
+async def get_task_metrics_summary(
+    days: int = Query(7, description="统计最近N天处理的任务", ge=1),
+    backend: Optional[str] = Query(None, description="只统计指定处理引擎"),
+    current_user: User = Depends(require_permission(Permission.QUEUE_MANAGE)),
+):
+    """
+    按处理引擎汇总任务资源统计（管理接口）
+
+    需要管理员权限。返回各引擎的任务数、总耗时及占比、CPU 时间、峰值内存/显存、
+    每页耗时、音视频实时率和各阶段耗时，按总耗时倒序排列，用于容量规划。
+    """
+    since = _to_db_timestamp(datetime.now(timezone.utc) - timedelta(days=days))
+    summary = await adb.get_task_metrics_summary(since=since, backend=backend)
 
-    return {"success": True, "count": len(tasks), "tasks": tasks, "can_view_all": can_view_all}
+    return {
+        "success": True,
+        "since": since,
+        "backends": summary,
+        "timestamp": datetime.now().isoformat(),
+    }
 
 
 @app.post("/api/v1/admin/cleanup")
@@ -516,13 +1313,34 @@ async def cleanup_old_tasks(
 
     需要管理员权限。
     """
-    deleted_count = db.cleanup_old_tasks(days)
+    deleted_count = await adb.cleanup_old_tasks(days)
 
     logger.info(f"🧹 Cleaned up {deleted_count} old tasks by {current_user.username}")
 
     return {"success": True, "deleted_count": deleted_count, "message": f"Cleaned up tasks older than {days} days"}
 
 
+@app.post("/api/v1/admin/archive")
+async def archive_old_tasks(
+    days: int = Query(30, description="归档N天前完成的任务"),
+    current_user: User = Depends(require_permission(Permission.QUEUE_MANAGE)),
+):
+    """
+    归档旧任务（管理接口）
+
+    需要管理员权限。已完成/失败/取消的旧任务会被移入归档表，仍可通过任务 ID 查询。
+    """
+    archived_count = await adb.archive_old_tasks(days)
+
+    logger.info(f"📦 Archived {archived_count} finished tasks by {current_user.username}")
+
+    return {
+        "success": True,
+        "archived_count": archived_count,
+        "message": f"Archived tasks finished more than {days} days ago",
+    }
+
+
 @app.post("/api/v1/admin/reset-stale")
 async def reset_stale_tasks(
     timeout_minutes: int = Query(60, description="超时时间（分钟）"),
@@ -533,7 +1351,9 @@ async def reset_stale_tasks(
 
     需要管理员权限。
     """
-    reset_count = db.reset_stale_tasks(timeout_minutes)
+    reset_count = await adb.reset_stale_tasks(timeout_minutes)
+    if reset_count > 0:
+        notify_workers()
 
     logger.info(f"🔄 Reset {reset_count} stale tasks by {current_user.username}")
 
@@ -630,6 +1450,21 @@ async def list_engines():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Prometheus / OpenMetrics 指标
+
+    按 Accept 头返回 Prometheus 文本格式或 OpenMetrics 格式，包含队列深度、在线 Worker、上传吞吐等指标。
+    未安装 prometheus_client 时返回 503。
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    # 抓取时会查询任务队列（队列深度、在线 Worker），在线程池中执行
+    body, content_type = await run_in_threadpool(render_metrics, request.headers.get("accept"))
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/api/v1/health")
 async def health_check():
     """
@@ -637,13 +1472,14 @@ async def health_check():
     """
     try:
         # 检查数据库连接
-        stats = db.get_queue_stats()
+        stats = await adb.get_queue_stats()
 
         return {
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
             "database": "connected",
             "queue_stats": stats,
+            "result_cache": result_content_cache.stats(),
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -131,6 +131,34 @@ class SenseVoiceEngine:
 
                 raise
 
+    def load(self):
+        """预加载模型（供 Worker 引擎池在启动时预热）"""
+        return self._load_model()
+
+    def unload(self):
+        """
+        卸载模型并释放显存
+
+        下次 parse 时会重新加载（冷启动），由 Worker 引擎池在内存压力下调用
+        """
+        with self._lock:
+            if self._model is None:
+                return
+            self._model = None
+
+        import gc
+
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception as e:
+            logger.debug(f"CUDA cache cleanup warning: {e}")
+
+        logger.info("🗑️  SenseVoice Model unloaded")
+
     def parse(
         self, audio_path: str, output_path: str, language: str = "auto", use_itn: bool = True, **kwargs
     ) -> Dict[str, Any]:
@@ -7,6 +7,7 @@ FastAPI 依赖项,用于保护路由和验证用户权限
 
 from fastapi import Depends, HTTPException, status, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
 from .auth_db import AuthDB
@@ -52,7 +53,7 @@ async def get_current_user_from_token(
     if not token_data:
         return None
 
-    user = auth_db.get_user_by_id(token_data.user_id)
+    user = await run_in_threadpool(auth_db.get_user_by_id, token_data.user_id)
     return user
 
 
@@ -73,7 +74,7 @@ async def get_current_user_from_apikey(
     if not api_key:
         return None
 
-    user = auth_db.verify_api_key(api_key)
+    user = await run_in_threadpool(auth_db.verify_api_key, api_key)
     return user
 
 
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+MinerU Tianshu - MinerU 峰值内存测量
+
+测量 Worker 的 _process_with_mineru 处理单个 PDF 时的峰值 RSS，对比两种 do_parse 输入方式：
+- path:  传文件路径（当前实现，见 MinerUWorkerAPI._mineru_input）
+- bytes: 先把整个文件读入内存再传 bytes（旧实现）
+
+每种方式在独立子进程中运行：先完整处理一次（加载模型、预热），再用 /proc/self/clear_refs 重置
+VmHWM 后处理第二次，第二次的峰值即单个任务的峰值（与 Worker 日志和任务资源统计的 peak_rss_mb 口径一致）。
+需要 Linux 和完整的 Worker 运行环境（MinerU 及其模型）。
+
+用法：
+    cd backend
+    python benchmarks/mineru_peak_rss.py /path/to/large.pdf
+    python benchmarks/mineru_peak_rss.py /path/to/large.pdf --input bytes --lang en
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def measure(file_path: str, input_mode: str, lang: str) -> dict:
+    """在当前进程中测量一次任务的峰值 RSS（由子进程调用）"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from litserve_worker import MinerUWorkerAPI
+    from memory_stats import peak_rss_mb, reset_peak_rss, rss_mb
+
+    # 只用到 output_dir，不经过 setup（不加载引擎池、不连接任务队列）
+    worker = MinerUWorkerAPI.__new__(MinerUWorkerAPI)
+    if input_mode == "bytes":
+        worker._mineru_input = lambda path: (Path(path).name, Path(path).read_bytes())
+
+    options = {"lang": lang}
+    with tempfile.TemporaryDirectory(prefix="tianshu-rss-") as output_dir:
+        worker.output_dir = str(Path(output_dir) / "warmup")
+        worker._process_with_mineru(file_path, options)
+
+        worker.output_dir = str(Path(output_dir) / "measured")
+        baseline = rss_mb()
+        reset_peak_rss()
+        worker._process_with_mineru(file_path, options)
+        peak = peak_rss_mb()
+
+    return {
+        "input": input_mode,
+        "file_mb": round(Path(file_path).stat().st_size / 2**20, 1),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak, 1),
+        "task_peak_mb": round(peak - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak RSS of MinerU processing in the worker")
+    parser.add_argument("file", help="PDF file to process")
+    parser.add_argument("--input", choices=["path", "bytes", "both"], default="both", help="do_parse input mode")
+    parser.add_argument("--lang", default="ch", help="MinerU OCR language")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.file, args.input, args.lang)))
+        return
+
+    modes = ["path", "bytes"] if args.input == "both" else [args.input]
+    print(f"{'input':<8}{'file MB':>10}{'baseline MB':>14}{'peak MB':>10}{'task peak MB':>15}")
+    for mode in modes:
+        output = subprocess.run(
+            [sys.executable, __file__, args.file, "--input", mode, "--lang", args.lang, "--child"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{result['input']:<8}{result['file_mb']:>10}{result['baseline_rss_mb']:>14}"
+            f"{result['peak_rss_mb']:>10}{result['task_peak_mb']:>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
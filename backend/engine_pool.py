@@ -0,0 +1,301 @@
+"""
+MinerU Tianshu - Engine Pool
+天枢 Worker 引擎池
+
+统一管理 Worker 内按需加载的重量级引擎（PaddleOCR-VL、SenseVoice 等）：
+- 启动时预加载声明的引擎（ENGINE_PRELOAD），避免首个任务承担冷启动
+- 记录每个引擎的最近使用时间和加载时的内存占用（RSS / 显存增量）
+- 内存压力下按 LRU 卸载空闲引擎，卸载后下次使用时重新加载
+- 区分统计冷启动（含加载）与热调用的延迟
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from memory_stats import available_memory_mb, gpu_allocated_mb, gpu_free_mb, rss_mb
+from metrics_exporter import ENGINE_LOAD_SECONDS
+
+
+@dataclass
+class _Engine:
+    """引擎池中单个引擎的状态与统计"""
+
+    name: str
+    loader: Callable[[], Any]
+    unloader: Optional[Callable[[Any], None]] = None
+    instance: Any = None
+    in_use: int = 0
+    last_used: float = 0.0
+    rss_mb: float = 0.0
+    gpu_mb: float = 0.0
+    loads: int = 0
+    unloads: int = 0
+    last_load_seconds: float = 0.0
+    cold_calls: int = 0
+    cold_seconds: float = 0.0
+    warm_calls: int = 0
+    warm_seconds: float = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.instance is not None
+
+    @property
+    def footprint_mb(self) -> float:
+        return self.rss_mb + self.gpu_mb
+
+
+class EnginePool:
+    """Worker 引擎池（线程安全）"""
+
+    def __init__(
+        self,
+        idle_seconds: float = 300.0,
+        max_memory_mb: float = 0.0,
+        min_free_memory_mb: float = 0.0,
+        min_free_vram_mb: float = 0.0,
+    ):
+        """
+        初始化引擎池
+
+        Args:
+            idle_seconds: 空闲超过该时长的引擎在内存压力下可被卸载
+            max_memory_mb: 已加载引擎的内存占用上限（RSS + 显存，0 表示不限制）
+            min_free_memory_mb: 系统可用内存低于该值时视为内存压力（0 表示不检查）
+            min_free_vram_mb: GPU 空闲显存低于该值时视为内存压力（0 表示不检查）
+        """
+        self.idle_seconds = idle_seconds
+        self.max_memory_mb = max_memory_mb
+        self.min_free_memory_mb = min_free_memory_mb
+        self.min_free_vram_mb = min_free_vram_mb
+        self._engines: Dict[str, _Engine] = {}
+        # 加载/卸载与统计共用一把可重入锁：同一时刻只加载一个引擎，内存增量才能归属到正确的引擎
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls) -> "EnginePool":
+        """根据环境变量创建引擎池"""
+        return cls(
+            idle_seconds=float(os.getenv("ENGINE_IDLE_SECONDS", "300")),
+            max_memory_mb=float(os.getenv("ENGINE_MAX_MEMORY_MB", "0")),
+            min_free_memory_mb=float(os.getenv("ENGINE_MIN_FREE_MEMORY_MB", "0")),
+            min_free_vram_mb=float(os.getenv("ENGINE_MIN_FREE_VRAM_MB", "0")),
+        )
+
+    def register(self, name: str, loader: Callable[[], Any], unloader: Optional[Callable[[Any], None]] = None):
+        """
+        注册引擎
+
+        Args:
+            name: 引擎名称
+            loader: 加载函数，返回已完成模型加载的引擎实例
+            unloader: 卸载函数，接收引擎实例并释放其模型（为空时仅丢弃引用）
+        """
+        with self._lock:
+            self._engines[name] = _Engine(name=name, loader=loader, unloader=unloader)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._engines)
+
+    @property
+    def loaded_names(self) -> List[str]:
+        return [name for name, entry in self._engines.items() if entry.loaded]
+
+    def preload(self, names: List[str]):
+        """预加载指定引擎，单个引擎加载失败不影响其他引擎和 Worker 启动"""
+        for name in names:
+            if name not in self._engines:
+                logger.warning(f"⚠️  Unknown engine in ENGINE_PRELOAD: {name} (available: {', '.join(self.names)})")
+                continue
+            try:
+                with self._lock:
+                    self._load(self._engines[name])
+            except Exception as e:
+                logger.error(f"❌ Failed to preload engine {name}: {e}")
+
+    @contextmanager
+    def acquire(self, name: str):
+        """
+        获取引擎实例（未加载时先加载），使用期间不会被卸载
+
+        用法:
+            with engine_pool.acquire("sensevoice") as engine:
+                engine.parse(...)
+        """
+        start = time.monotonic()
+        with self._lock:
+            entry = self._engines.get(name)
+            if entry is None:
+                raise RuntimeError(f"Engine not available: {name}")
+            cold = not entry.loaded
+            if cold:
+                self._load(entry)
+            entry.in_use += 1
+            instance = entry.instance
+
+        try:
+            yield instance
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                if cold:
+                    entry.cold_calls += 1
+                    entry.cold_seconds += elapsed
+                else:
+                    entry.warm_calls += 1
+                    entry.warm_seconds += elapsed
+
+    def _load(self, entry: _Engine):
+        """加载引擎并记录耗时与内存增量（调用方持有锁）"""
+        if entry.loaded:
+            return
+
+        # 为新引擎腾出空间：按上次加载时测得的占用预留，卸载任意未在使用的引擎（不要求达到空闲时长）
+        self.evict(force=True, reserve_mb=entry.footprint_mb)
+
+        rss_before = rss_mb()
+        gpu_before = gpu_allocated_mb()
+        start = time.monotonic()
+        instance = entry.loader()
+        load_seconds = time.monotonic() - start
+        rss_after = rss_mb()
+        gpu_after = gpu_allocated_mb()
+
+        entry.instance = instance
+        entry.loads += 1
+        entry.last_load_seconds = load_seconds
+        ENGINE_LOAD_SECONDS.labels(entry.name).observe(load_seconds)
+        entry.last_used = time.monotonic()
+        entry.rss_mb = max(0.0, rss_after - rss_before) if rss_before is not None and rss_after is not None else 0.0
+        # 框架在加载时才被导入的情况下，加载前的显存按 0 计
+        entry.gpu_mb = max(0.0, gpu_after - (gpu_before or 0.0)) if gpu_after is not None else 0.0
+
+        logger.info(
+            f"🔥 Engine {entry.name} loaded in {load_seconds:.1f}s "
+            f"(+{entry.rss_mb:.0f} MB RSS, +{entry.gpu_mb:.0f} MB GPU)"
+        )
+
+        # 首次加载前无法预知占用，加载后再按实测值检查一次
+        self.evict(force=True, keep=entry.name)
+
+    def unload(self, name: str) -> bool:
+        """
+        卸载引擎（正在使用中的引擎不会被卸载）
+
+        Returns:
+            bool: 是否实际卸载
+        """
+        with self._lock:
+            entry = self._engines.get(name)
+            if entry is None or not entry.loaded or entry.in_use > 0:
+                return False
+
+            instance, entry.instance = entry.instance, None
+            try:
+                if entry.unloader is not None:
+                    entry.unloader(instance)
+            except Exception as e:
+                logger.error(f"❌ Failed to unload engine {name}: {e}")
+            entry.unloads += 1
+
+        logger.info(f"🗑️  Engine {name} unloaded (~{entry.footprint_mb:.0f} MB freed)")
+        return True
+
+    def memory_pressure(self, reserve_mb: float = 0.0) -> Optional[str]:
+        """
+        检查是否存在内存压力
+
+        Args:
+            reserve_mb: 即将加载的引擎预计占用（计入引擎占用上限）
+
+        Returns:
+            压力原因描述，无压力时返回 None
+        """
+        if self.max_memory_mb > 0:
+            used = sum(e.footprint_mb for e in self._engines.values() if e.loaded) + reserve_mb
+            if used > self.max_memory_mb:
+                return f"engines use {used:.0f} MB > {self.max_memory_mb:.0f} MB"
+
+        if self.min_free_memory_mb > 0:
+            available = available_memory_mb()
+            if available is not None and available < self.min_free_memory_mb:
+                return f"available memory {available:.0f} MB < {self.min_free_memory_mb:.0f} MB"
+
+        if self.min_free_vram_mb > 0:
+            free_vram = gpu_free_mb()
+            if free_vram is not None and free_vram < self.min_free_vram_mb:
+                return f"free VRAM {free_vram:.0f} MB < {self.min_free_vram_mb:.0f} MB"
+
+        return None
+
+    def evict(self, force: bool = False, reserve_mb: float = 0.0, keep: Optional[str] = None) -> List[str]:
+        """
+        内存压力下按最近使用时间（LRU）卸载引擎，直到压力解除
+
+        Args:
+            force: False 时只卸载空闲超过 idle_seconds 的引擎（Worker 空闲巡检）；
+                   True 时卸载任意未在使用的引擎（加载新引擎前腾出空间）
+            reserve_mb: 即将加载的引擎预计占用
+            keep: 不参与卸载的引擎（刚加载完成的引擎）
+
+        Returns:
+            被卸载的引擎名称列表
+        """
+        evicted = []
+        with self._lock:
+            reason = self.memory_pressure(reserve_mb)
+            if reason is None:
+                return evicted
+
+            now = time.monotonic()
+            candidates = sorted(
+                (
+                    e
+                    for e in self._engines.values()
+                    if e.loaded
+                    and e.in_use == 0
+                    and e.name != keep
+                    and (force or now - e.last_used >= self.idle_seconds)
+                ),
+                key=lambda e: e.last_used,
+            )
+            for entry in candidates:
+                logger.info(f"🧹 Memory pressure ({reason}), evicting idle engine {entry.name}")
+                if self.unload(entry.name):
+                    evicted.append(entry.name)
+                reason = self.memory_pressure(reserve_mb)
+                if reason is None:
+                    break
+
+        return evicted
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各引擎的加载状态、内存占用和冷/热延迟统计"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                e.name: {
+                    "loaded": e.loaded,
+                    "in_use": e.in_use,
+                    "idle_seconds": round(now - e.last_used, 1) if e.loaded else None,
+                    # 最近一次加载时测得的占用（卸载后保留，用于下次加载前预留空间）
+                    "memory_mb": {"rss": round(e.rss_mb, 1), "gpu": round(e.gpu_mb, 1)},
+                    "loads": e.loads,
+                    "unloads": e.unloads,
+                    "last_load_seconds": round(e.last_load_seconds, 3),
+                    "cold_calls": e.cold_calls,
+                    "cold_avg_seconds": round(e.cold_seconds / e.cold_calls, 3) if e.cold_calls else None,
+                    "warm_calls": e.warm_calls,
+                    "warm_avg_seconds": round(e.warm_seconds / e.warm_calls, 3) if e.warm_calls else None,
+                }
+                for e in self._engines.values()
+            }
@@ -10,11 +10,16 @@ Worker 主动循环拉取任务并处理
 
 import os
 import json
+import shutil
 import sys
 import time
 import threading
 import signal
 import atexit
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Optional
 
@@ -87,7 +92,19 @@ from loguru import logger
 # 添加父目录到路径以导入 MinerU
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from task_db import TaskDB
+from task_queue import batch_options, create_task_queue
+from task_notifier import TaskNotifier
+from engine_pool import EnginePool
+from metrics_exporter import (
+    LEASES_RECLAIMED,
+    TASK_DURATION_SECONDS,
+    observe_claim,
+    prepare_multiprocess_dir,
+    start_metrics_server,
+)
+from memory_stats import peak_rss_mb, reset_peak_rss
+from task_metrics import TaskMetrics, build_metrics_record
+from result_files import find_result_files
 from mineru.cli.common import do_parse
 from mineru.utils.model_utils import get_vram, clean_memory
 
@@ -153,6 +170,91 @@ except ImportError as e:
     logger.info(f"ℹ️  Format engines not available (optional): {e}")
 
 
+def _no_progress(stage: str, done: int = 0, total: Optional[int] = None):
+    """未提供进度回调时使用的空实现"""
+
+
+def _mineru_lang(options: dict) -> str:
+    """MinerU 不支持 "auto" 语言，默认使用中文"""
+    lang = options.get("lang", "auto")
+    if lang == "auto":
+        lang = "ch"
+        logger.info("🌐 Language set to 'ch' (MinerU doesn't support 'auto')")
+    return lang
+
+
+def _count_pdf_pages(pdf_path: str) -> Optional[int]:
+    """统计 PDF 页数（按路径打开，不读入整个文件；PyMuPDF 不可用或解析失败时返回 None）"""
+    try:
+        import fitz
+
+        with fitz.open(pdf_path, filetype="pdf") as doc:
+            return doc.page_count
+    except Exception as e:
+        logger.debug(f"Unable to count PDF pages: {e}")
+        return None
+
+
+# 引擎池中各引擎预热后可直接处理的任务后端（Worker 向任务队列登记，用于引擎亲和调度）
+ENGINE_BACKENDS = {
+    "paddleocr-vl": ("paddleocr-vl",),
+    "sensevoice": ("sensevoice", "video"),
+}
+
+
+# auto 模式按扩展名路由到视频引擎的文件类型
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".flv", ".wmv")
+
+# 可参与跨任务微批的任务（走 MinerU Pipeline 的 PDF / 图片）
+BATCH_BACKENDS = ("pipeline", "auto")
+BATCH_FILE_EXTS = (".pdf", ".png", ".jpg", ".jpeg")
+
+
+def _readahead(file_path: str):
+    """提示内核预读文件到页缓存（Linux posix_fadvise，其他平台忽略），推理阶段读取文件时不再阻塞在磁盘 I/O"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _virtual_memory_bytes() -> Optional[int]:
+    """当前进程虚拟内存大小（字节，读取 /proc/self/status 的 VmSize，不支持的平台返回 None）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _dir_size(path: Path) -> int:
+    """统计结果目录大小（字节，用于结果缓存按容量淘汰）"""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _result_size(result_path: Optional[str]) -> Optional[int]:
+    """结果大小（字节，用于任务资源统计；没有结果或统计失败时返回 None）"""
+    if not result_path:
+        return None
+    try:
+        return _dir_size(Path(result_path))
+    except OSError:
+        return None
+
+
 class MinerUWorkerAPI(ls.LitAPI):
     """
     MinerU Tianshu Worker API
@@ -214,7 +316,34 @@ class MinerUWorkerAPI(ls.LitAPI):
         default_output = os.getenv("OUTPUT_PATH", "/app/output")
         self.output_dir = getattr(self.__class__, "_output_dir", default_output)
         self.poll_interval = getattr(self.__class__, "_poll_interval", 0.5)
+        self.max_poll_interval = max(getattr(self.__class__, "_max_poll_interval", 5.0), self.poll_interval)
         self.enable_worker_loop = getattr(self.__class__, "_enable_worker_loop", True)
+        # 大 PDF 分片：页数达到阈值时按页范围拆分为子任务，由多个 Worker 并行处理（0 表示禁用）
+        self.shard_min_pages = int(os.getenv("PDF_SHARD_MIN_PAGES", "200"))
+        self.shard_pages = max(1, int(os.getenv("PDF_SHARD_PAGES", "100")))
+        # 跨任务微批：队列中已有的多个小 PDF/图片任务合并为一次 do_parse 调用，保持 GPU 批次饱满（默认 1 即禁用）
+        self.max_batch_size = max(1, int(os.getenv("MINERU_BATCH_SIZE", "1")))
+        self.batch_max_pages = int(os.getenv("MINERU_BATCH_MAX_PAGES", "16"))
+        self.batch_doc_pages = int(os.getenv("MINERU_BATCH_DOC_PAGES", "3"))
+        # 预取：当前任务推理期间，预处理线程池提前认领并预处理后续任务（去水印、图片转 PDF、提取音轨、预读文件）
+        # 最多预取 WORKER_PREFETCH_DEPTH 个任务（0 表示禁用）
+        self.prefetch_depth = max(0, int(os.getenv("WORKER_PREFETCH_DEPTH", "0")))
+        # 任务隔离：fork 模式下每个任务在子进程中处理（写时复制共享已加载的模型），
+        # 子进程受内存上限（在继承的地址空间之上额外允许的 MB）和墙钟超时约束，异常文件只会拖垮子进程
+        self.task_isolation = os.getenv("TASK_ISOLATION", "none").lower()
+        self.task_memory_limit_mb = int(os.getenv("TASK_MEMORY_LIMIT_MB", "0"))
+        self.task_timeout = float(os.getenv("TASK_TIMEOUT_SECONDS", "0"))
+        if self.task_isolation == "fork" and not hasattr(os, "fork"):
+            logger.warning("⚠️  TASK_ISOLATION=fork is not supported on this platform, running tasks in-process")
+            self.task_isolation = "none"
+        elif self.task_isolation == "fork" and "cuda" in str(device).lower():
+            # CUDA 上下文不能在 fork 出的子进程中使用，且 CUDA 预留的巨大虚拟地址空间与 RLIMIT_AS 冲突
+            logger.warning("⚠️  TASK_ISOLATION=fork is not supported on CUDA devices, running tasks in-process")
+            self.task_isolation = "none"
+        if self.task_isolation == "fork" and self.max_batch_size > 1:
+            # 合并的 do_parse 在当前进程中执行，不受子进程的内存上限和超时约束
+            logger.warning("⚠️  Micro-batching is disabled with TASK_ISOLATION=fork")
+            self.max_batch_size = 1
 
         # 创建输出目录
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
@@ -236,13 +365,14 @@ class MinerUWorkerAPI(ls.LitAPI):
         db_path_str = str(db_path.absolute())
         logger.info(f"📊 Database path (absolute): {db_path_str}")
 
-        self.task_db = TaskDB(db_path_str)
+        # 根据 TASK_QUEUE_BACKEND 选择队列后端（sqlite 默认 / redis）
+        self.task_db = create_task_queue(db_path_str)
 
         # 验证数据库连接并输出初始统计
         try:
             stats = self.task_db.get_queue_stats()
             logger.info(f"📊 Database initialized: {db_path} (exists: {db_path.exists()})")
-            logger.info(f"📊 TaskDB.db_path: {self.task_db.db_path}")
+            logger.info(f"📊 Task queue: {self.task_db.BACKEND_NAME} ({self.task_db.describe()})")
             logger.info(f"📊 Initial queue stats: {stats}")
         except Exception as e:
             logger.error(f"❌ Failed to initialize database or get stats: {e}")
@@ -257,12 +387,39 @@ class MinerUWorkerAPI(ls.LitAPI):
         pid = os.getpid()
         self.worker_id = f"tianshu-{hostname}-{device}-{pid}"
 
+        # 任务租约心跳：处理期间定期续约，Worker 崩溃后租约很快过期，任务被重新放回队列
+        self._leased_tasks = set()
+        self._lease_lock = threading.Lock()
+        self._heartbeat_stop = threading.Event()
+        self.heartbeat_interval = max(1.0, self.task_db.lease_seconds / 3)
+        # 已登记的预热后端（setup 完成首次登记前为 None，心跳线程不刷新登记）
+        self._advertised_backends = None
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self.heartbeat_thread.start()
+
+        # 任务唤醒通知：空闲时阻塞等待 API Server 的新任务信号，不可用时退回退避轮询
+        self.task_notifier = TaskNotifier()
+        if self.enable_worker_loop:
+            self.task_notifier.listen(self.worker_id)
+
         # 初始化可选的处理引擎
         self.markitdown = MarkItDown() if MARKITDOWN_AVAILABLE else None
-        self.paddleocr_vl_engine = None  # 延迟加载
-        self.sensevoice_engine = None  # 延迟加载
-        self.video_engine = None  # 延迟加载
         self.watermark_handler = None  # 延迟加载
+        self._watermark_lock = threading.Lock()
+
+        # 预取队列：[(task, Future[prepared])]，按认领顺序处理
+        self._prefetched = deque()
+        self._prefetch_pool = (
+            ThreadPoolExecutor(max_workers=self.prefetch_depth, thread_name_prefix="prefetch")
+            if self.prefetch_depth > 0
+            else None
+        )
+
+        # 引擎池：PaddleOCR-VL / SenseVoice 按需加载，ENGINE_PRELOAD 声明的引擎在启动时预热，
+        # 内存压力下按 LRU 卸载空闲引擎
+        self.engine_pool = EnginePool.from_env()
+        self._register_engines()
+        self.engine_preload = [n.strip() for n in os.getenv("ENGINE_PRELOAD", "").split(",") if n.strip()]
 
         logger.info("=" * 60)
         logger.info(f"🚀 Worker Setup: {self.worker_id}")
@@ -272,7 +429,32 @@ class MinerUWorkerAPI(ls.LitAPI):
         logger.info(f"🗃️  Database: {db_path}")
         logger.info(f"🔄 Worker Loop: {'Enabled' if self.enable_worker_loop else 'Disabled'}")
         if self.enable_worker_loop:
-            logger.info(f"⏱️  Poll Interval: {self.poll_interval}s")
+            logger.info(f"⏱️  Poll Interval: {self.poll_interval}s (max {self.max_poll_interval}s when idle)")
+            if self.task_notifier.listening:
+                logger.info(f"🔔 Task Notifier: {self.task_notifier.sock_path}")
+            else:
+                logger.info("🔔 Task Notifier: Unavailable (fallback to backoff polling)")
+        logger.info(f"💓 Task Lease: {self.task_db.lease_seconds}s (heartbeat every {self.heartbeat_interval:.0f}s)")
+        if self.shard_min_pages > 0:
+            logger.info(f"✂️  PDF Sharding: >= {self.shard_min_pages} pages, {self.shard_pages} pages per shard")
+        else:
+            logger.info("✂️  PDF Sharding: Disabled")
+        pool = self.engine_pool
+        logger.info(
+            f"🔥 Engine Pool: {', '.join(pool.names) or 'none'} "
+            f"(preload: {', '.join(self.engine_preload) or 'none'}, idle {pool.idle_seconds:.0f}s)"
+        )
+        if self.task_isolation == "fork":
+            memory_limit = f"+{self.task_memory_limit_mb} MB" if self.task_memory_limit_mb > 0 else "unlimited"
+            timeout = f"{self.task_timeout:.0f}s" if self.task_timeout > 0 else "unlimited"
+            logger.info(f"🧱 Task Isolation: fork (memory {memory_limit}, timeout {timeout})")
+        if self.prefetch_depth > 0:
+            logger.info(f"⏩ Prefetch: up to {self.prefetch_depth} tasks preprocessed ahead of inference")
+        if self.max_batch_size > 1:
+            logger.info(
+                f"📦 Micro-batching: up to {self.max_batch_size} tasks / {self.batch_max_pages} pages "
+                f"(docs <= {self.batch_doc_pages} pages)"
+            )
         logger.info("")
 
         # 打印可用的引擎
@@ -296,6 +478,12 @@ class MinerUWorkerAPI(ls.LitAPI):
                 logger.error(f"❌ Failed to initialize watermark removal engine: {e}")
                 self.watermark_handler = None
 
+        # 预加载声明的引擎（在 Worker 循环启动前完成，首个任务不再承担冷启动）
+        if self.engine_preload:
+            logger.info(f"🔥 Preloading engines: {', '.join(self.engine_preload)}")
+            self.engine_pool.preload(self.engine_preload)
+        self._advertise_engines(force=True)
+
         logger.info("✅ Worker ready")
         logger.info(f"   Device: {device}")
         if "cuda" in str(device).lower():
@@ -322,6 +510,11 @@ class MinerUWorkerAPI(ls.LitAPI):
 
         这个循环在后台线程中运行，不断检查是否有新任务
         一旦有任务，立即处理，处理完成后继续循环
+
+        空闲等待策略：
+            - 通知可用：阻塞等待 TaskNotifier 唤醒（最长 max_poll_interval 秒兜底轮询一次）
+            - 通知不可用：指数退避轮询，从 poll_interval 逐步翻倍到 max_poll_interval
+            - 拉取到任务或收到通知后，等待间隔重置为 poll_interval
         """
         logger.info(f"🔁 {self.worker_id} started task polling loop")
 
@@ -329,41 +522,71 @@ class MinerUWorkerAPI(ls.LitAPI):
         try:
             stats = self.task_db.get_queue_stats()
             logger.info(f"📊 Initial queue stats: {stats}")
-            logger.info(f"🗃️  Database path: {self.task_db.db_path}")
+            logger.info(f"🗃️  Task queue: {self.task_db.BACKEND_NAME} ({self.task_db.describe()})")
         except Exception as e:
             logger.error(f"❌ Failed to get initial queue stats: {e}")
 
         loop_count = 0
-        last_stats_log = 0
-        stats_log_interval = 20  # 每20次循环输出一次统计信息（约10秒）
+        idle_interval = self.poll_interval
+        last_stats_log = time.monotonic()
+        last_idle_log = time.monotonic()
+        stats_log_interval = 10  # 空闲时每10秒检查一次统计信息
+        idle_log_interval = 50  # 每50秒输出一次空闲日志
 
         while self.running:
             try:
                 loop_count += 1
 
-                # 拉取任务（原子操作，防止重复处理）
-                task = self.task_db.get_next_task(worker_id=self.worker_id)
+                # 引擎加载/卸载后立即更新登记，认领时才能按最新的预热引擎亲和调度
+                self._advertise_engines()
+
+                # 拉取任务（优先取已预取的任务；认领本身是原子操作，防止重复处理）
+                task, prefetched = self._next_task()
 
                 if task:
+                    idle_interval = self.poll_interval
                     task_id = task["task_id"]
                     self.current_task_id = task_id
                     logger.info(
                         f"📥 {self.worker_id} pulled task: {task_id} (file: {task.get('file_name', 'unknown')})"
                     )
 
+                    reset_peak_rss()
                     try:
-                        # 处理任务
-                        self._process_task(task)
-                        logger.info(f"✅ {self.worker_id} completed task: {task_id}")
+                        # 小 PDF/图片任务尝试与其他兼容任务合并为一次 do_parse（已预取的任务不参与）
+                        batch = self._collect_batch(task) if self.max_batch_size > 1 and prefetched is None else []
+                        if len(batch) > 1:
+                            self._process_batch(batch)
+                        else:
+                            # 推理前补充预取队列，后续任务的预处理与本任务的推理并行
+                            self._fill_prefetch()
+                            # 处理任务
+                            self._execute_task(task, prefetched=prefetched)
+                            logger.info(f"✅ {self.worker_id} completed task: {task_id}")
                     except Exception as e:
                         logger.error(f"❌ {self.worker_id} failed task {task_id}: {e}")
                         logger.exception(e)
                     finally:
                         self.current_task_id = None
+                        peak_rss = peak_rss_mb()
+                        if peak_rss is not None:
+                            logger.info(f"📈 {self.worker_id} peak RSS for task {task_id}: {peak_rss:.0f} MB")
                 else:
                     # 没有任务，空闲等待
                     # 定期输出统计信息以便诊断
-                    if loop_count - last_stats_log >= stats_log_interval:
+                    now = time.monotonic()
+                    if now - last_stats_log >= stats_log_interval:
+                        # 回收崩溃 Worker 遗留的过期租约（不依赖可选的调度器）
+                        try:
+                            reclaimed = self.task_db.reclaim_expired_leases()
+                            if reclaimed > 0:
+                                LEASES_RECLAIMED.inc(reclaimed)
+                                logger.warning(f"♻️  {self.worker_id} reclaimed {reclaimed} tasks with expired leases")
+                                last_stats_log = now
+                                continue
+                        except Exception as e:
+                            logger.error(f"❌ Failed to reclaim expired leases: {e}")
+
                         try:
                             stats = self.task_db.get_queue_stats()
                             pending = stats.get("pending", 0)
@@ -376,51 +599,359 @@ class MinerUWorkerAPI(ls.LitAPI):
                                     f"Processing: {processing}, Completed: {stats.get('completed', 0)}, "
                                     f"Failed: {stats.get('failed', 0)}"
                                 )
-                            elif loop_count % 100 == 0:  # 每50秒（100次循环）输出一次
+                            elif now - last_idle_log >= idle_log_interval:
                                 logger.info(
                                     f"💤 {self.worker_id} idle (loop #{loop_count}): "
                                     f"No pending tasks. Queue stats: {stats}"
                                 )
+                                last_idle_log = now
                         except Exception as e:
                             logger.error(f"❌ Failed to get queue stats: {e}")
 
-                        last_stats_log = loop_count
+                        last_stats_log = now
+
+                        # 内存压力下卸载空闲超时的引擎
+                        try:
+                            self.engine_pool.evict()
+                        except Exception as e:
+                            logger.error(f"❌ Failed to evict idle engines: {e}")
 
-                    time.sleep(self.poll_interval)
+                    idle_interval = self._wait_for_task(idle_interval)
 
             except Exception as e:
                 logger.error(f"❌ Worker loop error (loop #{loop_count}): {e}")
                 logger.exception(e)
                 time.sleep(self.poll_interval)
 
-    def _process_task(self, task: dict):
+    def _next_task(self):
+        """
+        取下一个要处理的任务
+
+        Returns:
+            (task, prefetched): prefetched 为预处理结果的 Future，任务未经预取时为 None
+        """
+        if self._prefetched:
+            return self._prefetched.popleft()
+        return self._claim_task(), None
+
+    def _claim_task(self) -> Optional[dict]:
+        """认领下一个任务，记录认领耗时和任务的排队时间"""
+        start = time.monotonic()
+        task = self.task_db.get_next_task(worker_id=self.worker_id)
+        observe_claim(task, time.monotonic() - start)
+        return task
+
+    def _fill_prefetch(self):
+        """认领后续任务并提交到预处理线程池，预取队列最多保持 prefetch_depth 个任务，避免囤积任务"""
+        while self._prefetch_pool is not None and len(self._prefetched) < self.prefetch_depth:
+            task = self._claim_task()
+            if not task:
+                return
+
+            # 预取的任务在等待期间同样由心跳线程续约
+            with self._lease_lock:
+                self._leased_tasks.add(task["task_id"])
+            self.task_db.clear_progress(task["task_id"])
+            progress = self._progress_reporter(task["task_id"])
+            self._prefetched.append((task, self._prefetch_pool.submit(self._prepare_task, task, progress)))
+            logger.info(f"⏩ {self.worker_id} prefetching task: {task['task_id']} (file: {task.get('file_name')})")
+
+    def _release_prefetched(self):
+        """将尚未处理的预取任务放回队列（Worker 退出时调用）"""
+        while self._prefetched:
+            task, future = self._prefetched.popleft()
+            try:
+                self._cleanup_prepared(future.result())
+            except Exception:
+                pass
+            self._release_lease(task["task_id"])
+            # 只放回仍由本 Worker 持有的任务：租约已被回收或任务已取消时不能覆盖其状态
+            if self.task_db.release_task(task["task_id"], self.worker_id):
+                logger.info(f"↩️  {self.worker_id} released prefetched task: {task['task_id']}")
+
+    def _wait_for_task(self, idle_interval: float) -> float:
+        """
+        空闲等待新任务
+
+        Args:
+            idle_interval: 当前的轮询等待间隔（秒）
+
+        Returns:
+            float: 下一次空闲时使用的等待间隔
+        """
+        if self.task_notifier.listening:
+            if self.task_notifier.wait(timeout=self.max_poll_interval):
+                return self.poll_interval
+            return self.max_poll_interval
+
+        time.sleep(idle_interval)
+        return min(idle_interval * 2, self.max_poll_interval)
+
+    def _advertise_engines(self, force: bool = False):
+        """向任务队列登记 Worker 心跳及已预热的处理后端（登记内容变化或 force 时写入）"""
+        backends = sorted(
+            {backend for name in self.engine_pool.loaded_names for backend in ENGINE_BACKENDS.get(name, ())}
+        )
+        if not force and backends == self._advertised_backends:
+            return
+
+        try:
+            self.task_db.register_worker(self.worker_id, backends)
+            self._advertised_backends = backends
+        except Exception as e:
+            logger.error(f"❌ {self.worker_id} failed to register warm engines: {e}")
+
+    def _heartbeat_loop(self):
+        """租约心跳线程：为正在处理的任务定期续约"""
+        while not self._heartbeat_stop.wait(self.heartbeat_interval):
+            # Worker 心跳（同时刷新已预热的后端登记）
+            if self._advertised_backends is not None:
+                self._advertise_engines(force=True)
+
+            with self._lease_lock:
+                task_ids = list(self._leased_tasks)
+            if not task_ids:
+                continue
+
+            try:
+                renewed = set(self.task_db.renew_leases(self.worker_id, task_ids))
+            except Exception as e:
+                logger.error(f"❌ {self.worker_id} lease heartbeat failed: {e}")
+                continue
+
+            with self._lease_lock:
+                # 续约期间已处理完成的任务不算丢失
+                lost = [task_id for task_id in task_ids if task_id not in renewed and task_id in self._leased_tasks]
+                self._leased_tasks.difference_update(lost)
+            for task_id in lost:
+                logger.warning(f"⚠️  {self.worker_id} lost lease on task {task_id} (reclaimed or cancelled)")
+
+    def _progress_reporter(self, task_id: str, metrics: Optional[TaskMetrics] = None):
+        """
+        创建任务进度回调 progress(stage, done=0, total=None)
+
+        同一阶段每秒最多写入一次（切换阶段或阶段完成时立即写入），写入失败不影响任务处理。
+        传入 metrics 时同时记录阶段切换，用于统计各阶段耗时
+        """
+        state = {"stage": None, "last": 0.0}
+
+        def progress(stage: str, done: int = 0, total: Optional[int] = None):
+            if metrics is not None:
+                metrics.stage(stage, total)
+            now = time.monotonic()
+            finished = total is not None and done >= total
+            if stage == state["stage"] and not finished and now - state["last"] < 1.0:
+                return
+            state["stage"], state["last"] = stage, now
+            try:
+                self.task_db.update_progress(task_id, stage, done, total)
+            except Exception as e:
+                logger.debug(f"Progress update failed for {task_id}: {e}")
+
+        return progress
+
+    def _release_lease(self, task_id: str):
+        """停止为任务续约"""
+        with self._lease_lock:
+            self._leased_tasks.discard(task_id)
+
+    def _cache_result(self, task: dict, result_path: str):
+        """将完成的结果登记到结果缓存（失败不影响任务本身）"""
+        if not task.get("cache_key") or not result_path:
+            return
+        try:
+            path = Path(result_path)
+            if path.exists():
+                self.task_db.put_cached_result(task["cache_key"], str(path), _dir_size(path))
+        except Exception as e:
+            logger.debug(f"Result cache update failed for {task['task_id']}: {e}")
+
+    def _record_metrics(self, metrics: dict):
+        """写入任务资源统计并记录处理耗时指标（失败不影响任务本身）"""
+        if metrics["wall_seconds"] is not None:
+            TASK_DURATION_SECONDS.labels(metrics["backend"], metrics["status"]).observe(metrics["wall_seconds"])
+        try:
+            self.task_db.record_task_metrics(metrics)
+        except Exception as e:
+            logger.debug(f"Task metrics update failed for {metrics['task_id']}: {e}")
+
+    def _execute_task(self, task: dict, prefetched: Optional[Future] = None):
+        """执行任务：TASK_ISOLATION=fork 时在子进程中处理，否则在当前进程中处理"""
+        if self.task_isolation == "fork":
+            self._process_task_isolated(task, prefetched=prefetched)
+        else:
+            self._process_task(task, prefetched=prefetched)
+
+    def _process_task_isolated(self, task: dict, prefetched: Optional[Future] = None) -> dict:
+        """
+        在 fork 出的子进程中处理任务
+
+        - 子进程通过写时复制共享父进程已加载的模型（MinerU 模型、ENGINE_PRELOAD 预热的引擎），
+          子进程内新加载的引擎随子进程退出而释放
+        - 子进程的 RLIMIT_AS 为继承的地址空间 + TASK_MEMORY_LIMIT_MB，超限时分配失败而不是触发 OOM Killer
+        - 父进程按 TASK_TIMEOUT_SECONDS 等待，超时后 SIGKILL 子进程
+        - 子进程自行更新任务状态和资源统计；被杀或崩溃时由父进程将任务标记为失败，并按 wait4 记录资源统计
+
+        Returns:
+            子进程资源使用：{"wall_seconds", "user_seconds", "system_seconds", "max_rss_mb", "exit_code"}
+
+        Raises:
+            RuntimeError: 任务在子进程中失败、超时或子进程异常退出
+        """
+        task_id = task["task_id"]
+
+        # 预处理线程不会进入子进程，fork 前先等待预处理完成
+        if prefetched is not None:
+            wait([prefetched])
+
+        # 子进程处理期间由父进程的心跳线程续约
+        with self._lease_lock:
+            self._leased_tasks.add(task_id)
+
+        start = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            self._run_forked_task(task, prefetched)
+
+        try:
+            status, rusage, timed_out = self._wait_forked_task(pid)
+        finally:
+            self._release_lease(task_id)
+
+        usage = {
+            "wall_seconds": round(time.monotonic() - start, 3),
+            "user_seconds": round(rusage.ru_utime, 3),
+            "system_seconds": round(rusage.ru_stime, 3),
+            "max_rss_mb": round(rusage.ru_maxrss / 1024, 1),  # Linux 下 ru_maxrss 单位为 KB
+            "exit_code": os.waitstatus_to_exitcode(status),
+        }
+        logger.info(
+            f"📊 {self.worker_id} task {task_id} resources: wall {usage['wall_seconds']:.1f}s, "
+            f"cpu {usage['user_seconds']:.1f}s user / {usage['system_seconds']:.1f}s sys, "
+            f"peak RSS {usage['max_rss_mb']:.0f} MB, exit code {usage['exit_code']}"
+        )
+
+        if usage["exit_code"] == 0:
+            return usage
+
+        if timed_out:
+            error = f"TimeoutError: Task exceeded {self.task_timeout:.0f}s wall-clock limit"
+        elif os.WIFSIGNALED(status):
+            error = f"Task process killed by signal {os.WTERMSIG(status)}"
+            if os.WTERMSIG(status) == signal.SIGKILL:
+                error += " (possibly out of memory)"
+        else:
+            error = f"Task process exited with code {usage['exit_code']}"
+
+        # 子进程未能记录结果（被杀或崩溃）时由父进程标记失败；正常失败的任务子进程已记录错误信息
+        current = self.task_db.get_task(task_id)
+        if current and current["status"] == "processing" and current["worker_id"] == self.worker_id:
+            self.task_db.update_task_status(
+                task_id=task_id, status="failed", error_message=error, worker_id=self.worker_id
+            )
+            self._record_metrics(
+                build_metrics_record(
+                    task,
+                    "failed",
+                    self.worker_id,
+                    wall_seconds=usage["wall_seconds"],
+                    cpu_user_seconds=usage["user_seconds"],
+                    cpu_system_seconds=usage["system_seconds"],
+                    peak_rss_mb=usage["max_rss_mb"],
+                )
+            )
+        elif current and current["status"] == "failed" and current["error_message"]:
+            error = current["error_message"]
+        if prefetched is not None:
+            self._cleanup_prepared(prefetched.result())
+        raise RuntimeError(error)
+
+    def _run_forked_task(self, task: dict, prefetched: Optional[Future]):
+        """子进程入口：设置资源限制后处理任务，结束时直接退出（不执行父进程的 atexit 和清理逻辑）"""
+        exit_code = 1
+        try:
+            if self.task_memory_limit_mb > 0:
+                import resource
+
+                inherited = _virtual_memory_bytes() or 0
+                limit = inherited + self.task_memory_limit_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+            # 只有当前线程进入子进程，其他线程持有的锁在子进程中永远不会释放，需要重建
+            self._lease_lock = threading.Lock()
+            self._leased_tasks = set()
+            self._watermark_lock = threading.Lock()
+            # 子进程内认领的分片子任务由子进程自己的心跳线程续约（Worker 登记仍由父进程负责）
+            self._advertised_backends = None
+            self._heartbeat_stop = threading.Event()
+            threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+            self._process_task(task, prefetched=prefetched)
+            exit_code = 0
+        except BaseException as e:
+            logger.error(f"❌ Task {task['task_id']} failed in isolated process: {type(e).__name__}: {e}")
+        finally:
+            os._exit(exit_code)
+
+    def _wait_forked_task(self, pid: int):
+        """
+        等待子进程结束，超过 TASK_TIMEOUT_SECONDS 时强制结束
+
+        Returns:
+            (status, rusage, timed_out)
+        """
+        deadline = time.monotonic() + self.task_timeout if self.task_timeout > 0 else None
+        while True:
+            waited_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited_pid == pid:
+                return status, rusage, False
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning(f"⏰ {self.worker_id} task process {pid} exceeded {self.task_timeout:.0f}s, killing")
+                os.kill(pid, signal.SIGKILL)
+                _, status, rusage = os.wait4(pid, 0)
+                return status, rusage, True
+            time.sleep(0.1)
+
+    def _process_task(self, task: dict, prefetched: Optional[Future] = None):
         """
         处理单个任务
 
         Args:
             task: 任务字典（从数据库拉取）
+            prefetched: 预处理线程池中该任务的预处理结果（未预取时在此同步预处理）
         """
         task_id = task["task_id"]
         file_path = task["file_path"]
         options = json.loads(task.get("options", "{}"))
+        prepared = None
+        status, result_path = "failed", None
+
+        # 处理期间由心跳线程续约
+        with self._lease_lock:
+            self._leased_tasks.add(task_id)
+
+        # 阶段进度（重新处理的任务先清除上一次的进度；预取的任务在认领时已清除，保留预处理阶段的进度）
+        metrics = TaskMetrics()
+        progress = self._progress_reporter(task_id, metrics)
 
         try:
+            if prefetched is None:
+                self.task_db.clear_progress(task_id)
+
             # 根据 backend 选择处理方式（从 task 字段读取，不是从 options 读取）
             backend = task.get("backend", "auto")
 
-            # 检查文件扩展名
+            # 检查文件扩展名（按原始文件路由，预处理可能把图片转换为 PDF）
             file_ext = Path(file_path).suffix.lower()
 
-            # 0. 可选：预处理 - 去除水印（仅 PDF，作为预处理步骤）
-            if file_ext == ".pdf" and options.get("remove_watermark", False) and self.watermark_handler:
-                logger.info(f"🎨 [Preprocessing] Removing watermark from PDF: {file_path}")
-                try:
-                    cleaned_pdf_path = self._preprocess_remove_watermark(file_path, options)
-                    file_path = str(cleaned_pdf_path)  # 使用去水印后的文件继续处理
-                    logger.info(f"✅ [Preprocessing] Watermark removed, continuing with: {file_path}")
-                except Exception as e:
-                    logger.warning(f"⚠️ [Preprocessing] Watermark removal failed: {e}, continuing with original file")
-                    # 继续使用原文件处理
+            # 0. 预处理（去水印、图片转 PDF、提取音轨）：预取时已在预处理线程池中完成
+            if prefetched is not None:
+                prepared = prefetched.result()
+                metrics.add_stage("prefetch", prepared["prepare_seconds"])
+            else:
+                metrics.stage("prepare")
+                prepared = self._prepare_task(task, progress)
+            file_path = prepared["file_path"]
 
             # 统一的引擎路由逻辑：优先使用用户指定的 backend，否则自动选择
             result = None  # 初始化 result
@@ -430,26 +961,26 @@ class MinerUWorkerAPI(ls.LitAPI):
                 if not SENSEVOICE_AVAILABLE:
                     raise ValueError("SenseVoice engine is not available")
                 logger.info(f"🎤 Processing with SenseVoice: {file_path}")
-                result = self._process_audio(file_path, options)
+                result = self._process_audio(file_path, options, progress=progress)
 
             # 3. 用户指定了视频引擎
             elif backend == "video":
                 if not VIDEO_ENGINE_AVAILABLE:
                     raise ValueError("Video processing engine is not available")
                 logger.info(f"🎬 Processing with video engine: {file_path}")
-                result = self._process_video(file_path, options)
+                result = self._process_video(file_path, options, progress=progress, audio_path=prepared["audio_path"])
 
             # 4. 用户指定了 PaddleOCR-VL
             elif backend == "paddleocr-vl":
                 if not PADDLEOCR_VL_AVAILABLE:
                     raise ValueError("PaddleOCR-VL engine is not available")
                 logger.info(f"🔍 Processing with PaddleOCR-VL: {file_path}")
-                result = self._process_with_paddleocr_vl(file_path, options)
+                result = self._process_with_paddleocr_vl(file_path, options, progress=progress)
 
             # 6. 用户指定了 MinerU Pipeline
             elif backend == "pipeline":
                 logger.info(f"🔧 Processing with MinerU Pipeline: {file_path}")
-                result = self._process_with_mineru(file_path, options)
+                result = self._process_with_mineru(file_path, options, progress=progress, task=task)
 
             # 7. auto 模式：根据文件类型自动选择引擎
             elif backend == "auto":
@@ -461,17 +992,19 @@ class MinerUWorkerAPI(ls.LitAPI):
                 # 7.2 检查是否是音频文件
                 elif file_ext in [".wav", ".mp3", ".flac", ".m4a", ".ogg"] and SENSEVOICE_AVAILABLE:
                     logger.info(f"🎤 [Auto] Processing audio file: {file_path}")
-                    result = self._process_audio(file_path, options)
+                    result = self._process_audio(file_path, options, progress=progress)
 
                 # 7.3 检查是否是视频文件
-                elif file_ext in [".mp4", ".avi", ".mkv", ".mov", ".flv", ".wmv"] and VIDEO_ENGINE_AVAILABLE:
+                elif file_ext in VIDEO_EXTENSIONS and VIDEO_ENGINE_AVAILABLE:
                     logger.info(f"🎬 [Auto] Processing video file: {file_path}")
-                    result = self._process_video(file_path, options)
+                    result = self._process_video(
+                        file_path, options, progress=progress, audio_path=prepared["audio_path"]
+                    )
 
                 # 7.4 默认使用 MinerU Pipeline 处理 PDF/图片
                 elif file_ext in [".pdf", ".png", ".jpg", ".jpeg"]:
                     logger.info(f"🔧 [Auto] Processing with MinerU Pipeline: {file_path}")
-                    result = self._process_with_mineru(file_path, options)
+                    result = self._process_with_mineru(file_path, options, progress=progress, task=task)
 
                 # 7.5 兜底：Office 文档/文本/HTML 使用 MarkItDown（如果可用）
                 elif (
@@ -515,13 +1048,22 @@ class MinerUWorkerAPI(ls.LitAPI):
             if result is None:
                 raise ValueError(f"No result generated for backend: {backend}, file: {file_path}")
 
-            # 更新任务状态为完成
-            self.task_db.update_task_status(
+            # 更新任务状态为完成（校验 worker_id：租约已被回收的任务不会被覆盖）
+            status, result_path = "completed", result["result_path"]
+            markdown_path, json_path = find_result_files(result_path)
+            self._release_lease(task_id)
+            if not self.task_db.update_task_status(
                 task_id=task_id,
                 status="completed",
                 result_path=result["result_path"],
                 error_message=None,
-            )
+                worker_id=self.worker_id,
+                markdown_path=markdown_path,
+                json_path=json_path,
+            ):
+                logger.warning(f"⚠️  {self.worker_id} no longer owns task {task_id}, completion not recorded")
+            else:
+                self._cache_result(task, result["result_path"])
 
             # 清理显存（如果是 GPU）
             if "cuda" in str(self.device).lower():
@@ -530,64 +1072,169 @@ class MinerUWorkerAPI(ls.LitAPI):
         except Exception as e:
             # 更新任务状态为失败
             error_msg = f"{type(e).__name__}: {str(e)}"
-            self.task_db.update_task_status(task_id=task_id, status="failed", result_path=None, error_message=error_msg)
+            self._release_lease(task_id)
+            self.task_db.update_task_status(
+                task_id=task_id, status="failed", result_path=None, error_message=error_msg, worker_id=self.worker_id
+            )
             raise
+        finally:
+            self._release_lease(task_id)
+            self._cleanup_prepared(prepared)
+            self._record_metrics(metrics.finish(task, status, self.worker_id, output_bytes=_result_size(result_path)))
+            if task.get("parent_task_id"):
+                # 分片结束：唤醒等待分片结果的父任务 Worker（见 _wait_for_shards）
+                self.task_notifier.notify()
+
+    def _prepare_task(self, task: dict, progress=None) -> dict:
+        """
+        预处理阶段：推理前的 CPU/IO 准备工作
+
+        - 去除水印（仅 PDF，options.remove_watermark）
+        - 图片转 PDF（走 MinerU 的图片，do_parse 只接受 PDF）
+        - 提取视频音轨（ffmpeg）
+        - 预读待处理文件到页缓存
+
+        预取开启时在预处理线程池中执行，与当前任务的推理并行；否则由 _process_task 同步调用
+
+        Returns:
+            {"file_path": 推理阶段处理的文件, "audio_path": 已提取的音轨（仅视频）,
+             "temp_files": 任务结束后删除的临时文件, "prepare_seconds": 预处理耗时}
+        """
+        start = time.monotonic()
+        progress = progress or _no_progress
+        file_path = task["file_path"]
+        options = json.loads(task.get("options") or "{}")
+        backend = task.get("backend", "auto")
+        file_ext = Path(file_path).suffix.lower()
+        prepared = {"file_path": file_path, "audio_path": None, "temp_files": []}
+
+        if file_ext == ".pdf" and options.get("remove_watermark", False) and self.watermark_handler:
+            logger.info(f"🎨 [Preprocessing] Removing watermark from PDF: {file_path}")
+            progress("watermark_removal")
+            try:
+                # 去水印模型不保证线程安全，多个预取任务串行执行
+                with self._watermark_lock:
+                    cleaned_pdf_path = self._preprocess_remove_watermark(file_path, options)
+                prepared["file_path"] = str(cleaned_pdf_path)  # 使用去水印后的文件继续处理
+                logger.info(f"✅ [Preprocessing] Watermark removed, continuing with: {cleaned_pdf_path}")
+            except Exception as e:
+                logger.warning(f"⚠️ [Preprocessing] Watermark removal failed: {e}, continuing with original file")
+                # 继续使用原文件处理
+
+        elif file_ext in (".png", ".jpg", ".jpeg") and backend in ("pipeline", "auto"):
+            import img2pdf
+
+            # 转换结果保留原文件名，输出目录和结果文件名与直接处理图片时一致
+            temp_dir = Path(tempfile.mkdtemp(prefix=f"tianshu-{task['task_id']}-"))
+            pdf_path = temp_dir / f"{Path(file_path).stem}.pdf"
+            try:
+                with open(pdf_path, "wb") as out:
+                    img2pdf.convert(file_path, outputstream=out)
+            except Exception as e:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                logger.error(f"❌ Image conversion failed: {e}")
+                raise ValueError(f"Failed to convert image to PDF: {e}")
+            prepared["file_path"] = str(pdf_path)
+            prepared["temp_files"].append(temp_dir)
+
+        elif VIDEO_ENGINE_AVAILABLE and (backend == "video" or (backend == "auto" and file_ext in VIDEO_EXTENSIONS)):
+            from video_engines import VideoProcessingEngine
+
+            progress("extract_audio", 0, None)
+            audio_path = VideoProcessingEngine().extract_audio(video_path=file_path, audio_format="wav")
+            prepared["audio_path"] = audio_path
+            if not options.get("keep_audio", False):
+                prepared["temp_files"].append(Path(audio_path))
+
+        _readahead(prepared["file_path"])
+        prepared["prepare_seconds"] = time.monotonic() - start
+        return prepared
+
+    def _cleanup_prepared(self, prepared: Optional[dict]):
+        """删除预处理阶段产生的临时文件"""
+        if not prepared:
+            return
+        for path in prepared["temp_files"]:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
 
-    def _process_with_mineru(self, file_path: str, options: dict) -> dict:
+    def _process_with_mineru(self, file_path: str, options: dict, progress=None, task: dict = None) -> dict:
         """
         使用 MinerU 处理文档
 
         注意：MinerU 的 do_parse 只接受 PDF 格式，图片需要先转换为 PDF
+        do_parse 不提供逐页回调，进度按 loading -> parsing(页数) -> collecting 阶段上报
+        页数达到分片阈值的 PDF 拆分为子任务并行处理（见 _process_sharded）
         """
-        import img2pdf
+        progress = progress or _no_progress
+        progress("loading")
 
         file_stem = Path(file_path).stem
-        file_ext = Path(file_path).suffix.lower()
         output_dir = Path(self.output_dir) / file_stem
+        if "shard_index" in options:
+            # 分片子任务与父任务处理同一个文件，输出到父任务目录下的独立子目录
+            output_dir = output_dir / "shards" / f"{options['shard_index']:04d}"
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 读取文件为字节
-        with open(file_path, "rb") as f:
-            file_bytes = f.read()
+        lang = _mineru_lang(options)
 
-        # MinerU 的 do_parse 只支持 PDF 格式
-        # 图片文件需要先转换为 PDF
-        if file_ext in [".png", ".jpg", ".jpeg"]:
-            logger.info("🖼️  Converting image to PDF for MinerU processing...")
-            try:
-                pdf_bytes = img2pdf.convert(file_bytes)
-                file_name = f"{file_stem}.pdf"  # 使用 .pdf 扩展名
-                logger.info(f"✅ Image converted: {file_name} ({len(pdf_bytes)} bytes)")
-            except Exception as e:
-                logger.error(f"❌ Image conversion failed: {e}")
-                raise ValueError(f"Failed to convert image to PDF: {e}")
-        else:
-            # PDF 文件直接使用
-            pdf_bytes = file_bytes
-            file_name = Path(file_path).name
+        # 图片转换后只有一页，PDF 按路径统计页数（不读入文件内容）
+        page_count = _count_pdf_pages(file_path) if Path(file_path).suffix.lower() == ".pdf" else 1
+        start_page_id = options.get("start_page_id", 0)
+        end_page_id = options.get("end_page_id")
+        if page_count is not None:
+            if end_page_id is not None:
+                page_count = min(page_count, end_page_id + 1)
+            page_count = max(0, page_count - start_page_id)
 
-        # 获取语言设置
-        # MinerU 不支持 "auto"，默认使用中文
-        lang = options.get("lang", "auto")
-        if lang == "auto":
-            lang = "ch"
-            logger.info("🌐 Language set to 'ch' (MinerU doesn't support 'auto')")
+        if task and self._should_shard(task, page_count):
+            return self._process_sharded(task, file_path, options, page_count, progress)
 
+        progress("parsing", 0, page_count)
+
+        file_name, pdf_input = self._mineru_input(file_path)
         # 调用 MinerU 新版 API（批量处理接口）
         # 新版 API 接受列表参数，即使只有一个文件也要用列表
         # output_format 支持: "md", "md_json" (同时输出 markdown 和 JSON)
         do_parse(
             pdf_file_names=[file_name],  # 文件名列表
-            pdf_bytes_list=[pdf_bytes],  # 文件字节列表
+            pdf_bytes_list=[pdf_input],  # 文件内容列表（传文件路径，由 pypdfium2 打开，见 _mineru_input）
             p_lang_list=[lang],  # 语言列表
             output_dir=str(output_dir),  # 输出目录
             output_format="md_json",  # 同时输出 Markdown 和 JSON
-            end_page_id=options.get("end_page_id"),
+            start_page_id=start_page_id,
+            end_page_id=end_page_id,
             layout_mode=options.get("layout_mode", True),
             formula_enable=options.get("formula_enable", True),
             table_enable=options.get("table_enable", True),
         )
+        if page_count is not None:
+            progress("parsing", page_count, page_count)
+        progress("collecting")
+
+        return self._collect_mineru_output(output_dir)
+
+    def _mineru_input(self, file_path: str) -> tuple:
+        """
+        do_parse 的输入 (file_name, pdf_input)：直接传 PDF 的文件路径，Worker 不读取文件内容
+
+        MinerU（2.6）的 do_parse 第一步用 pypdfium2 打开 pdf_bytes_list 中的每一项，
+        把所选页范围另存为新的 bytes（convert_pdf_bytes_to_bytes_by_pypdfium2），后续流程只使用这份 bytes，
+        这份副本经由 do_parse 无法避免。pypdfium2 可以直接按路径打开文件：传路径时由 pdfium 自己读取文件，
+        Worker 不再持有一份文件大小的内存副本，也不映射文件（映射读过的页面同样计入 RSS）。
+        峰值 RSS 可用 benchmarks/mineru_peak_rss.py 复现测量。
+
+        图片已在 _prepare_task 中转换为临时 PDF，这里只接受 PDF。
+        """
+        path = Path(file_path)
+        if path.stat().st_size == 0:
+            raise ValueError(f"Empty file: {file_path}")
+        return path.name, str(path)
 
+    def _collect_mineru_output(self, output_dir: Path) -> dict:
+        """在 do_parse 输出目录中查找 Markdown 和 content_list.json，构造任务结果"""
         # MinerU 新版输出结构: {output_dir}/{file_name}/auto/{file_stem}.md
         # 递归查找 markdown 文件和 JSON 文件
         md_files = list(output_dir.rglob("*.md"))
@@ -637,6 +1284,321 @@ class MinerUWorkerAPI(ls.LitAPI):
                 logger.error(f"   {item}")
             raise FileNotFoundError(f"MinerU output not found in: {output_dir}")
 
+    def _batch_input(self, task: dict) -> Optional[dict]:
+        """
+        判断任务能否参与跨任务微批，可以时返回页数、语言等批处理信息（只统计页数，不读取文件内容）
+
+        只合并走 MinerU Pipeline 的小 PDF/图片任务：不需要去水印、不限定页范围（分片子任务）、
+        页数不超过 MINERU_BATCH_DOC_PAGES
+        """
+        backend = task.get("backend", "auto")
+        file_ext = Path(task["file_path"]).suffix.lower()
+        if backend not in BATCH_BACKENDS or file_ext not in BATCH_FILE_EXTS:
+            return None
+
+        options = json.loads(task.get("options") or "{}")
+        if task.get("parent_task_id") or options.get("remove_watermark"):
+            return None
+        if options.get("start_page_id") is not None or options.get("end_page_id") is not None:
+            return None
+
+        page_count = 1 if file_ext != ".pdf" else _count_pdf_pages(task["file_path"])
+        if page_count is None or page_count > self.batch_doc_pages:
+            return None
+
+        return {
+            "lang": _mineru_lang(options),
+            "page_count": page_count,
+            # do_parse 对整批生效的参数，只有取值相同的任务才能合并（同时作为 claim_batch_tasks 的过滤条件）
+            "batch_key": batch_options(options),
+        }
+
+    def _collect_batch(self, task: dict) -> list:
+        """
+        以刚认领的任务为首，在页数预算内继续认领队列中已有的兼容小任务（没有可合并的任务时立即返回，不等待）
+
+        claim_batch_tasks 在队列中按后端、扩展名和 batch_key 过滤，不兼容的任务不会被认领；
+        只有页数需要读取文件才能确定，超出单文档或整批页数预算的任务认领后立即放回队列
+        （release_task 保持原有优先级和创建时间），其他 Worker 可以马上处理
+
+        Returns:
+            [(task, batch_input)]，首个任务不可合并时 batch_input 为 None
+        """
+        first = self._batch_input(task)
+        batch = [(task, first)]
+        if first is None:
+            return batch
+
+        pages = first["page_count"]
+        while len(batch) < self.max_batch_size and pages < self.batch_max_pages:
+            claimed = self.task_db.claim_batch_tasks(
+                self.worker_id,
+                self.max_batch_size - len(batch),
+                BATCH_BACKENDS,
+                BATCH_FILE_EXTS,
+                first["batch_key"],
+            )
+            if not claimed:
+                break
+
+            rejected = 0
+            for other in claimed:
+                item = self._batch_input(other)
+                if (
+                    item is not None
+                    and item["batch_key"] == first["batch_key"]
+                    and pages + item["page_count"] <= self.batch_max_pages
+                ):
+                    batch.append((other, item))
+                    pages += item["page_count"]
+                else:
+                    self.task_db.release_task(other["task_id"], self.worker_id)
+                    rejected += 1
+
+            if rejected:
+                # 页数超出预算的任务仍在可合并任务的最前面，继续认领只会反复取到它们
+                break
+
+        return batch
+
+    def _process_batch(self, batch: list):
+        """
+        一次 do_parse 调用处理多个小任务，再把结果分别写回各任务
+
+        do_parse 整批失败时退回逐个处理，单个文件的问题不会拖累同批的其他任务
+        """
+        task_ids = [task["task_id"] for task, _ in batch]
+        with self._lease_lock:
+            self._leased_tasks.update(task_ids)
+
+        # 整批共用一个资源统计，写入各任务时按页数分摊
+        metrics = TaskMetrics()
+        total_pages = sum(item["page_count"] for _, item in batch) or len(batch)
+
+        try:
+            progresses = {}
+            for task, item in batch:
+                progresses[task["task_id"]] = self._progress_reporter(task["task_id"], metrics)
+                self.task_db.clear_progress(task["task_id"])
+                progresses[task["task_id"]]("parsing", 0, item["page_count"])
+
+            output_dir = Path(self.output_dir)
+            try:
+                # 图片在预处理阶段转换为临时 PDF，do_parse 结束后统一删除
+                with ExitStack() as stack:
+                    inputs = []
+                    for task, item in batch:
+                        prepared = self._prepare_task(task)
+                        stack.callback(self._cleanup_prepared, prepared)
+                        inputs.append(self._mineru_input(prepared["file_path"]))
+                        item["file_name"] = inputs[-1][0]
+                    do_parse(
+                        pdf_file_names=[file_name for file_name, _ in inputs],
+                        pdf_bytes_list=[pdf_input for _, pdf_input in inputs],
+                        p_lang_list=[item["lang"] for _, item in batch],
+                        output_dir=str(output_dir),
+                        output_format="md_json",
+                        layout_mode=batch[0][1]["batch_key"]["layout_mode"],
+                        formula_enable=batch[0][1]["batch_key"]["formula_enable"],
+                        table_enable=batch[0][1]["batch_key"]["table_enable"],
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️  Batch do_parse failed ({len(batch)} tasks), falling back to one by one: {e}")
+                for task, _ in batch:
+                    try:
+                        self._execute_task(task)
+                    except Exception as task_error:
+                        logger.error(f"❌ {self.worker_id} failed task {task['task_id']}: {task_error}")
+                return
+
+            results = {}
+            for task, item in batch:
+                task_id = task["task_id"]
+                progress = progresses[task_id]
+                progress("parsing", item["page_count"], item["page_count"])
+                progress("collecting")
+                try:
+                    result = self._collect_mineru_output(output_dir / item["file_name"])
+                except Exception as e:
+                    self._release_lease(task_id)
+                    self.task_db.update_task_status(
+                        task_id=task_id,
+                        status="failed",
+                        error_message=f"{type(e).__name__}: {str(e)}",
+                        worker_id=self.worker_id,
+                    )
+                    logger.error(f"❌ {self.worker_id} failed task {task_id}: {e}")
+                    continue
+
+                results[task_id] = result["result_path"]
+                markdown_path, json_path = find_result_files(result["result_path"])
+                self._release_lease(task_id)
+                if self.task_db.update_task_status(
+                    task_id=task_id,
+                    status="completed",
+                    result_path=result["result_path"],
+                    worker_id=self.worker_id,
+                    markdown_path=markdown_path,
+                    json_path=json_path,
+                ):
+                    self._cache_result(task, result["result_path"])
+                else:
+                    logger.warning(f"⚠️  {self.worker_id} no longer owns task {task_id}, completion not recorded")
+
+            for task, item in batch:
+                result_path = results.get(task["task_id"])
+                self._record_metrics(
+                    metrics.finish(
+                        task,
+                        "completed" if result_path else "failed",
+                        self.worker_id,
+                        output_bytes=_result_size(result_path),
+                        input_pages=item["page_count"],
+                        share=item["page_count"] / total_pages,
+                        batch_size=len(batch),
+                    )
+                )
+
+            if "cuda" in str(self.device).lower():
+                clean_memory()
+        finally:
+            for task_id in task_ids:
+                self._release_lease(task_id)
+
+        logger.info(f"✅ {self.worker_id} completed batch of {len(batch)} tasks")
+
+    def _should_shard(self, task: dict, page_count: Optional[int]) -> bool:
+        """是否将任务拆分为分片子任务（子任务本身不再拆分）"""
+        if self.shard_min_pages <= 0 or page_count is None or task.get("parent_task_id"):
+            return False
+        return page_count >= self.shard_min_pages and page_count > self.shard_pages
+
+    def _process_sharded(self, task: dict, file_path: str, options: dict, page_count: int, progress) -> dict:
+        """
+        按页范围拆分为子任务并行处理，全部完成后按页序合并结果
+
+        子任务进入普通队列，空闲 Worker 会认领；持有父任务的 Worker 也会依次认领剩余的子任务，
+        只有一个 Worker 时同样能完成。父任务重新处理（租约过期被回收）时复用已创建的子任务。
+        任一分片失败时取消其余未结束的分片，父任务随即失败。
+        """
+        task_id = task["task_id"]
+        children = self.task_db.get_child_tasks(task_id)
+        if not children:
+            start_page_id = options.get("start_page_id", 0)
+            shard_options = []
+            for index, start in enumerate(range(0, page_count, self.shard_pages)):
+                shard_options.append(
+                    {
+                        **options,
+                        "remove_watermark": False,  # 父任务已完成去水印，子任务直接处理 file_path
+                        "start_page_id": start_page_id + start,
+                        "end_page_id": start_page_id + min(start + self.shard_pages, page_count) - 1,
+                        "shard_index": index,
+                    }
+                )
+            self.task_db.create_child_tasks(task, shard_options, file_path=file_path)
+            self.task_notifier.notify()
+            logger.info(f"✂️  Split {page_count} pages into {len(shard_options)} shards: {task_id}")
+        else:
+            logger.info(f"✂️  Resuming {len(children)} existing shards: {task_id}")
+
+        while True:
+            # 每处理完一个分片都检查一次：任一分片失败后不再处理其余分片
+            children = self.task_db.get_child_tasks(task_id)
+            failed = [c for c in children if c["status"] in ("failed", "cancelled")]
+            if failed:
+                self._cancel_shards(children)
+                reason = next((c["error_message"] for c in failed if c["error_message"]), "cancelled")
+                raise RuntimeError(f"{len(failed)} of {len(children)} shards failed: {reason}")
+
+            done = sum(1 for c in children if c["status"] == "completed")
+            progress("shards", done, len(children))
+            if done == len(children):
+                break
+
+            # 先处理自己能认领到的剩余分片，再等待其他 Worker 正在处理的分片
+            child = self.task_db.claim_child_task(task_id, self.worker_id)
+            if child:
+                try:
+                    self._process_task(child)
+                except Exception as e:
+                    logger.error(f"❌ Shard {child['task_id']} of {task_id} failed: {e}")
+                continue
+            self._wait_for_shards()
+
+        progress("merging")
+        return self._merge_shards(file_path, children)
+
+    def _wait_for_shards(self):
+        """
+        等待其他 Worker 正在处理的分片结束
+
+        处理分片的 Worker 在分片结束时发送唤醒通知（_process_task），收到通知后立即重新检查分片状态；
+        通知只是提示，丢失时（通知不可用、跨主机的 Worker）最多等待 max_poll_interval 后照常检查，
+        分片租约过期被放回队列时也会在下一轮被本 Worker 认领
+        """
+        if self.task_notifier.listening:
+            self.task_notifier.wait(timeout=self.max_poll_interval)
+        else:
+            time.sleep(self.poll_interval)
+
+    def _cancel_shards(self, children: list):
+        """取消尚未结束的分片：待处理的分片不再被认领，处理中的分片失去租约、结果不会被记录"""
+        unfinished = [c for c in children if c["status"] in ("pending", "processing")]
+        for child in unfinished:
+            self._release_lease(child["task_id"])
+            self.task_db.update_task_status(child["task_id"], "cancelled")
+        if unfinished:
+            logger.info(f"🛑 Cancelled {len(unfinished)} unfinished shards of {unfinished[0]['parent_task_id']}")
+
+    def _merge_shards(self, file_path: str, children: list) -> dict:
+        """按页序合并分片子任务的 Markdown 和 content_list.json（page_idx 加上分片起始页）"""
+        file_stem = Path(file_path).stem
+        merged_dir = Path(self.output_dir) / file_stem / "merged"
+        image_dir = merged_dir / "images"
+        image_dir.mkdir(parents=True, exist_ok=True)
+
+        md_parts = []
+        content_list = []
+        children = sorted(children, key=lambda c: json.loads(c["options"])["shard_index"])
+        for child in children:
+            shard_dir = Path(child["result_path"])
+            page_offset = json.loads(child["options"])["start_page_id"]
+
+            for md_file in sorted(shard_dir.glob("*.md")):
+                md_parts.append(md_file.read_text(encoding="utf-8"))
+
+            for json_file in shard_dir.glob("*_content_list.json"):
+                with open(json_file, "r", encoding="utf-8") as f:
+                    for item in json.load(f):
+                        if "page_idx" in item:
+                            item["page_idx"] += page_offset
+                        content_list.append(item)
+
+            # 图片按内容哈希命名，不同分片之间不会重名
+            if (shard_dir / "images").is_dir():
+                for image in (shard_dir / "images").iterdir():
+                    target = image_dir / image.name
+                    if not target.exists():
+                        try:
+                            os.link(image, target)
+                        except OSError:
+                            shutil.copy2(image, target)
+
+        content = "\n\n".join(md_parts)
+        (merged_dir / f"{file_stem}.md").write_text(content, encoding="utf-8")
+        json_file = merged_dir / f"{file_stem}_content_list.json"
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(content_list, f, ensure_ascii=False, indent=4)
+
+        logger.info(f"✅ Merged {len(children)} shards into: {merged_dir}")
+        return {
+            "result_path": str(merged_dir),
+            "content": content,
+            "json_path": str(json_file),
+            "json_content": content_list,
+        }
+
     def _process_with_markitdown(self, file_path: str) -> dict:
         """使用 MarkItDown 处理 Office 文档"""
         if not self.markitdown:
@@ -651,67 +1613,98 @@ class MinerUWorkerAPI(ls.LitAPI):
 
         return {"result_path": str(output_file), "content": result.text_content}
 
-    def _process_with_paddleocr_vl(self, file_path: str, options: dict) -> dict:
-        """使用 PaddleOCR-VL 处理图片或 PDF"""
-        # 延迟加载 PaddleOCR-VL（单例模式）
-        if self.paddleocr_vl_engine is None:
-            from paddleocr_vl import PaddleOCRVLEngine
+    def _register_engines(self):
+        """向引擎池注册可按需加载的重量级引擎（加载函数返回已完成模型加载的单例）"""
+        if PADDLEOCR_VL_AVAILABLE:
+
+            def load_paddleocr_vl():
+                from paddleocr_vl import PaddleOCRVLEngine
 
-            # PaddleOCRVLEngine 不接受参数，内部自动管理设备
-            self.paddleocr_vl_engine = PaddleOCRVLEngine()
-            logger.info("✅ PaddleOCR-VL engine loaded (singleton)")
+                # PaddleOCRVLEngine 不接受参数，内部自动管理设备
+                engine = PaddleOCRVLEngine()
+                engine.load()
+                return engine
 
+            self.engine_pool.register("paddleocr-vl", load_paddleocr_vl, lambda engine: engine.unload())
+
+        if SENSEVOICE_AVAILABLE:
+
+            def load_sensevoice():
+                from audio_engines import SenseVoiceEngine
+
+                engine = SenseVoiceEngine()
+                engine.load()
+                return engine
+
+            self.engine_pool.register("sensevoice", load_sensevoice, lambda engine: engine.unload())
+
+    def _process_with_paddleocr_vl(self, file_path: str, options: dict, progress=None) -> dict:
+        """使用 PaddleOCR-VL 处理图片或 PDF"""
         # 设置输出目录
         output_dir = Path(self.output_dir) / Path(file_path).stem
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 处理文件（parse 方法需要 output_path）
-        result = self.paddleocr_vl_engine.parse(file_path, output_path=str(output_dir))
+        # 从引擎池获取 PaddleOCR-VL（未加载时冷启动），处理文件（parse 方法需要 output_path）
+        with self.engine_pool.acquire("paddleocr-vl") as engine:
+            result = engine.parse(file_path, output_path=str(output_dir), progress_callback=progress)
 
         # 返回结果
         return {"result_path": str(output_dir), "content": result.get("markdown", "")}
 
-    def _process_audio(self, file_path: str, options: dict) -> dict:
+    def _process_audio(self, file_path: str, options: dict, progress=None) -> dict:
         """使用 SenseVoice 处理音频文件"""
-        # 延迟加载 SenseVoice（单例模式）
-        if self.sensevoice_engine is None:
-            from audio_engines import SenseVoiceEngine
+        progress = progress or _no_progress
 
-            self.sensevoice_engine = SenseVoiceEngine(device=self.device)
-            logger.info("✅ SenseVoice engine loaded (singleton)")
-
-        # 处理音频
-        result = self.sensevoice_engine.transcribe(file_path, language=options.get("lang", "auto"))
+        # 设置输出目录
+        output_dir = Path(self.output_dir) / Path(file_path).stem
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 保存结果
-        output_file = Path(self.output_dir) / f"{Path(file_path).stem}_transcription.txt"
-        output_file.write_text(result["text"], encoding="utf-8")
+        # 从引擎池获取 SenseVoice（未加载时冷启动）
+        progress("loading")
+        with self.engine_pool.acquire("sensevoice") as engine:
+            # 处理音频（SenseVoice 一次性推理，无分段回调）
+            progress("transcription", 0, 1)
+            result = engine.parse(
+                audio_path=file_path, output_path=str(output_dir), language=options.get("lang", "auto")
+            )
+            progress("transcription", 1, 1)
 
-        return {"result_path": str(output_file), "content": result["text"]}
+        return {"result_path": str(output_dir), "content": result["markdown"]}
 
-    def _process_video(self, file_path: str, options: dict) -> dict:
+    def _process_video(self, file_path: str, options: dict, progress=None, audio_path: str = None) -> dict:
         """使用视频处理引擎处理视频文件"""
-        # 延迟加载视频引擎（单例模式）
-        if self.video_engine is None:
-            from video_engines import VideoProcessingEngine
-
-            self.video_engine = VideoProcessingEngine(device=self.device, output_dir=self.output_dir)
-            logger.info("✅ Video processing engine loaded (singleton)")
+        from video_engines import VideoProcessingEngine
 
-        # 处理视频
-        result = self.video_engine.process_video(
-            video_path=file_path,
-            extract_keyframes=options.get("extract_keyframes", True),
-            transcribe_audio=options.get("transcribe_audio", True),
-            keyframe_interval=options.get("keyframe_interval", 30),
-            language=options.get("lang", "auto"),
-        )
+        # 设置输出目录
+        output_dir = Path(self.output_dir) / Path(file_path).stem
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 保存结果（Markdown 格式）
-        output_file = Path(self.output_dir) / f"{Path(file_path).stem}_video_analysis.md"
-        output_file.write_text(result["markdown"], encoding="utf-8")
+        # 视频转写复用 SenseVoice 单例、关键帧 OCR 复用 PaddleOCR-VL 单例：
+        # 通过引擎池占用对应引擎，统计冷启动并防止处理期间被卸载
+        ocr_backend = options.get("ocr_backend", "paddleocr-vl")
+        with ExitStack() as stack:
+            stack.enter_context(self.engine_pool.acquire("sensevoice"))
+            if (
+                options.get("enable_keyframe_ocr", False)
+                and ocr_backend == "paddleocr-vl"
+                and "paddleocr-vl" in self.engine_pool.names
+            ):
+                stack.enter_context(self.engine_pool.acquire("paddleocr-vl"))
+
+            # 处理视频（提取音频 -> 转写 -> 可选关键帧 OCR -> 合并，各阶段通过回调上报进度）
+            result = VideoProcessingEngine().parse(
+                video_path=file_path,
+                output_path=str(output_dir),
+                language=options.get("lang", "auto"),
+                keep_audio=options.get("keep_audio", False),
+                enable_keyframe_ocr=options.get("enable_keyframe_ocr", False),
+                ocr_backend=ocr_backend,
+                keep_keyframes=options.get("keep_keyframes", False),
+                progress_callback=progress,
+                audio_path=audio_path,
+            )
 
-        return {"result_path": str(output_file), "content": result["markdown"]}
+        return {"result_path": str(output_dir), "content": result["markdown"]}
 
     def _preprocess_remove_watermark(self, file_path: str, options: dict) -> Path:
         """
@@ -879,6 +1872,7 @@ class MinerUWorkerAPI(ls.LitAPI):
                 "running": self.running,
                 "current_task": self.current_task_id,
                 "worker_loop_enabled": self.enable_worker_loop,
+                "engines": self.engine_pool.stats(),
             }
 
         elif action == "poll":
@@ -890,13 +1884,13 @@ class MinerUWorkerAPI(ls.LitAPI):
                     "worker_id": self.worker_id,
                 }
 
-            task = self.task_db.pull_task()
+            task = self._claim_task()
             if task:
                 task_id = task["task_id"]
                 logger.info(f"📥 {self.worker_id} manually pulled task: {task_id}")
 
                 try:
-                    self._process_task(task)
+                    self._execute_task(task)
                     logger.info(f"✅ {self.worker_id} completed task: {task_id}")
 
                     return {"status": "completed", "task_id": task["task_id"], "worker_id": self.worker_id}
@@ -942,6 +1936,34 @@ class MinerUWorkerAPI(ls.LitAPI):
         if hasattr(self, "worker_thread") and self.worker_thread.is_alive():
             self.worker_thread.join(timeout=5)
 
+        # 预取但尚未处理的任务放回队列
+        if getattr(self, "_prefetch_pool", None) is not None:
+            try:
+                self._release_prefetched()
+            except Exception as e:
+                logger.error(f"❌ Failed to release prefetched tasks: {e}")
+            self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+
+        # 停止租约心跳
+        if hasattr(self, "_heartbeat_stop"):
+            self._heartbeat_stop.set()
+            self.heartbeat_thread.join(timeout=5)
+
+        # 移除 Worker 登记（不再参与引擎亲和调度）
+        if hasattr(self, "task_db") and hasattr(self, "worker_id"):
+            try:
+                self.task_db.unregister_worker(self.worker_id)
+            except Exception as e:
+                logger.debug(f"Worker unregister failed: {e}")
+
+        # 关闭唤醒通知 socket
+        if hasattr(self, "task_notifier"):
+            self.task_notifier.close()
+
+        # 关闭数据库连接池
+        if hasattr(self, "task_db"):
+            self.task_db.close()
+
         logger.info(f"✅ Worker {worker_id} stopped")
 
 
@@ -953,6 +1975,7 @@ def start_litserve_workers(
     port=9000,
     poll_interval=0.5,
     enable_worker_loop=True,
+    max_poll_interval=5.0,
 ):
     """
     启动 LitServe Worker Pool
@@ -965,6 +1988,7 @@ def start_litserve_workers(
         port: 服务端口
         poll_interval: Worker 拉取任务的间隔（秒）
         enable_worker_loop: 是否启用 worker 自动循环拉取任务
+        max_poll_interval: 空闲时的最大等待间隔（秒），通知不可用时轮询间隔会指数退避到该值
     """
     # 如果没有指定输出目录，从环境变量读取
     if output_dir is None:
@@ -980,13 +2004,14 @@ def start_litserve_workers(
     logger.info(f"🔌 Port: {port}")
     logger.info(f"🔄 Worker Loop: {'Enabled' if enable_worker_loop else 'Disabled'}")
     if enable_worker_loop:
-        logger.info(f"⏱️  Poll Interval: {poll_interval}s")
+        logger.info(f"⏱️  Poll Interval: {poll_interval}s (max {max_poll_interval}s when idle)")
     logger.info("=" * 60)
 
     # 创建 LitServe 服务器
     # 注意：LitAPI 不支持 __init__ 参数，需要通过类属性传递配置
     MinerUWorkerAPI._output_dir = output_dir
     MinerUWorkerAPI._poll_interval = poll_interval
+    MinerUWorkerAPI._max_poll_interval = max_poll_interval
     MinerUWorkerAPI._enable_worker_loop = enable_worker_loop
 
     api = MinerUWorkerAPI()
@@ -1016,6 +2041,11 @@ def start_litserve_workers(
     # 注册 atexit 处理器（正常退出时调用）
     atexit.register(lambda: api.teardown() if hasattr(api, "teardown") else None)
 
+    # Prometheus / OpenMetrics 指标：Worker 进程写入多进程指标目录，由主进程汇总导出（0 表示不启用）
+    metrics_port = int(os.getenv("WORKER_METRICS_PORT", "0"))
+    if metrics_port > 0 and prepare_multiprocess_dir():
+        start_metrics_server(metrics_port, multiprocess=True)
+
     logger.info("✅ LitServe worker pool initialized")
     logger.info(f"📡 Listening on: http://0.0.0.0:{port}/predict")
     if enable_worker_loop:
@@ -1052,6 +2082,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--poll-interval", type=float, default=0.5, help="Worker poll interval in seconds (default: 0.5)"
     )
+    parser.add_argument(
+        "--max-poll-interval",
+        type=float,
+        default=5.0,
+        help="Max idle wait in seconds; polling backs off up to this when task notifier is unavailable (default: 5.0)",
+    )
     parser.add_argument(
         "--disable-worker-loop",
         action="store_true",
@@ -1077,4 +2113,5 @@ if __name__ == "__main__":
         port=args.port,
         poll_interval=args.poll_interval,
         enable_worker_loop=not args.disable_worker_loop,
+        max_poll_interval=args.max_poll_interval,
     )
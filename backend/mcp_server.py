@@ -392,6 +392,7 @@ async def parse_document(args: dict) -> list[TextContent]:
             logger.info(f"⏳ Waiting for task completion: {task_id}")
             max_wait = args.get("max_wait_seconds", 300)
             poll_interval = 2
+            started = asyncio.get_running_loop().time()
             elapsed = 0
 
             while elapsed < max_wait:
@@ -467,10 +468,10 @@ async def parse_document(args: dict) -> list[TextContent]:
                         ]
 
                     elif status in ["pending", "processing"]:
-                        await asyncio.sleep(poll_interval)
-                        elapsed += poll_interval
-                        if elapsed % 10 == 0:  # 每 10 秒记录一次
-                            logger.info(f"⏳ Task {task_id} status: {status}, elapsed: {elapsed}s")
+                        # 订阅任务事件流等待结束，之后重新查询一次状态获取结果
+                        await wait_for_task_end(session, task_id, max_wait - elapsed, poll_interval)
+                        elapsed = asyncio.get_running_loop().time() - started
+                        logger.info(f"⏳ Task {task_id} status: {status}, elapsed: {elapsed:.0f}s")
 
                     else:
                         return [
@@ -511,6 +512,32 @@ async def parse_document(args: dict) -> list[TextContent]:
                     logger.warning(f"Failed to delete temp file: {e}")
 
 
+async def wait_for_task_end(session: aiohttp.ClientSession, task_id: str, timeout: float, poll_interval: float):
+    """
+    通过任务事件流（SSE）等待任务结束，最多等待 timeout 秒
+
+    API Server 在任务进入结束状态后立即推送 end 事件，无需每隔几秒查询一次状态；
+    事件流不可用时（如旧版本 API Server）退回为等待 poll_interval 秒
+    """
+    try:
+        async with session.get(
+            f"{API_BASE_URL}/api/v1/task-events",
+            params={"task_ids": task_id},
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as resp:
+            if resp.status != 200:
+                logger.debug(f"Task event stream unavailable (HTTP {resp.status}), falling back to polling")
+            else:
+                async for line in resp.content:
+                    if line.strip() == b"event: end":
+                        return
+    except asyncio.TimeoutError:
+        return
+    except aiohttp.ClientError as e:
+        logger.debug(f"Task event stream failed: {e}, falling back to polling")
+    await asyncio.sleep(min(poll_interval, timeout))
+
+
 async def get_task_status(args: dict) -> list[TextContent]:
     """查询任务状态"""
     task_id = args["task_id"]
@@ -0,0 +1,120 @@
+"""
+MinerU Tianshu - Memory Stats
+天枢进程内存与显存读数
+
+引擎池（加载占用、内存压力判断）和任务资源统计（峰值 RSS / 显存）共用的读数：
+- RSS、峰值 RSS、系统可用内存读取 /proc（不支持的平台返回 None）
+- 显存只统计已导入的框架（torch / paddle），不会为了统计而导入它们
+"""
+
+import sys
+from typing import Callable, Iterator, Optional, Tuple
+
+
+def _read_kb_mb(path: str, field: str) -> Optional[float]:
+    """读取 /proc 文件中以 kB 为单位的字段（MB，不支持的平台返回 None）"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def rss_mb() -> Optional[float]:
+    """当前进程 RSS（MB，读取 /proc/self/status 的 VmRSS）"""
+    return _read_kb_mb("/proc/self/status", "VmRSS:")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程自上次重置以来的峰值 RSS（MB，读取 /proc/self/status 的 VmHWM）"""
+    return _read_kb_mb("/proc/self/status", "VmHWM:")
+
+
+def reset_peak_rss():
+    """重置进程峰值 RSS 统计（Linux 写 /proc/self/clear_refs，其他平台忽略），用于按任务统计内存峰值"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def available_memory_mb() -> Optional[float]:
+    """系统可用内存（MB，读取 /proc/meminfo 的 MemAvailable）"""
+    return _read_kb_mb("/proc/meminfo", "MemAvailable:")
+
+
+def _gpu_frameworks() -> Iterator[Tuple[str, object]]:
+    """已导入且有可用 GPU 的框架 (名称, 模块)"""
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        try:
+            if torch.cuda.is_available():
+                yield "torch", torch
+        except Exception:
+            pass
+    paddle = sys.modules.get("paddle")
+    if paddle is not None:
+        try:
+            if paddle.device.is_compiled_with_cuda() and paddle.device.cuda.device_count() > 0:
+                yield "paddle", paddle
+        except Exception:
+            pass
+
+
+def _gpu_total_mb(readers: dict) -> Optional[float]:
+    """按框架读取显存字节数并求和（MB，读数为 None 的框架不计入，没有可读取的框架时返回 None）"""
+    total = None
+    for name, module in _gpu_frameworks():
+        read: Optional[Callable] = readers.get(name)
+        try:
+            value = read(module) if read is not None else None
+        except Exception:
+            value = None
+        if value is not None:
+            total = (total or 0) + value / 1024 / 1024
+    return total
+
+
+def gpu_allocated_mb() -> Optional[float]:
+    """当前进程已分配的显存（MB）"""
+    return _gpu_total_mb(
+        {
+            "torch": lambda torch: torch.cuda.memory_allocated(),
+            "paddle": lambda paddle: paddle.device.cuda.memory_allocated(),
+        }
+    )
+
+
+def gpu_free_mb() -> Optional[float]:
+    """当前 GPU 空闲显存（MB，仅统计 torch）"""
+    return _gpu_total_mb({"torch": lambda torch: torch.cuda.mem_get_info()[0]})
+
+
+def reset_gpu_peak():
+    """重置显存峰值统计"""
+    for name, module in _gpu_frameworks():
+        try:
+            if name == "torch":
+                module.cuda.reset_peak_memory_stats()
+            elif hasattr(module.device.cuda, "reset_max_memory_allocated"):
+                module.device.cuda.reset_max_memory_allocated()
+        except Exception:
+            pass
+
+
+def gpu_peak_mb() -> Optional[float]:
+    """自上次重置以来的显存峰值（MB，paddle 不支持重置峰值时不计入）"""
+    return _gpu_total_mb(
+        {
+            "torch": lambda torch: torch.cuda.max_memory_allocated(),
+            "paddle": lambda paddle: (
+                paddle.device.cuda.max_memory_allocated()
+                if hasattr(paddle.device.cuda, "reset_max_memory_allocated")
+                else None
+            ),
+        }
+    )
@@ -0,0 +1,230 @@
+"""
+MinerU Tianshu - Metrics Exporter
+天枢 Prometheus / OpenMetrics 指标
+
+prometheus_client 为可选依赖：未安装时各指标为空操作，/metrics 不可用，其余功能不受影响。
+
+指标：
+- tianshu_queue_tasks{status}                      各状态任务数（抓取时从任务队列读取）
+- tianshu_queue_depth{status,backend}              pending / processing 任务数（按处理后端）
+- tianshu_workers{backend}                         在线 Worker 数（按已预热的处理后端，backend="*" 为全部）
+- tianshu_task_claim_seconds{result}               Worker 认领任务耗时（result = task / empty）
+- tianshu_task_queue_wait_seconds{backend}         任务从提交到被认领的等待时间
+- tianshu_task_duration_seconds{backend,status}    任务处理耗时
+- tianshu_sqlite_lock_wait_seconds{operation}      SQLite 写事务等待写锁（BEGIN IMMEDIATE）的时间
+- tianshu_upload_bytes_total / tianshu_upload_seconds  上传字节数与耗时（rate() 即上传吞吐）
+- tianshu_engine_load_seconds{engine}              引擎冷启动加载耗时
+- tianshu_leases_reclaimed_total / tianshu_stale_tasks_reset_total  调度器故障恢复的任务数
+
+多进程（Worker Pool 的多个 Worker 进程）：各进程把指标写入 PROMETHEUS_MULTIPROC_DIR 下的 mmap 文件，
+由 start_metrics_server 汇总导出（prometheus_client 多进程模式）。
+"""
+
+import glob
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from task_queue.base import TASK_STATUSES
+
+try:
+    from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# 任务处理耗时分桶（秒）：覆盖秒级的小文件到小时级的长视频
+TASK_DURATION_BUCKETS = (1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+# 队列操作耗时分桶（秒）：认领、锁等待等毫秒级操作
+QUEUE_OP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _NoopMetric:
+    """prometheus_client 未安装时的空指标"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, amount: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+
+def _counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def _histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=QUEUE_OP_BUCKETS):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+TASK_CLAIM_SECONDS = _histogram("tianshu_task_claim_seconds", "Time spent claiming the next task", ("result",))
+TASK_QUEUE_WAIT_SECONDS = _histogram(
+    "tianshu_task_queue_wait_seconds",
+    "Time tasks waited in the queue before being claimed",
+    ("backend",),
+    buckets=TASK_DURATION_BUCKETS,
+)
+TASK_DURATION_SECONDS = _histogram(
+    "tianshu_task_duration_seconds",
+    "Task processing wall time",
+    ("backend", "status"),
+    buckets=TASK_DURATION_BUCKETS,
+)
+SQLITE_LOCK_WAIT_SECONDS = _histogram(
+    "tianshu_sqlite_lock_wait_seconds", "Time SQLite write transactions waited for the write lock", ("operation",)
+)
+UPLOAD_BYTES = _counter("tianshu_upload_bytes", "Bytes received by file uploads")
+UPLOAD_SECONDS = _histogram(
+    "tianshu_upload_seconds", "Time spent receiving and storing file uploads", buckets=TASK_DURATION_BUCKETS
+)
+ENGINE_LOAD_SECONDS = _histogram(
+    "tianshu_engine_load_seconds", "Engine cold start load time", ("engine",), buckets=TASK_DURATION_BUCKETS
+)
+LEASES_RECLAIMED = _counter("tianshu_leases_reclaimed", "Tasks requeued after their lease expired")
+STALE_TASKS_RESET = _counter("tianshu_stale_tasks_reset", "Stale processing tasks without a lease reset to pending")
+
+
+def observe_claim(task: Optional[dict], seconds: float):
+    """记录一次认领：认领耗时，以及认领到的任务在队列中的等待时间"""
+    TASK_CLAIM_SECONDS.labels("task" if task else "empty").observe(seconds)
+    if not task or not task.get("created_at"):
+        return
+    try:
+        created = datetime.strptime(task["created_at"][:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return
+    waited = (datetime.now(timezone.utc) - created).total_seconds()
+    TASK_QUEUE_WAIT_SECONDS.labels(task.get("backend") or "auto").observe(max(0.0, waited))
+
+
+class QueueCollector:
+    """抓取时从任务队列读取队列深度和在线 Worker（读取失败时本次抓取不输出这些指标）"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        try:
+            stats = self.queue.get_queue_stats()
+            depth = self.queue.get_queue_depth()
+            workers = self.queue.list_workers()
+        except Exception as e:
+            logger.warning(f"⚠️  Failed to collect queue metrics: {e}")
+            return
+
+        tasks = GaugeMetricFamily("tianshu_queue_tasks", "Tasks by status", labels=["status"])
+        for status in TASK_STATUSES:
+            tasks.add_metric([status], stats.get(status, 0))
+        yield tasks
+
+        by_backend = GaugeMetricFamily(
+            "tianshu_queue_depth", "Pending and processing tasks by backend", labels=["status", "backend"]
+        )
+        for status, backends in depth.items():
+            for backend, count in backends.items():
+                by_backend.add_metric([status, backend or "auto"], count)
+        yield by_backend
+
+        online = GaugeMetricFamily(
+            "tianshu_workers", "Online workers by warm backend (* counts all workers)", labels=["backend"]
+        )
+        online.add_metric(["*"], len(workers))
+        warm = {}
+        for worker in workers:
+            for backend in worker["backends"]:
+                warm[backend] = warm.get(backend, 0) + 1
+        for backend, count in sorted(warm.items()):
+            online.add_metric([backend], count)
+        yield online
+
+    def describe(self):
+        # 注册时不调用 collect()，避免 API Server 启动时访问任务队列
+        return []
+
+
+def register_queue_collector(queue, registry=None):
+    """在指标注册表中登记任务队列指标（prometheus_client 未安装时忽略）"""
+    if PROMETHEUS_AVAILABLE:
+        (registry or REGISTRY).register(QueueCollector(queue))
+
+
+def render_metrics(accept: Optional[str] = None, registry=None) -> Tuple[bytes, str]:
+    """
+    按 Accept 头选择 Prometheus 文本格式或 OpenMetrics 格式输出指标
+
+    Returns:
+        (body, content_type)
+    """
+    from prometheus_client.exposition import choose_encoder
+
+    encoder, content_type = choose_encoder(accept or "")
+    return encoder(registry or REGISTRY), content_type
+
+
+def prepare_multiprocess_dir() -> Optional[str]:
+    """
+    准备多进程指标目录（在启动 Worker 进程之前调用）
+
+    未设置 PROMETHEUS_MULTIPROC_DIR 时创建临时目录并写入环境变量，子进程导入 prometheus_client 时即进入多进程模式；
+    已设置时清空目录中上次运行遗留的指标文件（否则计数器会带上历史值）。
+
+    Returns:
+        指标目录，prometheus_client 未安装时返回 None
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return None
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for stale in glob.glob(os.path.join(path, "*.db")):
+            os.remove(stale)
+    else:
+        path = tempfile.mkdtemp(prefix="tianshu-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def start_metrics_server(port: int, queue=None, multiprocess: bool = False) -> bool:
+    """
+    在独立线程中启动 /metrics HTTP 服务（Worker Pool、调度器等非 FastAPI 进程使用）
+
+    Args:
+        port: 监听端口
+        queue: 任务队列（提供时同时导出队列深度和在线 Worker）
+        multiprocess: 汇总 PROMETHEUS_MULTIPROC_DIR 中各进程的指标（Worker Pool 主进程使用）
+
+    Returns:
+        是否已启动
+    """
+    if not PROMETHEUS_AVAILABLE:
+        logger.warning("⚠️  prometheus_client not installed, metrics endpoint disabled (pip install prometheus-client)")
+        return False
+
+    from prometheus_client import start_http_server
+
+    registry = REGISTRY
+    if multiprocess:
+        from prometheus_client import multiprocess as prometheus_multiprocess
+
+        registry = CollectorRegistry()
+        prometheus_multiprocess.MultiProcessCollector(registry)
+    if queue is not None:
+        register_queue_collector(queue, registry)
+
+    start_http_server(port, registry=registry)
+    logger.info(f"📈 Metrics endpoint: http://0.0.0.0:{port}/metrics")
+    return True
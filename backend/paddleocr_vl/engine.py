@@ -13,7 +13,7 @@ PaddleOCR-VL 解析引擎
 """
 
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from threading import Lock
 from loguru import logger
 
@@ -195,6 +195,24 @@ class PaddleOCRVLEngine:
 
                 raise
 
+    def load(self):
+        """预加载管道（供 Worker 引擎池在启动时预热）"""
+        return self._load_pipeline()
+
+    def unload(self):
+        """
+        卸载管道并释放显存
+
+        下次 parse 时会重新加载（冷启动），由 Worker 引擎池在内存压力下调用
+        """
+        with self._lock:
+            if self._pipeline is None:
+                return
+            self._pipeline = None
+
+        self.cleanup()
+        logger.info("🗑️  PaddleOCR-VL Pipeline unloaded")
+
     def cleanup(self):
         """
         清理推理产生的显存（不卸载模型）
@@ -220,13 +238,16 @@ class PaddleOCRVLEngine:
         except Exception as e:
             logger.debug(f"Memory cleanup warning: {e}")
 
-    def parse(self, file_path: str, output_path: str, **kwargs) -> Dict[str, Any]:
+    def parse(
+        self, file_path: str, output_path: str, progress_callback: Optional[Callable] = None, **kwargs
+    ) -> Dict[str, Any]:
         """
         解析文档或图片
 
         Args:
             file_path: 输入文件路径
             output_path: 输出目录
+            progress_callback: 进度回调 callback(stage, done, total)（可选）
             **kwargs: 其他参数（PaddleOCR-VL 会自动识别语言）
 
         Returns:
@@ -250,6 +271,8 @@ class PaddleOCRVLEngine:
 
             # PaddleOCR-VL 的 predict 方法可以直接处理 PDF 或图片
             # 它会自动处理多页文档和语言检测
+            if progress_callback:
+                progress_callback("inference", 0, None)
             result = pipeline.predict(str(file_path))
 
             logger.info("✅ PaddleOCR-VL completed")
@@ -261,6 +284,8 @@ class PaddleOCRVLEngine:
 
             for idx, res in enumerate(result, 1):
                 logger.info(f"📝 处理结果 {idx}/{len(result)}")
+                if progress_callback:
+                    progress_callback("pages", idx - 1, len(result))
 
                 try:
                     # 为每页创建子目录并保存完整结果（便于调试）
@@ -294,6 +319,9 @@ class PaddleOCRVLEngine:
 
                     logger.debug(traceback.format_exc())
 
+            if progress_callback:
+                progress_callback("pages", len(result), len(result))
+
             # 使用官方方法合并所有页的 Markdown
             if hasattr(pipeline, "concatenate_markdown_pages"):
                 markdown_text = pipeline.concatenate_markdown_pages(markdown_list)
@@ -0,0 +1,172 @@
+"""
+MinerU Tianshu - Result Files
+天枢结果文件定位与缓存
+
+- find_result_files: 在结果目录中定位 Markdown 和结构化 JSON 文件（Worker 在任务完成时调用一次并记录到任务队列）
+- ResultCache: 结果内容的进程内 LRU 缓存（API Server 使用，按文件 mtime 失效，按文件大小限制总容量）
+- JSONFragment / render_json: 结果内容以序列化好的 JSON 片段缓存，响应时原样拼接，
+  轮询大结果时不重复解析和序列化（json 编解码持有 GIL，放到线程池中也会卡住事件循环）
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+# 结构化 JSON 结果的文件名：MinerU 为 {filename}_content_list.json，其他引擎为 content.json / result.json
+RESULT_JSON_NAMES = ("content.json", "result.json")
+RESULT_JSON_SUFFIX = "_content_list.json"
+
+
+def find_result_files(result_path: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    定位结果中的 Markdown 和 JSON 文件
+
+    MinerU 输出结构为 task_id/filename/auto/*.md，需要递归查找；
+    分页目录（page_*）中的 JSON 为单页结果，不作为整体结果返回
+
+    Args:
+        result_path: 结果目录（部分引擎直接返回 Markdown 文件）
+
+    Returns:
+        (markdown_path, json_path)，不存在时为 None
+    """
+    if not result_path:
+        return None, None
+    path = Path(result_path)
+    if path.is_file():
+        return (str(path) if path.suffix == ".md" else None), None
+    if not path.is_dir():
+        return None, None
+
+    md_file = next(path.rglob("*.md"), None)
+    json_file = next(
+        (
+            f
+            for f in path.rglob("*.json")
+            if not f.parent.name.startswith("page_") and (f.name in RESULT_JSON_NAMES or RESULT_JSON_SUFFIX in f.name)
+        ),
+        None,
+    )
+    return (str(md_file) if md_file else None), (str(json_file) if json_file else None)
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """根据文件 mtime 和大小生成 ETag（结果文件写入后不再修改，mtime 变化即内容变化）"""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def read_markdown(path: str) -> str:
+    """读取 Markdown 结果"""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class JSONFragment:
+    """已序列化的 JSON 值（UTF-8 编码），render_json 输出时原样拼接"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def markdown_fragment(path: str) -> JSONFragment:
+    """读取 Markdown 结果并序列化为 JSON 字符串"""
+    return JSONFragment(json.dumps(read_markdown(path), ensure_ascii=False).encode("utf-8"))
+
+
+def json_fragment(path: str) -> JSONFragment:
+    """读取 JSON 结果（文件内容本身就是 JSON，不解析）"""
+    with open(path, "rb") as f:
+        return JSONFragment(f.read())
+
+
+def render_json(payload: Any) -> bytes:
+    """序列化响应，其中的 JSONFragment 按原样拼接（只复制一次，不重新编码）"""
+    fragments: List[Tuple[bytes, bytes]] = []
+
+    def default(obj):
+        if isinstance(obj, JSONFragment):
+            placeholder = f"\x00{len(fragments)}\x00"
+            fragments.append((json.dumps(placeholder).encode("ascii"), obj.data))
+            return placeholder
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    rest = json.dumps(payload, ensure_ascii=False, default=default).encode("utf-8")
+    parts = []
+    for placeholder, data in fragments:
+        head, rest = rest.split(placeholder, 1)
+        parts.extend((head, data))
+    parts.append(rest)
+    return b"".join(parts)
+
+
+class ResultCache:
+    """
+    结果内容的 LRU 缓存
+
+    键为 (task_id, 文件类型)，条目记录文件的 (mtime, 大小)，文件被重新生成后自动失效；
+    容量按文件大小计算，超过总容量的单个文件不缓存。
+    返回的对象由多个请求共享，调用方不能修改。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, task_id: str, kind: str, path: str, parse: Callable[[str], Any]) -> Any:
+        """
+        读取并解析结果文件（命中缓存时直接返回）
+
+        Args:
+            task_id: 任务ID
+            kind: 文件类型（markdown / json）
+            path: 文件路径
+            parse: 读取函数（markdown_fragment / json_fragment）
+
+        Raises:
+            OSError: 文件不存在或读取失败
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (task_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = parse(path)
+        if stat.st_size > self.max_bytes:
+            return value
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[0][1]
+            self._entries[key] = (version, value)
+            self.size_bytes += stat.st_size
+            while self.size_bytes > self.max_bytes:
+                _, (evicted_version, _) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_version[1]
+        return value
+
+    def stats(self) -> dict:
+        """缓存统计（条目数、占用字节、命中 / 未命中次数）"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -5,16 +5,32 @@ MinerU Tianshu - SQLite Task Database Manager
 负责任务的持久化存储、状态管理和原子性操作
 """
 
+import os
 import sqlite3
 import json
+import threading
+import time
 import uuid
 from contextlib import contextmanager
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, Tuple
 from pathlib import Path
 
+from task_queue.base import (
+    BATCH_OPTION_DEFAULTS,
+    TASK_EVENTS_RETAIN,
+    TASK_METRIC_FIELDS,
+    TaskQueue,
+    build_metrics_summary,
+    build_progress,
+    decode_cursor,
+    resolve_fields,
+)
 
-class TaskDB:
-    """任务数据库管理类"""
+
+class TaskDB(TaskQueue):
+    """任务数据库管理类（SQLite 队列后端）"""
+
+    BACKEND_NAME = "sqlite"
 
     def __init__(self, db_path=None):
         # 导入所需模块
@@ -32,35 +48,126 @@ class TaskDB:
 
         # 确保 db_path 是绝对路径字符串
         self.db_path = str(Path(db_path).resolve())
+        self._reset_pool()
         self._init_db()
 
+    # SQLite 连接调优参数（每个新连接建立时执行一次）
+    # - WAL: 读写互不阻塞，API 读请求不会被 Worker 写事务挡住
+    # - synchronous=NORMAL: WAL 模式下安全且显著减少 fsync
+    # - mmap_size / cache_size: 减少热数据的系统调用和页面换入
+    # - busy_timeout: 与 connect(timeout=30) 保持一致，写锁冲突时等待而非立即报错
+    _PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",  # 256MB
+        "PRAGMA cache_size=-65536",  # 64MB（负数表示 KiB）
+        "PRAGMA busy_timeout=30000",
+    )
+
+    # 每个连接缓存的预编译语句数量（sqlite3 模块按 SQL 文本复用 prepared statement）
+    _CACHED_STATEMENTS = 256
+
+    def __getstate__(self):
+        """序列化时丢弃连接池（连接不能跨进程传递，子进程会按需重建）"""
+        state = self.__dict__.copy()
+        state.pop("_local", None)
+        state.pop("_pool_lock", None)
+        state.pop("_pool", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_pool()
+
+    def _reset_pool(self):
+        """初始化（或在 fork 后重建）连接池状态"""
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._pool = []
+        self._pool_pid = os.getpid()
+
     def _get_conn(self):
-        """获取数据库连接（每次创建新连接，避免 pickle 问题）
+        """获取当前线程的持久化数据库连接（按线程、按进程池化）
 
         并发安全说明：
-            - 使用 check_same_thread=False 是安全的，因为：
-              1. 每次调用都创建新连接，不跨线程共享
-              2. 连接使用完立即关闭（在 get_cursor 上下文管理器中）
-              3. 不使用连接池，避免线程间共享同一连接
-            - timeout=30.0 防止死锁，如果锁等待超过30秒会抛出异常
-        """
-        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
-        conn.row_factory = sqlite3.Row
+            - 每个线程持有独立连接（threading.local），连接不会跨线程共享
+            - 连接按进程隔离：fork 出的子进程检测到 pid 变化后丢弃继承的连接并重建
+            - WAL 模式下读者不阻塞写者，写者之间仍由 SQLite 写锁串行化
+            - timeout=30.0 / busy_timeout 防止死锁，如果锁等待超过30秒会抛出异常
+            - 连接复用让 sqlite3 的语句缓存生效，高频 SQL 无需重复编译
+        """
+        if getattr(self, "_pool_pid", None) != os.getpid():
+            # 首次使用或 fork 后：父进程的连接不能在子进程中使用
+            self._reset_pool()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                timeout=30.0,
+                cached_statements=self._CACHED_STATEMENTS,
+            )
+            conn.row_factory = sqlite3.Row
+            for pragma in self._PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._pool_lock:
+                self._pool.append(conn)
         return conn
 
     @contextmanager
     def get_cursor(self):
-        """上下文管理器，自动提交和错误处理"""
+        """上下文管理器，自动提交和错误处理
+
+        连接在线程内复用，不再每次关闭；嵌套调用共享外层事务，只在最外层提交/回滚。
+        """
         conn = self._get_conn()
         cursor = conn.cursor()
+        self._local.depth += 1
         try:
             yield cursor
-            conn.commit()
+            if self._local.depth == 1:
+                conn.commit()
         except Exception as e:
-            conn.rollback()
+            if self._local.depth == 1:
+                conn.rollback()
             raise e
         finally:
-            conn.close()  # 关闭连接
+            self._local.depth -= 1
+            cursor.close()
+
+    def describe(self) -> str:
+        """返回数据库文件路径"""
+        return self.db_path
+
+    def close(self):
+        """关闭本进程内所有池化连接（进程退出或 Worker teardown 时调用）"""
+        if getattr(self, "_pool_pid", None) != os.getpid():
+            return
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def _begin_immediate(self, cursor, operation: str):
+        """
+        开启写事务并立即获取写锁（BEGIN IMMEDIATE），记录等待写锁的时间
+
+        指标模块在此处按需导入：存储层可以脱离 metrics_exporter 单独加载（脚本、测试），
+        模块导入后 import 语句只是一次 sys.modules 查找
+        """
+        from metrics_exporter import SQLITE_LOCK_WAIT_SECONDS
+
+        start = time.monotonic()
+        cursor.execute("BEGIN IMMEDIATE")
+        SQLITE_LOCK_WAIT_SECONDS.labels(operation).observe(time.monotonic() - start)
 
     def _init_db(self):
         """初始化数据库表"""
@@ -90,6 +197,268 @@ class TaskDB:
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON tasks(created_at)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_worker_id ON tasks(worker_id)")
 
+            # 对已有数据库执行增量迁移
+            self._migrate_db(cursor)
+
+    @staticmethod
+    def _table_columns(cursor, table: str) -> List[str]:
+        """获取表的列名列表"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [row["name"] for row in cursor.fetchall()]
+
+    def _ensure_column(self, cursor, table: str, column: str, definition: str) -> bool:
+        """如果列不存在则添加（返回是否新增）"""
+        if column in self._table_columns(cursor, table):
+            return False
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
+    def _migrate_db(self, cursor):
+        """
+        数据库结构迁移（幂等，每次启动执行）
+
+        - user_id: 原先由 AuthDB 添加，这里提前补齐，保证单独使用 TaskDB（Worker/调度器）时也可用
+        - lease_expires_at: 任务租约到期时间（过期扫描只涉及少量 processing 行，走 idx_status 即可）
+        - cache_key / result_cache: 内容寻址的结果缓存，相同文件 + 后端 + 选项的任务直接复用结果目录
+        - parent_task_id: 大文件分片处理时子任务指向父任务（idx_parent_task 只包含子任务行）
+        - markdown_path / json_path: 任务完成时记录的结果文件，查询结果时无需遍历结果目录
+        - idx_pending_queue: 待处理队列的部分覆盖索引，只包含 pending 行，
+          认领查询按 (priority DESC, created_at) 顺序直接取前 N 条，无需扫描和排序，
+          耗时与 tasks 表总行数（历史已完成任务）无关。
+          认领查询使用 INDEXED BY 固定该索引（未执行 ANALYZE 时优化器会误选 idx_status）
+        - idx_*_created_task: 任务列表的游标分页索引，均以 (created_at DESC, task_id DESC) 结尾，
+          分别对应 全部 / 按用户 / 按状态 / 按引擎 筛选，任意页都只需一次索引范围扫描
+        - idx_active_backend: 未结束任务的 (status, backend) 部分覆盖索引，指标导出按后端统计队列深度时使用
+        - task_progress: 任务各处理阶段的进度（Worker 写入，任务状态接口读取）
+        - workers: Worker 心跳及已预热的处理后端（JSON 数组），认领任务时用于引擎亲和调度
+        - task_metrics: 任务资源统计（Worker 在任务结束时写入，与任务记录生命周期独立，
+          归档任务后仍保留，由 cleanup_old_task_records 按记录时间清理）
+        - queue_counters: 各状态任务计数，由触发器在写入 tasks 的同一事务中维护，
+          get_queue_stats 直接读取计数表，无需对全表 GROUP BY
+        - task_events: 任务变更流（创建、状态迁移、进度更新），由触发器在同一事务中追加，
+          覆盖所有修改状态的代码路径；只保留最近 TASK_EVENTS_RETAIN 条，API Server 据此推送任务状态
+        """
+        self._ensure_column(cursor, "tasks", "user_id", "TEXT")
+        self._ensure_column(cursor, "tasks", "lease_expires_at", "TIMESTAMP")
+        self._ensure_column(cursor, "tasks", "cache_key", "TEXT")
+        self._ensure_column(cursor, "tasks", "parent_task_id", "TEXT")
+        self._ensure_column(cursor, "tasks", "markdown_path", "TEXT")
+        self._ensure_column(cursor, "tasks", "json_path", "TEXT")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pending_queue
+            ON tasks(priority DESC, created_at ASC, task_id)
+            WHERE status = 'pending'
+        """)
+        # 游标分页索引（idx_user_created 缺少 task_id，由 idx_user_created_task 取代）
+        cursor.execute("DROP INDEX IF EXISTS idx_user_created")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_created_task ON tasks(created_at DESC, task_id DESC)")
+        for column in ("user_id", "status", "backend"):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{column.split('_')[0]}_created_task "
+                f"ON tasks({column}, created_at DESC, task_id DESC)"
+            )
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_active_backend
+            ON tasks(status, backend)
+            WHERE status IN ('pending', 'processing')
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_parent_task
+            ON tasks(parent_task_id, status)
+            WHERE parent_task_id IS NOT NULL
+        """)
+
+        # 冷热分离：终态任务归档表（结构与 tasks 相同，额外记录归档时间）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_terminal_completed
+            ON tasks(completed_at)
+            WHERE status IN ('completed', 'failed', 'cancelled')
+        """)
+        self._sync_archive_schema(cursor)
+
+        self._ensure_queue_counters(cursor)
+
+        # 结果缓存：cache_key -> 结果目录（按最近使用时间淘汰）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS result_cache (
+                cache_key TEXT PRIMARY KEY,
+                result_path TEXT NOT NULL,
+                size_bytes INTEGER DEFAULT 0,
+                hit_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_last_used ON result_cache(last_used_at)")
+
+        # Worker 登记（行数等于 Worker 数量，无需索引）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                backends TEXT NOT NULL DEFAULT '[]',
+                heartbeat_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # 任务资源统计（每个任务一行，stages 为各阶段耗时的 JSON 对象）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_metrics (
+                task_id TEXT PRIMARY KEY,
+                parent_task_id TEXT,
+                backend TEXT,
+                status TEXT,
+                worker_id TEXT,
+                file_ext TEXT,
+                batch_size INTEGER DEFAULT 1,
+                shard_count INTEGER DEFAULT 0,
+                input_bytes INTEGER,
+                input_pages INTEGER,
+                input_duration_seconds REAL,
+                output_bytes INTEGER,
+                wall_seconds REAL,
+                cpu_user_seconds REAL,
+                cpu_system_seconds REAL,
+                peak_rss_mb REAL,
+                peak_gpu_mb REAL,
+                stages TEXT,
+                recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_metrics_recorded ON task_metrics(recorded_at)")
+
+        # 任务处理进度（每个阶段一行，任务删除或归档时一并清理）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_progress (
+                task_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                done INTEGER DEFAULT 0,
+                total INTEGER,
+                started_at TIMESTAMP,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (task_id, stage)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_task_progress_delete
+            AFTER DELETE ON tasks
+            BEGIN
+                DELETE FROM task_progress WHERE task_id = OLD.task_id;
+            END
+        """)
+
+        self._ensure_task_events(cursor)
+
+    def _ensure_task_events(self, cursor):
+        """创建任务变更流表及追加事件的触发器"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_events (
+                event_id INTEGER PRIMARY KEY,
+                task_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                status TEXT,
+                stage TEXT,
+                done INTEGER,
+                total INTEGER,
+                created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_task_events_insert
+            AFTER INSERT ON tasks
+            BEGIN
+                INSERT INTO task_events (task_id, type, status) VALUES (NEW.task_id, 'status', NEW.status);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_task_events_status
+            AFTER UPDATE OF status ON tasks
+            WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                INSERT INTO task_events (task_id, type, status) VALUES (NEW.task_id, 'status', NEW.status);
+            END
+        """)
+        for action in ("INSERT", "UPDATE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_task_events_progress_{action.lower()}
+                AFTER {action} ON task_progress
+                BEGIN
+                    INSERT INTO task_events (task_id, type, stage, done, total)
+                    VALUES (NEW.task_id, 'progress', NEW.stage, NEW.done, NEW.total);
+                END
+            """)
+        # 只保留最近的事件（event_id 单调递增，按主键范围删除）
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_task_events_trim
+            AFTER INSERT ON task_events
+            BEGIN
+                DELETE FROM task_events WHERE event_id <= NEW.event_id - {TASK_EVENTS_RETAIN};
+            END
+        """)
+
+    def _ensure_queue_counters(self, cursor):
+        """创建状态计数表及维护触发器（首次创建时按现有数据初始化计数）"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queue_counters'")
+        created = cursor.fetchone() is None
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS queue_counters (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_queue_counters_insert
+            AFTER INSERT ON tasks
+            BEGIN
+                INSERT INTO queue_counters (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_queue_counters_delete
+            AFTER DELETE ON tasks
+            BEGIN
+                UPDATE queue_counters SET count = count - 1 WHERE status = OLD.status;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_queue_counters_update
+            AFTER UPDATE OF status ON tasks
+            WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                UPDATE queue_counters SET count = count - 1 WHERE status = OLD.status;
+                INSERT INTO queue_counters (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END
+        """)
+
+        if created:
+            cursor.execute("""
+                INSERT INTO queue_counters (status, count)
+                SELECT status, COUNT(*) FROM tasks GROUP BY status
+            """)
+
+    def _sync_archive_schema(self, cursor):
+        """创建归档表，并补齐 tasks 表后续新增的列（保证两表列一致）"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tasks_archive (
+                task_id TEXT PRIMARY KEY,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("PRAGMA table_info(tasks)")
+        hot_columns = [(row["name"], row["type"]) for row in cursor.fetchall()]
+        archive_columns = set(self._table_columns(cursor, "tasks_archive"))
+        for name, col_type in hot_columns:
+            if name not in archive_columns:
+                # 归档表只做存储，不复制默认值和约束
+                cursor.execute(f"ALTER TABLE tasks_archive ADD COLUMN {name} {col_type}")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_completed_at ON tasks_archive(completed_at)")
+
     def create_task(
         self,
         file_name: str,
@@ -98,32 +467,104 @@ class TaskDB:
         options: dict = None,
         priority: int = 0,
         user_id: str = None,
+        cache_key: str = None,
+        result_path: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
     ) -> str:
         """
         创建新任务
 
         Args:
             file_name: 文件名
-            file_path: 文件路径
+            file_path: 文件路径 (结果缓存命中时上传文件已删除，为 None)
             backend: 处理后端 (pipeline/vlm-transformers/vlm-vllm-engine)
             options: 处理选项 (dict)
             priority: 优先级，数字越大越优先
             user_id: 用户ID (可选,用于权限控制)
+            cache_key: 结果缓存键 (可选，任务完成后写入结果缓存)
+            result_path: 已有结果目录 (可选，结果缓存命中时任务直接创建为 completed)
+            markdown_path: 已有结果中的 Markdown 文件 (可选)
+            json_path: 已有结果中的 JSON 文件 (可选)
 
         Returns:
             task_id: 任务ID
         """
         task_id = str(uuid.uuid4())
+        params = (task_id, file_name, file_path, backend, json.dumps(options or {}), priority, user_id, cache_key)
         with self.get_cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO tasks (task_id, file_name, file_path, backend, options, priority, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-                (task_id, file_name, file_path, backend, json.dumps(options or {}), priority, user_id),
-            )
+            if result_path:
+                cursor.execute(
+                    """
+                    INSERT INTO tasks (task_id, file_name, file_path, backend, options, priority, user_id, cache_key,
+                                       status, result_path, markdown_path, json_path, started_at, completed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'completed', ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                """,
+                    (*params, result_path, markdown_path, json_path),
+                )
+            else:
+                cursor.execute(
+                    """
+                    INSERT INTO tasks (task_id, file_name, file_path, backend, options, priority, user_id, cache_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                    params,
+                )
         return task_id
 
+    def create_tasks(self, tasks: List[Dict]) -> List[str]:
+        """
+        批量创建任务（单个事务，executemany 一次写入所有行）
+
+        Args:
+            tasks: 任务参数列表，每项的键与 create_task 的参数相同
+
+        Returns:
+            task_id 列表（与输入顺序一致）
+        """
+        task_ids, pending_rows, completed_rows = [], [], []
+        for task in tasks:
+            task_id = str(uuid.uuid4())
+            task_ids.append(task_id)
+            params = (
+                task_id,
+                task["file_name"],
+                task["file_path"],
+                task.get("backend", "pipeline"),
+                json.dumps(task.get("options") or {}),
+                task.get("priority", 0),
+                task.get("user_id"),
+                task.get("cache_key"),
+            )
+            if task.get("result_path"):
+                completed_rows.append((*params, task["result_path"], task.get("markdown_path"), task.get("json_path")))
+            else:
+                pending_rows.append(params)
+
+        with self.get_cursor() as cursor:
+            if pending_rows:
+                cursor.executemany(
+                    """
+                    INSERT INTO tasks (task_id, file_name, file_path, backend, options, priority, user_id, cache_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                    pending_rows,
+                )
+            if completed_rows:
+                cursor.executemany(
+                    """
+                    INSERT INTO tasks (task_id, file_name, file_path, backend, options, priority, user_id, cache_key,
+                                       status, result_path, markdown_path, json_path, started_at, completed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'completed', ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                """,
+                    completed_rows,
+                )
+        return task_ids
+
+    def _lease_modifier(self) -> str:
+        """租约到期时间的 datetime() 修饰符"""
+        return f"+{int(self.lease_seconds)} seconds"
+
     def get_next_task(self, worker_id: str, max_retries: int = 3) -> Optional[Dict]:
         """
         获取下一个待处理任务（原子操作，防止并发冲突）
@@ -147,17 +588,11 @@ class TaskDB:
             try:
                 with self.get_cursor() as cursor:
                     # 使用事务确保原子性
-                    cursor.execute("BEGIN IMMEDIATE")
+                    self._begin_immediate(cursor, "claim")
 
-                    # 按优先级和创建时间获取任务
-                    cursor.execute("""
-                        SELECT * FROM tasks
-                        WHERE status = 'pending'
-                        ORDER BY priority DESC, created_at ASC
-                        LIMIT 1
-                    """)
-
-                    task = cursor.fetchone()
+                    # 按优先级和创建时间获取任务（考虑引擎亲和）
+                    warm, reserved = self._affinity_backends(cursor, worker_id)
+                    task = self._select_next_task(cursor, warm, reserved)
                     if task:
                         task_id = task["task_id"]
                         # 立即标记为 processing，并确保状态仍是 pending
@@ -166,10 +601,11 @@ class TaskDB:
                             UPDATE tasks
                             SET status = 'processing',
                                 started_at = CURRENT_TIMESTAMP,
-                                worker_id = ?
+                                worker_id = ?,
+                                lease_expires_at = datetime('now', ?)
                             WHERE task_id = ? AND status = 'pending'
                         """,
-                            (worker_id, task_id),
+                            (worker_id, self._lease_modifier(), task_id),
                         )
 
                         # 检查是否更新成功（防止被其他 worker 抢走）
@@ -188,7 +624,12 @@ class TaskDB:
                             # 检查是否有 pending 任务（用于诊断）
                             cursor.execute("SELECT COUNT(*) as count FROM tasks WHERE status = 'pending'")
                             pending_count = cursor.fetchone()["count"]
-                            if pending_count > 0:
+                            if pending_count > 0 and reserved:
+                                logger.debug(
+                                    f"{pending_count} pending tasks, backends {reserved} reserved "
+                                    "for workers with warm engines"
+                                )
+                            elif pending_count > 0:
                                 logger.warning(
                                     f"⚠️  Found {pending_count} pending tasks but failed to grab one "
                                     f"(attempt {attempt + 1}/{max_retries})"
@@ -210,8 +651,243 @@ class TaskDB:
         logger.warning(f"⚠️  Failed to get task after {max_retries} attempts")
         return None
 
+    def _affinity_backends(self, cursor, worker_id: str) -> Tuple[List[str], List[str]]:
+        """
+        读取引擎亲和信息
+
+        Returns:
+            (warm, reserved): 本 Worker 已预热的后端，以及仅由其他在线 Worker 预热的后端
+        """
+        if self.affinity_wait_seconds <= 0:
+            return [], []
+
+        cursor.execute(
+            "SELECT worker_id, backends FROM workers WHERE heartbeat_at >= datetime('now', ?)",
+            (f"-{int(self.lease_seconds)} seconds",),
+        )
+        warm, others = set(), set()
+        for row in cursor.fetchall():
+            try:
+                backends = json.loads(row["backends"] or "[]")
+            except ValueError:
+                continue
+            (warm if row["worker_id"] == worker_id else others).update(backends)
+        return sorted(warm), sorted(others - warm)
+
+    def _select_next_task(self, cursor, warm: List[str], reserved: List[str]) -> Optional[sqlite3.Row]:
+        """
+        选取下一个待处理任务（不修改状态）
+
+        两次查询都沿 idx_pending_queue 顺序扫描，命中第一条满足条件的行即停止：
+        - 可认领任务：后端未被其他 Worker 预热，或已等待超过 affinity_wait_seconds
+        - 预热任务：本 Worker 已预热后端的任务，优先级不低于可认领任务时优先选取
+        """
+        if reserved:
+            placeholders = ",".join("?" * len(reserved))
+            cursor.execute(
+                f"""
+                SELECT * FROM tasks INDEXED BY idx_pending_queue
+                WHERE status = 'pending'
+                AND (backend NOT IN ({placeholders}) OR created_at <= datetime('now', ?))
+                ORDER BY priority DESC, created_at ASC
+                LIMIT 1
+            """,
+                (*reserved, f"-{int(self.affinity_wait_seconds)} seconds"),
+            )
+        else:
+            cursor.execute("""
+                SELECT * FROM tasks INDEXED BY idx_pending_queue
+                WHERE status = 'pending'
+                ORDER BY priority DESC, created_at ASC
+                LIMIT 1
+            """)
+        task = cursor.fetchone()
+
+        if warm and (task is None or task["backend"] not in warm):
+            placeholders = ",".join("?" * len(warm))
+            cursor.execute(
+                f"""
+                SELECT * FROM tasks INDEXED BY idx_pending_queue
+                WHERE status = 'pending'
+                AND backend IN ({placeholders})
+                ORDER BY priority DESC, created_at ASC
+                LIMIT 1
+            """,
+                warm,
+            )
+            warm_task = cursor.fetchone()
+            if warm_task is not None and (task is None or warm_task["priority"] >= task["priority"]):
+                task = warm_task
+
+        return task
+
+    # UPDATE ... RETURNING 需要 SQLite 3.35+，旧版本走 SELECT + UPDATE 的兼容路径
+    _SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+    def claim_tasks(self, worker_id: str, n: int = 1) -> List[Dict]:
+        """
+        批量获取待处理任务（原子操作，一次加锁最多认领 n 个任务）
+
+        Args:
+            worker_id: Worker ID
+            n: 最多认领的任务数量
+
+        Returns:
+            tasks: 已被标记为 processing 的任务列表（按优先级、创建时间排序），无任务时返回空列表
+
+        并发安全说明：
+            1. 先 BEGIN IMMEDIATE 获取写锁（同时记录等待写锁的时间）
+            2. SQLite 3.35+ 使用单条 UPDATE ... RETURNING 完成选取和标记
+            3. 旧版本在写锁内 SELECT + UPDATE，期间选出的任务不会被其他 worker 抢走
+            4. UPDATE 时仍检查 status = 'pending'，保证同一任务只会被认领一次
+        """
+        if n <= 0:
+            return []
+
+        with self.get_cursor() as cursor:
+            self._begin_immediate(cursor, "claim_batch")
+            if self._SUPPORTS_RETURNING:
+                cursor.execute(
+                    """
+                    UPDATE tasks
+                    SET status = 'processing',
+                        started_at = CURRENT_TIMESTAMP,
+                        worker_id = ?,
+                        lease_expires_at = datetime('now', ?)
+                    WHERE task_id IN (
+                        SELECT task_id FROM tasks INDEXED BY idx_pending_queue
+                        WHERE status = 'pending'
+                        ORDER BY priority DESC, created_at ASC
+                        LIMIT ?
+                    )
+                    AND status = 'pending'
+                    RETURNING *
+                """,
+                    (worker_id, self._lease_modifier(), n),
+                )
+                tasks = [dict(row) for row in cursor.fetchall()]
+            else:
+                cursor.execute(
+                    """
+                    SELECT task_id FROM tasks INDEXED BY idx_pending_queue
+                    WHERE status = 'pending'
+                    ORDER BY priority DESC, created_at ASC
+                    LIMIT ?
+                """,
+                    (n,),
+                )
+                task_ids = [row["task_id"] for row in cursor.fetchall()]
+                if not task_ids:
+                    return []
+
+                placeholders = ",".join("?" * len(task_ids))
+                cursor.execute(
+                    f"""
+                    UPDATE tasks
+                    SET status = 'processing',
+                        started_at = CURRENT_TIMESTAMP,
+                        worker_id = ?,
+                        lease_expires_at = datetime('now', ?)
+                    WHERE task_id IN ({placeholders})
+                    AND status = 'pending'
+                """,
+                    (worker_id, self._lease_modifier(), *task_ids),
+                )
+                cursor.execute(f"SELECT * FROM tasks WHERE task_id IN ({placeholders})", task_ids)
+                tasks = [dict(row) for row in cursor.fetchall() if row["worker_id"] == worker_id]
+
+        # RETURNING 不保证顺序，按队列顺序重新排序
+        tasks.sort(key=lambda t: t["created_at"] or "")
+        tasks.sort(key=lambda t: t["priority"] or 0, reverse=True)
+        return tasks
+
+    def claim_batch_tasks(
+        self, worker_id: str, n: int, backends: Iterable[str], file_exts: Iterable[str], options: Dict
+    ) -> List[Dict]:
+        """
+        认领最多 n 个可以合并进同一微批的待处理任务（跨任务微批）
+
+        后端、扩展名和选项条件都在 SQL 中过滤（options 用 json_extract 比较，缺省取默认值），
+        不兼容的任务不会被认领，也就无需认领后再放回
+
+        Args:
+            worker_id: Worker ID
+            n: 最多认领的任务数量
+            backends: 可合并的处理后端
+            file_exts: 可合并的文件扩展名（如 ".pdf"）
+            options: 批内首个任务的 batch_options
+
+        Returns:
+            tasks: 已被标记为 processing 的任务列表（按优先级、创建时间排序）
+        """
+        backends, file_exts = list(backends), list(file_exts)
+        if n <= 0 or not backends or not file_exts:
+            return []
+
+        conditions = [
+            f"backend IN ({','.join('?' * len(backends))})",
+            "(" + " OR ".join("file_path LIKE ?" for _ in file_exts) + ")",
+            "parent_task_id IS NULL",
+        ]
+        params = [*backends, *(f"%{ext}" for ext in file_exts)]
+        for key, default in BATCH_OPTION_DEFAULTS.items():
+            conditions.append(f"COALESCE(json_extract(options, '$.{key}'), ?) IS ?")
+            params.extend([default, options.get(key, default)])
+
+        with self.get_cursor() as cursor:
+            self._begin_immediate(cursor, "claim_batch_filtered")
+            _, reserved = self._affinity_backends(cursor, worker_id)
+            if reserved:
+                conditions.append(
+                    f"(backend NOT IN ({','.join('?' * len(reserved))}) OR created_at <= datetime('now', ?))"
+                )
+                params.extend([*reserved, f"-{int(self.affinity_wait_seconds)} seconds"])
+
+            cursor.execute(
+                f"""
+                SELECT task_id FROM tasks INDEXED BY idx_pending_queue
+                WHERE status = 'pending'
+                AND {" AND ".join(conditions)}
+                ORDER BY priority DESC, created_at ASC
+                LIMIT ?
+            """,
+                (*params, n),
+            )
+            task_ids = [row["task_id"] for row in cursor.fetchall()]
+            if not task_ids:
+                return []
+
+            placeholders = ",".join("?" * len(task_ids))
+            cursor.execute(
+                f"""
+                UPDATE tasks
+                SET status = 'processing',
+                    started_at = CURRENT_TIMESTAMP,
+                    worker_id = ?,
+                    lease_expires_at = datetime('now', ?)
+                WHERE task_id IN ({placeholders})
+                AND status = 'pending'
+            """,
+                (worker_id, self._lease_modifier(), *task_ids),
+            )
+            cursor.execute(
+                f"""
+                SELECT * FROM tasks WHERE task_id IN ({placeholders})
+                ORDER BY priority DESC, created_at ASC
+            """,
+                task_ids,
+            )
+            return [dict(row) for row in cursor.fetchall() if row["worker_id"] == worker_id]
+
     def update_task_status(
-        self, task_id: str, status: str, result_path: str = None, error_message: str = None, worker_id: str = None
+        self,
+        task_id: str,
+        status: str,
+        result_path: str = None,
+        error_message: str = None,
+        worker_id: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
     ):
         """
         更新任务状态（使用预定义 SQL 模板，防止 SQL 注入）
@@ -222,6 +898,8 @@ class TaskDB:
             result_path: 结果路径（可选）
             error_message: 错误信息（可选）
             worker_id: Worker ID（可选，用于并发检查）
+            markdown_path: 结果 Markdown 文件（可选，仅 completed）
+            json_path: 结果 JSON 文件（可选，仅 completed）
 
         Returns:
             bool: 更新是否成功
@@ -239,30 +917,36 @@ class TaskDB:
 
             # 根据不同状态使用预定义的 SQL 模板
             if status == "completed":
-                # 完成状态：更新状态、完成时间和结果路径
+                # 完成状态：更新状态、完成时间、结果路径和结果文件
                 if worker_id:
                     # 带 worker_id 验证
                     sql = """
                         UPDATE tasks
                         SET status = ?,
                             completed_at = CURRENT_TIMESTAMP,
-                            result_path = ?
+                            result_path = ?,
+                            markdown_path = ?,
+                            json_path = ?,
+                            lease_expires_at = NULL
                         WHERE task_id = ?
                         AND status = 'processing'
                         AND worker_id = ?
                     """
-                    cursor.execute(sql, (status, result_path, task_id, worker_id))
+                    cursor.execute(sql, (status, result_path, markdown_path, json_path, task_id, worker_id))
                 else:
                     # 不验证 worker_id
                     sql = """
                         UPDATE tasks
                         SET status = ?,
                             completed_at = CURRENT_TIMESTAMP,
-                            result_path = ?
+                            result_path = ?,
+                            markdown_path = ?,
+                            json_path = ?,
+                            lease_expires_at = NULL
                         WHERE task_id = ?
                         AND status = 'processing'
                     """
-                    cursor.execute(sql, (status, result_path, task_id))
+                    cursor.execute(sql, (status, result_path, markdown_path, json_path, task_id))
 
                 success = cursor.rowcount > 0
 
@@ -274,7 +958,8 @@ class TaskDB:
                         UPDATE tasks
                         SET status = ?,
                             completed_at = CURRENT_TIMESTAMP,
-                            error_message = ?
+                            error_message = ?,
+                            lease_expires_at = NULL
                         WHERE task_id = ?
                         AND status = 'processing'
                         AND worker_id = ?
@@ -286,7 +971,8 @@ class TaskDB:
                         UPDATE tasks
                         SET status = ?,
                             completed_at = CURRENT_TIMESTAMP,
-                            error_message = ?
+                            error_message = ?,
+                            lease_expires_at = NULL
                         WHERE task_id = ?
                         AND status = 'processing'
                     """
@@ -295,12 +981,14 @@ class TaskDB:
                 success = cursor.rowcount > 0
 
             elif status == "cancelled":
-                # 取消状态：直接更新状态
+                # 取消状态：只取消尚未结束的任务（已完成或失败的任务不会被覆盖）
                 sql = """
                     UPDATE tasks
                     SET status = ?,
-                        completed_at = CURRENT_TIMESTAMP
+                        completed_at = CURRENT_TIMESTAMP,
+                        lease_expires_at = NULL
                     WHERE task_id = ?
+                    AND status IN ('pending', 'processing')
                 """
                 cursor.execute(sql, (status, task_id))
                 success = cursor.rowcount > 0
@@ -311,7 +999,8 @@ class TaskDB:
                     UPDATE tasks
                     SET status = ?,
                         worker_id = NULL,
-                        started_at = NULL
+                        started_at = NULL,
+                        lease_expires_at = NULL
                     WHERE task_id = ?
                 """
                 cursor.execute(sql, (status, task_id))
@@ -348,24 +1037,434 @@ class TaskDB:
         with self.get_cursor() as cursor:
             cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
             task = cursor.fetchone()
+            if task is None:
+                # 热表中不存在时回退到归档表（已归档的历史任务）
+                cursor.execute("SELECT * FROM tasks_archive WHERE task_id = ?", (task_id,))
+                task = cursor.fetchone()
             return dict(task) if task else None
 
+    def set_result_files(self, task_id: str, markdown_path: Optional[str], json_path: Optional[str]):
+        """
+        补记已完成任务的结果文件路径
+
+        Args:
+            task_id: 任务ID
+            markdown_path: 结果 Markdown 文件
+            json_path: 结果 JSON 文件
+        """
+        with self.get_cursor() as cursor:
+            for table in ("tasks", "tasks_archive"):
+                cursor.execute(
+                    f"""
+                    UPDATE {table} SET markdown_path = ?, json_path = ?
+                    WHERE task_id = ? AND status = 'completed'
+                """,
+                    (markdown_path, json_path, task_id),
+                )
+                if cursor.rowcount:
+                    break
+
+    def create_child_tasks(self, parent: Dict, shard_options: List[dict], file_path: str = None) -> List[str]:
+        """
+        为父任务创建一批子任务（单个事务，要么全部创建要么全部不创建，后端和所属用户与父任务相同）
+
+        Args:
+            parent: 父任务字典
+            shard_options: 每个子任务的处理选项
+            file_path: 子任务处理的文件（默认使用父任务的文件）
+
+        Returns:
+            子任务 ID 列表
+        """
+        task_ids = [str(uuid.uuid4()) for _ in shard_options]
+        with self.get_cursor() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO tasks (task_id, file_name, file_path, backend, options, priority, user_id, parent_task_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (
+                        task_id,
+                        parent["file_name"],
+                        file_path or parent["file_path"],
+                        parent["backend"],
+                        json.dumps(options),
+                        parent["priority"],
+                        parent.get("user_id"),
+                        parent["task_id"],
+                    )
+                    for task_id, options in zip(task_ids, shard_options)
+                ],
+            )
+        return task_ids
+
+    def get_child_tasks(self, parent_task_id: str) -> List[Dict]:
+        """
+        获取父任务的全部子任务
+
+        Args:
+            parent_task_id: 父任务ID
+
+        Returns:
+            子任务列表
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM tasks WHERE parent_task_id = ?", (parent_task_id,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def claim_child_task(self, parent_task_id: str, worker_id: str) -> Optional[Dict]:
+        """
+        认领父任务的一个待处理子任务
+
+        Args:
+            parent_task_id: 父任务ID
+            worker_id: Worker ID
+
+        Returns:
+            已被标记为 processing 的子任务，没有待处理子任务时返回 None
+        """
+        with self.get_cursor() as cursor:
+            self._begin_immediate(cursor, "claim_child")
+            cursor.execute(
+                """
+                SELECT task_id FROM tasks INDEXED BY idx_parent_task
+                WHERE parent_task_id = ? AND status = 'pending'
+                LIMIT 1
+            """,
+                (parent_task_id,),
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            cursor.execute(
+                """
+                UPDATE tasks
+                SET status = 'processing',
+                    started_at = CURRENT_TIMESTAMP,
+                    worker_id = ?,
+                    lease_expires_at = datetime('now', ?)
+                WHERE task_id = ? AND status = 'pending'
+            """,
+                (worker_id, self._lease_modifier(), row["task_id"]),
+            )
+            cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (row["task_id"],))
+            return dict(cursor.fetchone())
+
+    def get_cached_result(self, cache_key: str) -> Optional[str]:
+        """
+        查询结果缓存
+
+        Args:
+            cache_key: 结果缓存键
+
+        Returns:
+            str: 结果目录，未命中时返回 None（结果目录已被清理的条目会被删除）
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute("SELECT result_path FROM result_cache WHERE cache_key = ?", (cache_key,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            if not Path(row["result_path"]).exists():
+                cursor.execute("DELETE FROM result_cache WHERE cache_key = ?", (cache_key,))
+                return None
+
+            cursor.execute(
+                """
+                UPDATE result_cache
+                SET hit_count = hit_count + 1,
+                    last_used_at = CURRENT_TIMESTAMP
+                WHERE cache_key = ?
+            """,
+                (cache_key,),
+            )
+            return row["result_path"]
+
+    def put_cached_result(self, cache_key: str, result_path: str, size_bytes: int = 0):
+        """
+        写入结果缓存
+
+        Args:
+            cache_key: 结果缓存键
+            result_path: 结果目录
+            size_bytes: 结果目录大小（用于按容量淘汰）
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO result_cache (cache_key, result_path, size_bytes)
+                VALUES (?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    result_path = excluded.result_path,
+                    size_bytes = excluded.size_bytes,
+                    last_used_at = CURRENT_TIMESTAMP
+            """,
+                (cache_key, result_path, size_bytes),
+            )
+
+    def evict_result_cache(self, max_bytes: int) -> int:
+        """
+        按最近最少使用（LRU）淘汰结果缓存条目
+
+        只删除缓存条目，不删除结果文件：结果目录属于任务，由 cleanup_old_task_files 按保留期清理，
+        被淘汰的目录不再受缓存保护，会在过期后被正常清理。
+
+        Args:
+            max_bytes: 缓存条目引用的结果总大小上限
+
+        Returns:
+            int: 淘汰的条目数
+        """
+        with self.get_cursor() as cursor:
+            self._begin_immediate(cursor, "cache_evict")
+            cursor.execute("SELECT COALESCE(SUM(size_bytes), 0) AS total FROM result_cache")
+            total = cursor.fetchone()["total"]
+            if total <= max_bytes:
+                return 0
+
+            cursor.execute("SELECT cache_key, size_bytes FROM result_cache ORDER BY last_used_at ASC")
+            evicted = []
+            for row in cursor.fetchall():
+                if total <= max_bytes:
+                    break
+                evicted.append((row["cache_key"],))
+                total -= row["size_bytes"] or 0
+
+            cursor.executemany("DELETE FROM result_cache WHERE cache_key = ?", evicted)
+            return len(evicted)
+
+    def update_progress(self, task_id: str, stage: str, done: int = 0, total: Optional[int] = None):
+        """
+        记录任务处理进度
+
+        Args:
+            task_id: 任务ID
+            stage: 阶段名称（如 parsing / transcription），首次出现时记录阶段开始时间
+            done: 已完成的单位数（页、片段、关键帧等）
+            total: 总单位数（未知时为 None，保留之前记录的值）
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO task_progress (task_id, stage, done, total, started_at, updated_at)
+                VALUES (?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now'), strftime('%Y-%m-%d %H:%M:%f', 'now'))
+                ON CONFLICT(task_id, stage) DO UPDATE SET
+                    done = excluded.done,
+                    total = COALESCE(excluded.total, total),
+                    updated_at = excluded.updated_at
+            """,
+                (task_id, stage, done, total),
+            )
+
+    def get_progress(self, task_id: str) -> Optional[Dict]:
+        """
+        获取任务处理进度
+
+        Returns:
+            dict: 当前阶段进度（stage/done/total/percent/eta_seconds）及各阶段耗时（stages），
+                  没有进度记录时返回 None
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT stage, done, total, started_at, updated_at,
+                       (julianday(updated_at) - julianday(started_at)) * 86400.0 AS duration,
+                       (julianday('now') - julianday(started_at)) * 86400.0 AS elapsed
+                FROM task_progress
+                WHERE task_id = ?
+                ORDER BY started_at
+            """,
+                (task_id,),
+            )
+            rows = [dict(row) for row in cursor.fetchall()]
+        return build_progress(rows)
+
+    def clear_progress(self, task_id: str):
+        """清除任务的进度记录（任务重新开始处理时调用）"""
+        with self.get_cursor() as cursor:
+            cursor.execute("DELETE FROM task_progress WHERE task_id = ?", (task_id,))
+
+    def record_task_metrics(self, metrics: Dict):
+        """
+        写入任务资源统计（同一任务重新处理时覆盖之前的记录）
+
+        Args:
+            metrics: 字段见 TASK_METRIC_FIELDS（缺少的字段记为 NULL）
+        """
+        values = [metrics.get(field) for field in TASK_METRIC_FIELDS]
+        values[TASK_METRIC_FIELDS.index("stages")] = json.dumps(metrics.get("stages") or {})
+        columns = ", ".join(TASK_METRIC_FIELDS)
+        placeholders = ", ".join("?" * len(TASK_METRIC_FIELDS))
+        with self.get_cursor() as cursor:
+            cursor.execute(f"INSERT OR REPLACE INTO task_metrics ({columns}) VALUES ({placeholders})", values)
+
+    def get_task_metrics(self, task_id: str) -> Optional[Dict]:
+        """获取任务的资源统计"""
+        with self.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM task_metrics WHERE task_id = ?", (task_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        metrics = dict(row)
+        metrics["stages"] = json.loads(metrics["stages"] or "{}")
+        return metrics
+
+    def get_task_metrics_summary(self, since: Optional[str] = None, backend: Optional[str] = None) -> List[Dict]:
+        """
+        按处理后端汇总资源统计
+
+        Args:
+            since: 只统计该时间之后记录的任务（UTC 'YYYY-MM-DD HH:MM:SS'）
+            backend: 只统计指定后端
+
+        Returns:
+            list: 见 build_metrics_summary（已拆分为分片的父任务不参与统计，其资源使用由各分片记录）
+        """
+        conditions, params = ["m.shard_count = 0"], []
+        if since:
+            conditions.append("m.recorded_at >= ?")
+            params.append(since)
+        if backend:
+            conditions.append("m.backend = ?")
+            params.append(backend)
+        where = " AND ".join(conditions)
+
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT m.backend,
+                       COUNT(*) AS tasks,
+                       SUM(m.status = 'failed') AS failed,
+                       SUM(m.wall_seconds) AS wall_seconds,
+                       MAX(m.wall_seconds) AS max_wall_seconds,
+                       SUM(COALESCE(m.cpu_user_seconds, 0) + COALESCE(m.cpu_system_seconds, 0)) AS cpu_seconds,
+                       AVG(m.peak_rss_mb) AS avg_peak_rss_mb,
+                       MAX(m.peak_rss_mb) AS max_peak_rss_mb,
+                       MAX(m.peak_gpu_mb) AS max_peak_gpu_mb,
+                       SUM(m.input_bytes) AS input_bytes,
+                       SUM(m.output_bytes) AS output_bytes,
+                       SUM(m.input_pages) AS input_pages,
+                       SUM(CASE WHEN m.input_pages > 0 THEN m.wall_seconds END) AS paged_wall_seconds,
+                       SUM(m.input_duration_seconds) AS input_duration_seconds,
+                       SUM(CASE WHEN m.input_duration_seconds > 0 THEN m.wall_seconds END) AS media_wall_seconds
+                FROM task_metrics m
+                WHERE {where}
+                GROUP BY m.backend
+            """,
+                params,
+            )
+            groups = [dict(row) for row in cursor.fetchall()]
+
+            cursor.execute(
+                f"""
+                SELECT m.backend, s.key AS stage, SUM(s.value) AS seconds, COUNT(*) AS count
+                FROM task_metrics m, json_each(m.stages) s
+                WHERE {where}
+                GROUP BY m.backend, s.key
+            """,
+                params,
+            )
+            stages = [dict(row) for row in cursor.fetchall()]
+
+        return build_metrics_summary(groups, stages)
+
     def get_queue_stats(self) -> Dict[str, int]:
         """
-        获取队列统计信息
+        获取队列统计信息（读取触发器维护的 queue_counters，O(1)）
 
         Returns:
             stats: 各状态的任务数量
         """
         with self.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT status, COUNT(*) as count
-                FROM tasks
-                GROUP BY status
-            """)
+            cursor.execute("SELECT status, count FROM queue_counters WHERE count > 0")
             stats = {row["status"]: row["count"] for row in cursor.fetchall()}
             return stats
 
+    def reconcile_queue_stats(self) -> Dict[str, int]:
+        """
+        校准状态计数表：按 tasks 表实际数据重建 queue_counters
+
+        正常情况下触发器保证计数准确，此方法用于修复手工改库等原因导致的偏差。
+
+        Returns:
+            drift: 有偏差的状态及偏差值（实际数量 - 计数），无偏差时为空字典
+        """
+        with self.get_cursor() as cursor:
+            self._begin_immediate(cursor, "reconcile")
+            cursor.execute("SELECT status, COUNT(*) as count FROM tasks GROUP BY status")
+            actual = {row["status"]: row["count"] for row in cursor.fetchall()}
+            cursor.execute("SELECT status, count FROM queue_counters")
+            counted = {row["status"]: row["count"] for row in cursor.fetchall()}
+
+            drift = {}
+            for status in set(actual) | set(counted):
+                diff = actual.get(status, 0) - counted.get(status, 0)
+                if diff:
+                    drift[status] = diff
+
+            if drift:
+                cursor.execute("DELETE FROM queue_counters")
+                cursor.executemany(
+                    "INSERT INTO queue_counters (status, count) VALUES (?, ?)",
+                    list(actual.items()),
+                )
+            return drift
+
+    def get_latest_event_id(self) -> Optional[str]:
+        """任务变更流中最新事件的 ID"""
+        with self.get_cursor() as cursor:
+            cursor.execute("SELECT MAX(event_id) AS event_id FROM task_events")
+            row = cursor.fetchone()
+            return str(row["event_id"]) if row["event_id"] is not None else None
+
+    def get_task_events(self, after_id: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """
+        读取任务变更事件
+
+        Args:
+            after_id: 上次读取到的事件 ID（None 表示从头读取）
+            limit: 最多返回的事件数
+
+        Returns:
+            按 event_id 升序的事件列表
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT event_id, task_id, type, status, stage, done, total, created_at
+                FROM task_events
+                WHERE event_id > ?
+                ORDER BY event_id
+                LIMIT ?
+            """,
+                (int(after_id or 0), limit),
+            )
+            events = [dict(row) for row in cursor.fetchall()]
+        for event in events:
+            event["event_id"] = str(event["event_id"])
+        return events
+
+    def get_queue_depth(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取 pending / processing 任务按处理后端的数量
+
+        只统计未结束的任务，走部分覆盖索引 idx_active_backend，耗时与历史任务数量无关
+        """
+        depth: Dict[str, Dict[str, int]] = {}
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT status, backend, COUNT(*) AS count
+                FROM tasks INDEXED BY idx_active_backend
+                WHERE status IN ('pending', 'processing')
+                GROUP BY status, backend
+            """)
+            for row in cursor.fetchall():
+                depth.setdefault(row["status"], {})[row["backend"]] = row["count"]
+        return depth
+
     def get_tasks_by_status(self, status: str, limit: int = 100) -> List[Dict]:
         """
         根据状态获取任务列表
@@ -389,6 +1488,68 @@ class TaskDB:
             )
             return [dict(row) for row in cursor.fetchall()]
 
+    def list_tasks(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+        backend: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[Dict]:
+        """
+        获取任务列表（按 created_at, task_id 倒序，游标分页）
+
+        Args:
+            user_id: 只返回该用户的任务（None 表示所有用户）
+            status: 只返回该状态的任务（None 表示所有状态）
+            limit: 返回数量限制
+            backend: 只返回该处理引擎的任务
+            created_after: 创建时间下限（含），UTC 'YYYY-MM-DD HH:MM:SS'
+            created_before: 创建时间上限（不含）
+            cursor: 分页游标（上一页最后一个任务的 encode_cursor()）
+            fields: 返回字段（None 表示全部），始终包含 task_id 和 created_at
+
+        Returns:
+            tasks: 任务列表
+
+        Raises:
+            ValueError: 游标无效或包含未知字段
+        """
+        columns = ", ".join(resolve_fields(fields))
+
+        conditions = []
+        params = []
+        for column, value in (("user_id", user_id), ("status", status), ("backend", backend)):
+            if value is not None and value != "":
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if created_after:
+            conditions.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            conditions.append("created_at < ?")
+            params.append(created_before)
+        if cursor:
+            # 行值比较，可直接利用 (..., created_at DESC, task_id DESC) 索引定位
+            conditions.append("(created_at, task_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.get_cursor() as db_cursor:
+            db_cursor.execute(
+                f"""
+                SELECT {columns} FROM tasks
+                {where}
+                ORDER BY created_at DESC, task_id DESC
+                LIMIT ?
+            """,
+                (*params, limit),
+            )
+            return [dict(row) for row in db_cursor.fetchall()]
+
     def cleanup_old_task_files(self, days: int = 7):
         """
         清理旧任务的结果文件（保留数据库记录）
@@ -403,50 +1564,84 @@ class TaskDB:
             - 只删除结果文件，保留数据库记录
             - 数据库中的 result_path 字段会被清空
             - 用户仍可查询任务状态和历史记录
+            - 缓存命中的任务与原任务共用结果目录：保留期内仍被结果缓存命中过、
+              或仍被保留期内的任务引用的目录不会删除（缓存条目被 LRU 淘汰后新任务的结果同样保留）
         """
         from pathlib import Path
         import shutil
 
+        file_count = 0
+
         with self.get_cursor() as cursor:
-            # 查询要清理文件的任务
             cursor.execute(
                 """
-                SELECT task_id, result_path FROM tasks
-                WHERE completed_at < datetime('now', '-' || ? || ' days')
-                AND status IN ('completed', 'failed')
-                AND result_path IS NOT NULL
+                SELECT result_path FROM result_cache
+                WHERE last_used_at >= datetime('now', '-' || ? || ' days')
             """,
                 (days,),
             )
+            in_use = {row["result_path"] for row in cursor.fetchall()}
+            for table in ("tasks", "tasks_archive"):
+                cursor.execute(
+                    f"""
+                    SELECT DISTINCT result_path FROM {table}
+                    WHERE result_path IS NOT NULL
+                    AND (completed_at IS NULL OR completed_at >= datetime('now', '-' || ? || ' days'))
+                """,
+                    (days,),
+                )
+                in_use.update(row["result_path"] for row in cursor.fetchall())
+
+            # 热表和归档表中的任务都可能还保留着结果文件
+            for table in ("tasks", "tasks_archive"):
+                # 查询要清理文件的任务
+                cursor.execute(
+                    f"""
+                    SELECT task_id, result_path FROM {table}
+                    WHERE completed_at < datetime('now', '-' || ? || ' days')
+                    AND status IN ('completed', 'failed')
+                    AND result_path IS NOT NULL
+                """,
+                    (days,),
+                )
 
-            old_tasks = cursor.fetchall()
-            file_count = 0
-
-            # 删除结果文件
-            for task in old_tasks:
-                if task["result_path"]:
-                    result_path = Path(task["result_path"])
-                    if result_path.exists() and result_path.is_dir():
-                        try:
-                            shutil.rmtree(result_path)
-                            file_count += 1
+                old_tasks = cursor.fetchall()
 
-                            # 清空数据库中的 result_path，表示文件已被清理
+                # 删除结果文件
+                for task in old_tasks:
+                    if task["result_path"] in in_use:
+                        continue
+                    if task["result_path"]:
+                        result_path = Path(task["result_path"])
+                        if not result_path.exists():
+                            # 共用目录已随其他任务一起清理（结果缓存命中的任务）
                             cursor.execute(
-                                """
-                                UPDATE tasks
-                                SET result_path = NULL
-                                WHERE task_id = ?
-                            """,
+                                f"UPDATE {table} SET result_path = NULL, markdown_path = NULL, json_path = NULL "
+                                "WHERE task_id = ?",
                                 (task["task_id"],),
                             )
+                        elif result_path.is_dir():
+                            try:
+                                shutil.rmtree(result_path)
+                                file_count += 1
+
+                                # 清空数据库中的 result_path，表示文件已被清理
+                                cursor.execute(
+                                    f"""
+                                    UPDATE {table}
+                                    SET result_path = NULL, markdown_path = NULL, json_path = NULL
+                                    WHERE task_id = ?
+                                """,
+                                    (task["task_id"],),
+                                )
+                                cursor.execute("DELETE FROM result_cache WHERE result_path = ?", (task["result_path"],))
 
-                        except Exception as e:
-                            from loguru import logger
+                            except Exception as e:
+                                from loguru import logger
 
-                            logger.warning(f"Failed to delete result files for task {task['task_id']}: {e}")
+                                logger.warning(f"Failed to delete result files for task {task['task_id']}: {e}")
 
-            return file_count
+        return file_count
 
     def cleanup_old_task_records(self, days: int = 30):
         """
@@ -459,27 +1654,214 @@ class TaskDB:
             int: 删除的记录数
 
         注意：
-            - 这个方法会永久删除数据库记录
+            - 这个方法会永久删除数据库记录（包括归档表中的记录和同期的任务资源统计）
             - 建议设置较长的保留期（如30-90天）
             - 一般情况下不需要调用此方法
         """
+        deleted_count = 0
+        with self.get_cursor() as cursor:
+            for table in ("tasks", "tasks_archive"):
+                cursor.execute(
+                    f"""
+                    DELETE FROM {table}
+                    WHERE completed_at < datetime('now', '-' || ? || ' days')
+                    AND status IN ('completed', 'failed', 'cancelled')
+                """,
+                    (days,),
+                )
+                deleted_count += cursor.rowcount
+            cursor.execute(
+                "DELETE FROM task_metrics WHERE recorded_at < datetime('now', '-' || ? || ' days')",
+                (days,),
+            )
+        return deleted_count
+
+    def archive_old_tasks(self, days: int = 30, chunk_size: int = 1000) -> int:
+        """
+        将终态任务从热表 tasks 迁移到归档表 tasks_archive（冷热分离）
+
+        Args:
+            days: 归档多少天前完成的任务（completed/failed/cancelled）
+            chunk_size: 每批迁移的记录数（每批一个短事务，避免长时间持有写锁）
+
+        Returns:
+            int: 归档的记录数
+
+        注意：
+            - 归档不删除数据，get_task 会自动回退查询归档表
+            - 热表保持精简，队列扫描、统计和任务列表查询不受历史数据拖累
+        """
+        archived_count = 0
+
+        with self.get_cursor() as cursor:
+            # 保证归档表包含 tasks 的全部列
+            self._sync_archive_schema(cursor)
+            columns = ", ".join(self._table_columns(cursor, "tasks"))
+
+        while True:
+            with self.get_cursor() as cursor:
+                self._begin_immediate(cursor, "archive")
+                cursor.execute(
+                    """
+                    SELECT task_id FROM tasks INDEXED BY idx_terminal_completed
+                    WHERE status IN ('completed', 'failed', 'cancelled')
+                    AND completed_at < datetime('now', '-' || ? || ' days')
+                    LIMIT ?
+                """,
+                    (days, chunk_size),
+                )
+                task_ids = [row["task_id"] for row in cursor.fetchall()]
+                if not task_ids:
+                    break
+
+                placeholders = ",".join("?" * len(task_ids))
+                cursor.execute(
+                    f"""
+                    INSERT OR REPLACE INTO tasks_archive ({columns}, archived_at)
+                    SELECT {columns}, CURRENT_TIMESTAMP FROM tasks
+                    WHERE task_id IN ({placeholders})
+                """,
+                    task_ids,
+                )
+                cursor.execute(f"DELETE FROM tasks WHERE task_id IN ({placeholders})", task_ids)
+                archived_count += len(task_ids)
+
+            if len(task_ids) < chunk_size:
+                break
+
+        return archived_count
+
+    def renew_leases(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        """
+        为 Worker 正在处理的任务续约（心跳）
+
+        Args:
+            worker_id: Worker ID
+            task_ids: Worker 认为自己持有的任务 ID
+
+        Returns:
+            List[str]: 续约成功的任务 ID（已被回收、取消或完成的任务不会续约）
+        """
+        if not task_ids:
+            return []
+
+        placeholders = ",".join("?" * len(task_ids))
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE tasks
+                SET lease_expires_at = datetime('now', ?)
+                WHERE task_id IN ({placeholders})
+                AND status = 'processing'
+                AND worker_id = ?
+            """,
+                (self._lease_modifier(), *task_ids, worker_id),
+            )
+            cursor.execute(
+                f"""
+                SELECT task_id FROM tasks
+                WHERE task_id IN ({placeholders})
+                AND status = 'processing'
+                AND worker_id = ?
+            """,
+                (*task_ids, worker_id),
+            )
+            return [row["task_id"] for row in cursor.fetchall()]
+
+    def release_task(self, task_id: str, worker_id: str) -> bool:
+        """
+        将 Worker 仍持有的任务放回队列（预取或批量认领后未处理的任务）
+
+        Args:
+            task_id: 任务ID
+            worker_id: 持有任务的 Worker ID
+
+        Returns:
+            bool: 是否放回成功（任务已不属于该 Worker 时返回 False）
+        """
         with self.get_cursor() as cursor:
             cursor.execute(
                 """
-                DELETE FROM tasks
-                WHERE completed_at < datetime('now', '-' || ? || ' days')
-                AND status IN ('completed', 'failed')
+                UPDATE tasks
+                SET status = 'pending',
+                    worker_id = NULL,
+                    started_at = NULL,
+                    lease_expires_at = NULL
+                WHERE task_id = ?
+                AND status = 'processing'
+                AND worker_id = ?
             """,
-                (days,),
+                (task_id, worker_id),
             )
+            return cursor.rowcount > 0
 
-            deleted_count = cursor.rowcount
-            return deleted_count
+    def reclaim_expired_leases(self) -> int:
+        """
+        回收租约过期的任务（Worker 崩溃或失联），重新放回待处理队列
+
+        Returns:
+            int: 回收的任务数
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE tasks
+                SET status = 'pending',
+                    worker_id = NULL,
+                    started_at = NULL,
+                    lease_expires_at = NULL,
+                    retry_count = retry_count + 1
+                WHERE status = 'processing'
+                AND lease_expires_at < CURRENT_TIMESTAMP
+            """)
+            return cursor.rowcount
+
+    def register_worker(self, worker_id: str, backends: List[str]):
+        """登记 Worker 心跳及已预热的处理后端（同时清理一天以上未心跳的离线 Worker 记录）"""
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO workers (worker_id, backends, heartbeat_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(worker_id) DO UPDATE SET
+                    backends = excluded.backends,
+                    heartbeat_at = excluded.heartbeat_at
+            """,
+                (worker_id, json.dumps(sorted(set(backends)))),
+            )
+            cursor.execute("DELETE FROM workers WHERE heartbeat_at < datetime('now', '-1 day')")
+
+    def unregister_worker(self, worker_id: str):
+        """移除 Worker 登记"""
+        with self.get_cursor() as cursor:
+            cursor.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def list_workers(self) -> List[Dict]:
+        """列出在线 Worker（租约时长内有心跳）"""
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT worker_id, backends, heartbeat_at FROM workers
+                WHERE heartbeat_at >= datetime('now', ?)
+                ORDER BY worker_id
+            """,
+                (f"-{int(self.lease_seconds)} seconds",),
+            )
+            return [
+                {
+                    "worker_id": row["worker_id"],
+                    "backends": json.loads(row["backends"]),
+                    "heartbeat_at": row["heartbeat_at"],
+                }
+                for row in cursor.fetchall()
+            ]
 
     def reset_stale_tasks(self, timeout_minutes: int = 60):
         """
         重置超时的 processing 任务为 pending
 
+        只处理没有租约的任务（不支持心跳的旧版 Worker），
+        持有租约的任务由 reclaim_expired_leases 按租约到期回收，长时间运行的任务不会被误重置。
+
         Args:
             timeout_minutes: 超时时间（分钟）
         """
@@ -491,6 +1873,7 @@ class TaskDB:
                     worker_id = NULL,
                     retry_count = retry_count + 1
                 WHERE status = 'processing'
+                AND lease_expires_at IS NULL
                 AND started_at < datetime('now', '-' || ? || ' minutes')
             """,
                 (timeout_minutes,),
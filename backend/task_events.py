@@ -0,0 +1,108 @@
+"""
+MinerU Tianshu - Task Events
+天枢任务状态推送
+
+任务队列在修改任务状态和进度的同一事务中追加变更事件（SQLite task_events 表 / Redis Stream），
+API Server 每个进程只有一个后台协程读取变更流，再按 task_id 分发给订阅者（SSE / WebSocket 连接）：
+
+    subscription = await task_event_broker.subscribe(task_ids)
+    try:
+        ...  # 订阅之后再读取任务快照，快照之后的变更一定会收到
+        event = await subscription.get(timeout=15)
+    finally:
+        task_event_broker.unsubscribe(subscription)
+
+客户端不再轮询 GET /api/v1/tasks/{task_id}，无论同时关注多少任务，对队列的读取都只有一路。
+"""
+
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+from loguru import logger
+
+# 任务的结束状态（收到后不会再有状态变化）
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+class TaskSubscription:
+    """一个连接订阅的任务事件"""
+
+    def __init__(self, task_ids: Iterable[str], max_pending: int = 1000):
+        self.task_ids: Set[str] = set(task_ids)
+        self.events: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        # 消费过慢导致事件被丢弃时置位，调用方应重新读取任务快照
+        self.lagged = False
+
+    def put(self, event: Dict):
+        try:
+            self.events.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        """等待下一个事件，超时返回 None"""
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class TaskEventBroker:
+    """
+    任务变更流的进程内分发器
+
+    有订阅者时在后台轮询变更流，没有订阅者时停止；
+    首个订阅者到来时从变更流当前末尾开始读取，只推送订阅之后发生的变更
+    """
+
+    def __init__(self, queue, interval: float = 0.5, batch: int = 1000):
+        """
+        Args:
+            queue: AsyncTaskQueue（get_task_events / get_latest_event_id 在线程池中执行）
+            interval: 没有新事件时的轮询间隔（秒）
+            batch: 单次读取的最大事件数
+        """
+        self.queue = queue
+        self.interval = interval
+        self.batch = batch
+        self._subscriptions: Set[TaskSubscription] = set()
+        self._cursor: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    async def subscribe(self, task_ids: Iterable[str]) -> TaskSubscription:
+        """订阅任务事件（返回后发生的变更都会分发到该订阅）"""
+        subscription = TaskSubscription(task_ids)
+        async with self._lock:
+            if self._task is None or self._task.done():
+                self._cursor = await self.queue.get_latest_event_id()
+                self._task = asyncio.create_task(self._run())
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskSubscription):
+        """取消订阅（最后一个订阅取消后后台协程在下一轮退出）"""
+        self._subscriptions.discard(subscription)
+
+    async def _run(self):
+        logger.debug("📡 Task event broker started")
+        while self._subscriptions:
+            try:
+                events = await self.queue.get_task_events(self._cursor, self.batch)
+            except Exception as e:
+                logger.warning(f"⚠️  Failed to read task events: {e}")
+                events = []
+
+            for event in events:
+                self._cursor = event["event_id"]
+                for subscription in self._subscriptions:
+                    if event["task_id"] in subscription.task_ids:
+                        subscription.put(event)
+
+            if len(events) < self.batch:
+                await asyncio.sleep(self.interval)
+        logger.debug("📡 Task event broker stopped (no subscribers)")
@@ -0,0 +1,173 @@
+"""
+MinerU Tianshu - Task Metrics
+天枢任务资源统计
+
+Worker 处理任务时采集资源使用，写入任务队列的 task_metrics 记录，供管理接口按处理后端汇总：
+- 各处理阶段的墙钟耗时（阶段名与进度上报一致）
+- CPU 时间（用户态 / 内核态）、峰值 RSS、GPU 显存峰值（torch / paddle 已导入且使用 GPU 时）
+- 输入规模（文件大小、页数、音视频时长）与输出大小
+"""
+
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+from memory_stats import gpu_peak_mb, peak_rss_mb, reset_gpu_peak, reset_peak_rss
+
+# 按时长统计输入规模的音视频文件类型
+MEDIA_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".mp4", ".avi", ".mkv", ".mov", ".flv", ".wmv")
+
+# 进度阶段中 total 表示页数的阶段（MinerU 为 parsing，PaddleOCR-VL 为 pages）
+PAGE_STAGES = ("parsing", "pages")
+
+
+def _media_duration_seconds(file_path: str) -> Optional[float]:
+    """音视频时长（秒，通过 ffprobe 读取容器信息，ffprobe 不可用或解析失败时返回 None）"""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        logger.debug(f"Unable to probe media duration: {e}")
+        return None
+
+
+def build_metrics_record(task: dict, status: str, worker_id: str, **values) -> Dict:
+    """
+    组装一条 task_metrics 记录（未提供的数值为 None）
+
+    Args:
+        task: 任务字典
+        status: 任务结果（completed / failed）
+        worker_id: 处理任务的 Worker
+        values: 其余字段，见 TASK_METRIC_FIELDS
+    """
+    record = {
+        "task_id": task["task_id"],
+        "parent_task_id": task.get("parent_task_id"),
+        "backend": task.get("backend") or "auto",
+        "status": status,
+        "worker_id": worker_id,
+        "file_ext": Path(task.get("file_path") or task.get("file_name") or "").suffix.lower(),
+        "batch_size": 1,
+        "shard_count": 0,
+        "input_bytes": None,
+        "input_pages": None,
+        "input_duration_seconds": None,
+        "output_bytes": None,
+        "wall_seconds": None,
+        "cpu_user_seconds": None,
+        "cpu_system_seconds": None,
+        "peak_rss_mb": None,
+        "peak_gpu_mb": None,
+        "stages": {},
+    }
+    record.update(values)
+    return record
+
+
+class TaskMetrics:
+    """
+    任务资源统计采集器
+
+    创建时重置进程的峰值 RSS / 显存统计并记录 CPU 时间起点，进度回调中记录阶段切换，
+    finish() 时汇总为 task_metrics 记录。CPU 时间和峰值按进程统计，
+    包含同一进程中并行的预取线程，fork 隔离模式下只包含任务子进程。
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.units: Dict[str, int] = {}
+        self._stage: Optional[str] = None
+        self._stage_start = 0.0
+        reset_peak_rss()
+        reset_gpu_peak()
+        self._cpu_start = os.times()
+        self._start = time.monotonic()
+
+    def stage(self, stage: str, total: Optional[int] = None):
+        """记录进入某个阶段（与当前阶段相同时只更新单位数）"""
+        now = time.monotonic()
+        if stage != self._stage:
+            self._close_stage(now)
+            self._stage, self._stage_start = stage, now
+        if total is not None:
+            self.units[stage] = max(total, self.units.get(stage, 0))
+
+    def add_stage(self, stage: str, seconds: float):
+        """补记在其他线程中完成的阶段耗时（如预取线程中的预处理）"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def _close_stage(self, now: float):
+        if self._stage is not None:
+            self.add_stage(self._stage, now - self._stage_start)
+            self._stage = None
+
+    def finish(
+        self,
+        task: dict,
+        status: str,
+        worker_id: str,
+        output_bytes: Optional[int] = None,
+        input_pages: Optional[int] = None,
+        share: float = 1.0,
+        batch_size: int = 1,
+    ) -> Dict:
+        """
+        汇总为 task_metrics 记录
+
+        Args:
+            task: 任务字典
+            status: 任务结果（completed / failed）
+            worker_id: 处理任务的 Worker
+            output_bytes: 结果目录大小
+            input_pages: 输入页数（默认取进度上报的页数）
+            share: 本任务分摊的比例（合批处理时按页数分摊耗时和 CPU 时间，单独处理为 1）
+            batch_size: 合批处理的任务数
+        """
+        self._close_stage(time.monotonic())
+        wall = time.monotonic() - self._start
+        cpu = os.times()
+
+        file_path = task.get("file_path") or ""
+        try:
+            input_bytes = os.path.getsize(file_path)
+        except OSError:
+            input_bytes = None
+        if input_pages is None:
+            input_pages = next((self.units[s] for s in PAGE_STAGES if s in self.units), None)
+        duration = None
+        if Path(file_path).suffix.lower() in MEDIA_EXTENSIONS:
+            duration = _media_duration_seconds(file_path)
+
+        peak_rss = peak_rss_mb()
+        peak_gpu = gpu_peak_mb()
+        return build_metrics_record(
+            task,
+            status,
+            worker_id,
+            batch_size=batch_size,
+            shard_count=self.units.get("shards", 0),
+            input_bytes=input_bytes,
+            input_pages=input_pages,
+            input_duration_seconds=round(duration, 3) if duration is not None else None,
+            output_bytes=output_bytes,
+            wall_seconds=round(wall * share, 3),
+            cpu_user_seconds=round((cpu.user - self._cpu_start.user) * share, 3),
+            cpu_system_seconds=round((cpu.system - self._cpu_start.system) * share, 3),
+            peak_rss_mb=round(peak_rss, 1) if peak_rss is not None else None,
+            peak_gpu_mb=round(peak_gpu, 1) if peak_gpu is not None else None,
+            stages={stage: round(seconds * share, 3) for stage, seconds in self.stages.items()},
+        )
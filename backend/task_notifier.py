@@ -0,0 +1,171 @@
+"""
+MinerU Tianshu - Task Notifier
+天枢任务唤醒通知
+
+基于 Unix Domain Socket (SOCK_DGRAM) 的轻量级唤醒通道：
+- 每个空闲 Worker 在通知目录下绑定一个 socket 并阻塞等待
+- API Server 创建任务后向目录下所有 socket 发送一个字节的唤醒信号
+- 通知只是"有新任务"的提示，任务本身仍通过 TaskDB 原子认领，丢失通知不会丢任务
+
+通知目录默认位于数据库目录下（Docker 中 backend 与 worker 共享 /app/data/db），
+同一主机上的不同容器也能互相唤醒。
+"""
+
+import os
+import re
+import select
+import socket
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+
+def get_notify_dir() -> Optional[Path]:
+    """
+    获取通知目录
+
+    优先使用 TASK_NOTIFY_DIR，其次使用数据库所在目录下的 notify/ 子目录。
+    TASK_NOTIFY_ENABLED=false 时返回 None（禁用通知，Worker 退回轮询）。
+    """
+    if os.getenv("TASK_NOTIFY_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+
+    notify_dir = os.getenv("TASK_NOTIFY_DIR")
+    if notify_dir:
+        return Path(notify_dir).resolve()
+
+    db_path = os.getenv("DATABASE_PATH", "/app/data/db/mineru_tianshu.db")
+    return Path(db_path).resolve().parent / "notify"
+
+
+class TaskNotifier:
+    """任务唤醒通知（Unix Domain Socket）"""
+
+    # Unix socket 路径长度上限（Linux 为 108 字节，含结尾 \0）
+    MAX_SOCKET_PATH = 107
+
+    def __init__(self, notify_dir: Optional[Path] = None):
+        """
+        初始化通知器
+
+        Args:
+            notify_dir: 通知目录，默认由 get_notify_dir() 决定
+        """
+        self.notify_dir = Path(notify_dir) if notify_dir else get_notify_dir()
+        self.sock = None
+        self.sock_path = None
+
+    @property
+    def available(self) -> bool:
+        """当前平台是否支持 Unix socket 通知"""
+        return self.notify_dir is not None and hasattr(socket, "AF_UNIX")
+
+    @property
+    def listening(self) -> bool:
+        """是否已绑定监听 socket"""
+        return self.sock is not None
+
+    def listen(self, name: str) -> bool:
+        """
+        绑定监听 socket（Worker 端调用）
+
+        Args:
+            name: 监听者名称（通常为 worker_id），会被转换为安全的文件名
+
+        Returns:
+            bool: 是否绑定成功，失败时调用方应退回轮询模式
+        """
+        if not self.available:
+            return False
+
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+        sock_path = self.notify_dir / f"{safe_name}.sock"
+        if len(str(sock_path)) > self.MAX_SOCKET_PATH:
+            sock_path = self.notify_dir / f"worker-{os.getpid()}.sock"
+
+        try:
+            self.notify_dir.mkdir(parents=True, exist_ok=True)
+            sock_path.unlink(missing_ok=True)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(str(sock_path))
+            sock.setblocking(False)
+        except OSError as e:
+            logger.warning(f"⚠️  Task notifier unavailable ({sock_path}): {e}")
+            return False
+
+        self.sock = sock
+        self.sock_path = sock_path
+        return True
+
+    def wait(self, timeout: float) -> bool:
+        """
+        阻塞等待唤醒信号
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: True 表示收到通知，False 表示超时
+        """
+        if self.sock is None:
+            return False
+
+        try:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+        except (OSError, ValueError):
+            return False
+
+        if not readable:
+            return False
+
+        # 合并积压的多个通知，避免连续空转
+        while True:
+            try:
+                self.sock.recv(64)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+        return True
+
+    def notify(self) -> int:
+        """
+        唤醒所有正在等待的监听者（API Server / 调度器端调用）
+
+        Returns:
+            int: 成功发送通知的监听者数量
+        """
+        if not self.available or not self.notify_dir.is_dir():
+            return 0
+
+        sent = 0
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setblocking(False)
+        try:
+            for sock_path in self.notify_dir.glob("*.sock"):
+                try:
+                    sender.sendto(b"1", str(sock_path))
+                    sent += 1
+                except BlockingIOError:
+                    # 接收缓冲区已满：对方已有未处理的唤醒信号
+                    sent += 1
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # 监听进程已退出，清理残留的 socket 文件
+                    sock_path.unlink(missing_ok=True)
+                except OSError as e:
+                    logger.debug(f"Task notify to {sock_path} failed: {e}")
+        finally:
+            sender.close()
+        return sent
+
+    def close(self):
+        """关闭监听 socket 并删除 socket 文件"""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+        if self.sock_path is not None:
+            self.sock_path.unlink(missing_ok=True)
+            self.sock_path = None
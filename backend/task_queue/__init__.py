@@ -0,0 +1,71 @@
+"""
+Task Queue - 可插拔任务队列后端
+
+通过环境变量 TASK_QUEUE_BACKEND 选择后端：
+- sqlite (默认): 单机 SQLite 数据库文件（TaskDB），API/Worker/调度器共享 DATABASE_PATH
+- redis: Redis 协议后端（RedisTaskQueue），多节点 Worker 共享 REDIS_URL
+
+相关环境变量：
+- TASK_QUEUE_BACKEND: sqlite / redis
+- REDIS_URL: Redis 连接地址（默认 redis://localhost:6379/0）
+- REDIS_KEY_PREFIX: 键名前缀（默认 tianshu:）
+
+async 代码（API Server）通过 AsyncTaskQueue 在线程池中调用队列方法，避免阻塞事件循环
+"""
+
+import os
+
+from .base import (
+    TaskQueue,
+    TASK_FIELDS,
+    TASK_STATUSES,
+    batch_options,
+    decode_cursor,
+    encode_cursor,
+    resolve_fields,
+    result_cache_key,
+)
+from .async_queue import AsyncTaskQueue
+
+
+def create_task_queue(db_path: str = None, backend: str = None) -> TaskQueue:
+    """
+    根据配置创建任务队列后端
+
+    Args:
+        db_path: SQLite 数据库路径（仅 sqlite 后端使用，默认读取 DATABASE_PATH）
+        backend: 后端名称，默认读取 TASK_QUEUE_BACKEND 环境变量
+
+    Returns:
+        TaskQueue 实例
+    """
+    backend = (backend or os.getenv("TASK_QUEUE_BACKEND", "sqlite")).lower()
+
+    if backend == "sqlite":
+        from task_db import TaskDB
+
+        return TaskDB(db_path)
+
+    if backend == "redis":
+        from .redis_queue import RedisTaskQueue
+
+        return RedisTaskQueue(
+            url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            key_prefix=os.getenv("REDIS_KEY_PREFIX", "tianshu:"),
+        )
+
+    raise ValueError(f"Unknown task queue backend: {backend}. Supported backends: sqlite, redis")
+
+
+__all__ = [
+    "AsyncTaskQueue",
+    "TaskQueue",
+    "TASK_FIELDS",
+    "TASK_STATUSES",
+    "batch_options",
+    "create_task_queue",
+    "decode_cursor",
+    "encode_cursor",
+    "resolve_fields",
+    "result_cache_key",
+]
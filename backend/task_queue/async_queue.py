@@ -0,0 +1,51 @@
+"""
+Async Task Queue - 任务队列的异步包装
+
+API Server 的接口都是 async def，直接调用同步的 TaskQueue 方法时，
+SQLite 等待写锁（busy_timeout 最长 30 秒）或 Redis 网络往返会阻塞整个事件循环，
+所有客户端（包括健康检查）都要等待。AsyncTaskQueue 把每次调用放到专用线程池中执行：
+
+    adb = AsyncTaskQueue(db)
+    task = await adb.get_task(task_id)
+
+使用独立线程池而不是事件循环的默认线程池，避免与文件读写、同步依赖互相占满；
+TaskDB 按线程复用连接，线程池中的每个线程各自持有一个连接。
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import TaskQueue
+
+
+class AsyncTaskQueue:
+    """在专用线程池中执行 TaskQueue 方法，接口与 TaskQueue 相同，方法返回 awaitable"""
+
+    def __init__(self, queue: TaskQueue, max_workers: int = 8):
+        """
+        Args:
+            queue: 同步任务队列
+            max_workers: 线程池大小（同时进行的队列操作数，SQLite 写操作仍由写锁串行化）
+        """
+        self.queue = queue
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task-queue")
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.queue, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+
+        # 缓存包装后的方法，后续调用不再经过 __getattr__
+        setattr(self, name, call)
+        return call
+
+    def close(self):
+        """关闭线程池（等待进行中的调用完成）"""
+        self._executor.shutdown(wait=True)
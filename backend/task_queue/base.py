@@ -0,0 +1,663 @@
+"""
+Task Queue Base Class - 任务队列后端基类
+
+定义任务队列（任务持久化 + 优先级队列 + 状态管理）的标准接口，
+API Server、Worker、调度器只依赖该接口，具体存储由后端实现决定：
+- sqlite: 单机共享数据库文件（默认，TaskDB）
+- redis: Redis 协议后端，支持多节点 Worker
+"""
+
+import base64
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 任务状态
+TASK_STATUSES = ("pending", "processing", "completed", "failed", "cancelled")
+
+# 任务字段（与 SQLite tasks 表结构保持一致，各后端返回的任务字典都包含这些键）
+TASK_FIELDS = (
+    "task_id",
+    "file_name",
+    "file_path",
+    "status",
+    "priority",
+    "backend",
+    "options",
+    "result_path",
+    "error_message",
+    "created_at",
+    "started_at",
+    "completed_at",
+    "worker_id",
+    "retry_count",
+    "user_id",
+    "lease_expires_at",
+    "cache_key",
+    "parent_task_id",
+    "markdown_path",
+    "json_path",
+)
+
+# 任务租约时长（秒）：Worker 认领任务时获得租约，处理期间由心跳线程定期续约，
+# 租约过期（Worker 崩溃或失联）后任务会被重新放回队列
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "30"))
+
+# 引擎亲和等待时长（秒）：已有其他 Worker 预热了对应引擎的任务，在该时长内只由这些 Worker 认领，
+# 超时后任意 Worker 均可认领（0 表示禁用亲和调度）
+TASK_AFFINITY_WAIT = float(os.getenv("TASK_AFFINITY_WAIT", "30"))
+
+# 任务变更流保留的事件数（超出后丢弃最早的事件，订阅方只需读取最近的变更）
+TASK_EVENTS_RETAIN = 100000
+
+# 任务变更事件的字段（type 为 status 时带 status，为 progress 时带 stage/done/total）
+TASK_EVENT_FIELDS = ("event_id", "task_id", "type", "status", "stage", "done", "total", "created_at")
+
+# 任务资源统计记录的字段（stages 为 {阶段名: 耗时秒数}，recorded_at 由后端写入）
+TASK_METRIC_FIELDS = (
+    "task_id",
+    "parent_task_id",
+    "backend",
+    "status",
+    "worker_id",
+    "file_ext",
+    "batch_size",
+    "shard_count",
+    "input_bytes",
+    "input_pages",
+    "input_duration_seconds",
+    "output_bytes",
+    "wall_seconds",
+    "cpu_user_seconds",
+    "cpu_system_seconds",
+    "peak_rss_mb",
+    "peak_gpu_mb",
+    "stages",
+)
+
+# 影响解析结果或结果目录内容的任务选项（与文件内容哈希、处理后端共同组成结果缓存键）
+# keep_audio / keep_keyframes 决定结果目录中是否保留音频和关键帧文件
+RESULT_CACHE_OPTIONS = (
+    "lang",
+    "method",
+    "formula_enable",
+    "table_enable",
+    "keep_audio",
+    "enable_keyframe_ocr",
+    "keep_keyframes",
+    "ocr_backend",
+    "remove_watermark",
+    "watermark_conf_threshold",
+    "watermark_dilation",
+)
+
+
+def result_cache_key(content_hash: str, backend: str, options: Optional[dict] = None, file_ext: str = "") -> str:
+    """
+    计算结果缓存键
+
+    Args:
+        content_hash: 上传文件内容的 SHA-256
+        backend: 处理后端
+        options: 任务选项（只取 RESULT_CACHE_OPTIONS 中的字段）
+        file_ext: 文件扩展名（auto 后端按扩展名选择引擎，内容相同但扩展名不同的文件结果可能不同）
+
+    Returns:
+        缓存键（SHA-256 十六进制字符串）
+    """
+    relevant = {key: (options or {}).get(key) for key in RESULT_CACHE_OPTIONS}
+    raw = json.dumps([content_hash, backend, file_ext.lower(), relevant], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# 列表查询始终返回的字段（分页游标依赖 created_at + task_id）
+LIST_KEY_FIELDS = ("task_id", "created_at")
+
+# 跨任务微批的选项约束（缺省时取默认值）：
+# do_parse 对整批生效的参数只有取值相同的任务才能合并，去水印和限定页范围（分片子任务）的任务不合并
+BATCH_OPTION_DEFAULTS = {
+    "layout_mode": True,
+    "formula_enable": True,
+    "table_enable": True,
+    "remove_watermark": False,
+    "start_page_id": None,
+    "end_page_id": None,
+}
+
+
+def batch_options(options: Optional[dict]) -> Dict:
+    """取出任务选项中影响微批合并的字段（缺省或为 null 时取 BATCH_OPTION_DEFAULTS 中的默认值）"""
+    options = options or {}
+    return {
+        key: options[key] if options.get(key) is not None else default for key, default in BATCH_OPTION_DEFAULTS.items()
+    }
+
+
+def resolve_fields(fields: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """
+    校验列表查询的字段投影
+
+    Args:
+        fields: 需要返回的字段（None 表示全部字段）
+
+    Returns:
+        按 TASK_FIELDS 顺序排列的字段元组（始终包含 task_id 和 created_at）
+
+    Raises:
+        ValueError: 包含未知字段
+    """
+    if fields is None:
+        return TASK_FIELDS
+    requested = set(fields)
+    unknown = requested - set(TASK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown task fields: {', '.join(sorted(unknown))}")
+    requested.update(LIST_KEY_FIELDS)
+    return tuple(field for field in TASK_FIELDS if field in requested)
+
+
+def encode_cursor(task: Dict) -> str:
+    """根据一页中最后一个任务生成分页游标（base64url 编码的 [created_at, task_id]）"""
+    raw = json.dumps([task["created_at"], task["task_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    解析分页游标
+
+    Returns:
+        (created_at, task_id)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(created_at, str) or not isinstance(task_id, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return created_at, task_id
+
+
+def build_progress(stages: List[Dict]) -> Optional[Dict]:
+    """
+    根据各阶段进度记录生成进度摘要（各后端共用）
+
+    Args:
+        stages: 按开始时间排序的阶段记录，包含 stage/done/total/started_at/updated_at，
+                以及 duration（阶段开始至最后一次更新，秒）和 elapsed（阶段开始至今，秒）
+
+    Returns:
+        dict: 最后一个阶段为当前阶段，按其完成速度估算剩余时间；没有记录时返回 None。
+              已结束阶段的耗时按下一阶段的开始时间计算
+    """
+    if not stages:
+        return None
+
+    durations = [item["elapsed"] - following["elapsed"] for item, following in zip(stages, stages[1:])]
+    durations.append(stages[-1]["duration"] or 0.0)
+
+    current = stages[-1]
+    done, total = current["done"] or 0, current["total"]
+    percent = None
+    eta_seconds = None
+    if total:
+        percent = round(min(done, total) * 100.0 / total, 1)
+        if 0 < done < total:
+            eta_seconds = round(current["elapsed"] / done * (total - done), 1)
+        elif done >= total:
+            eta_seconds = 0.0
+
+    return {
+        "stage": current["stage"],
+        "done": done,
+        "total": total,
+        "percent": percent,
+        "eta_seconds": eta_seconds,
+        "updated_at": current["updated_at"],
+        "stages": [
+            {
+                "stage": item["stage"],
+                "done": item["done"],
+                "total": item["total"],
+                "started_at": item["started_at"],
+                "duration_seconds": round(duration, 3),
+            }
+            for item, duration in zip(stages, durations)
+        ],
+    }
+
+
+def aggregate_task_metrics(records: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    按处理后端累计任务资源统计（在内存中汇总的后端使用，SQLite 后端用 SQL 完成同样的累计）
+
+    已拆分为分片子任务的父任务（shard_count > 0）不参与累计，其资源使用由各分片记录，避免重复计算
+
+    Returns:
+        (groups, stages):
+        - groups: 每个后端一项，包含 backend/tasks/failed/wall_seconds/max_wall_seconds/cpu_seconds/
+          avg_peak_rss_mb/max_peak_rss_mb/max_peak_gpu_mb/input_bytes/output_bytes/
+          input_pages/paged_wall_seconds/input_duration_seconds/media_wall_seconds
+        - stages: 每个 (后端, 阶段) 一项，包含 backend/stage/seconds/count
+    """
+    groups: Dict[str, Dict] = {}
+    stages: Dict[Tuple[str, str], Dict] = {}
+    for record in records:
+        if record.get("shard_count"):
+            continue
+        backend = record["backend"]
+        group = groups.setdefault(
+            backend,
+            {
+                "backend": backend,
+                "tasks": 0,
+                "failed": 0,
+                "wall_seconds": 0.0,
+                "max_wall_seconds": None,
+                "cpu_seconds": 0.0,
+                "rss": [],
+                "max_peak_gpu_mb": None,
+                "input_bytes": 0,
+                "output_bytes": 0,
+                "input_pages": 0,
+                "paged_wall_seconds": 0.0,
+                "input_duration_seconds": 0.0,
+                "media_wall_seconds": 0.0,
+            },
+        )
+        wall = record.get("wall_seconds") or 0.0
+        group["tasks"] += 1
+        group["failed"] += record.get("status") == "failed"
+        group["wall_seconds"] += wall
+        group["max_wall_seconds"] = max(group["max_wall_seconds"] or 0.0, wall)
+        group["cpu_seconds"] += (record.get("cpu_user_seconds") or 0.0) + (record.get("cpu_system_seconds") or 0.0)
+        if record.get("peak_rss_mb") is not None:
+            group["rss"].append(record["peak_rss_mb"])
+        if record.get("peak_gpu_mb") is not None:
+            group["max_peak_gpu_mb"] = max(group["max_peak_gpu_mb"] or 0.0, record["peak_gpu_mb"])
+        group["input_bytes"] += record.get("input_bytes") or 0
+        group["output_bytes"] += record.get("output_bytes") or 0
+        if record.get("input_pages"):
+            group["input_pages"] += record["input_pages"]
+            group["paged_wall_seconds"] += wall
+        if record.get("input_duration_seconds"):
+            group["input_duration_seconds"] += record["input_duration_seconds"]
+            group["media_wall_seconds"] += wall
+        for stage, seconds in (record.get("stages") or {}).items():
+            item = stages.setdefault((backend, stage), {"backend": backend, "stage": stage, "seconds": 0.0, "count": 0})
+            item["seconds"] += seconds
+            item["count"] += 1
+
+    for group in groups.values():
+        rss = group.pop("rss")
+        group["avg_peak_rss_mb"] = sum(rss) / len(rss) if rss else None
+        group["max_peak_rss_mb"] = max(rss) if rss else None
+    return list(groups.values()), list(stages.values())
+
+
+def build_metrics_summary(groups: List[Dict], stages: List[Dict]) -> List[Dict]:
+    """
+    根据各后端的累计值生成资源统计摘要（各后端共用，累计值格式见 aggregate_task_metrics）
+
+    Returns:
+        按总耗时倒序的后端列表，包含总量、平均值、占全部耗时的比例（wall_share）、
+        每页耗时（seconds_per_page）、音视频处理耗时与时长之比（realtime_factor）及各阶段耗时
+    """
+    total_wall = sum(group["wall_seconds"] or 0.0 for group in groups)
+    stage_map: Dict[str, Dict[str, Dict]] = {}
+    for item in stages:
+        stage_map.setdefault(item["backend"], {})[item["stage"]] = {
+            "total_seconds": round(item["seconds"], 3),
+            "avg_seconds": round(item["seconds"] / item["count"], 3) if item["count"] else None,
+        }
+
+    def _round(value, digits=3):
+        return round(value, digits) if value is not None else None
+
+    summary = []
+    for group in sorted(groups, key=lambda g: g["wall_seconds"] or 0.0, reverse=True):
+        tasks = group["tasks"]
+        wall = group["wall_seconds"] or 0.0
+        summary.append(
+            {
+                "backend": group["backend"],
+                "tasks": tasks,
+                "failed": group["failed"],
+                "wall_seconds": round(wall, 3),
+                "wall_share": round(wall / total_wall, 4) if total_wall else None,
+                "avg_wall_seconds": round(wall / tasks, 3) if tasks else None,
+                "max_wall_seconds": _round(group["max_wall_seconds"]),
+                "cpu_seconds": round(group["cpu_seconds"] or 0.0, 3),
+                "avg_cpu_seconds": round((group["cpu_seconds"] or 0.0) / tasks, 3) if tasks else None,
+                "avg_peak_rss_mb": _round(group["avg_peak_rss_mb"], 1),
+                "max_peak_rss_mb": _round(group["max_peak_rss_mb"], 1),
+                "max_peak_gpu_mb": _round(group["max_peak_gpu_mb"], 1),
+                "input_bytes": group["input_bytes"] or 0,
+                "output_bytes": group["output_bytes"] or 0,
+                "input_pages": group["input_pages"] or 0,
+                "seconds_per_page": (
+                    round(group["paged_wall_seconds"] / group["input_pages"], 3) if group["input_pages"] else None
+                ),
+                "input_duration_seconds": round(group["input_duration_seconds"] or 0.0, 3),
+                "realtime_factor": (
+                    round(group["media_wall_seconds"] / group["input_duration_seconds"], 3)
+                    if group["input_duration_seconds"]
+                    else None
+                ),
+                "stages": stage_map.get(group["backend"], {}),
+            }
+        )
+    return summary
+
+
+class TaskQueue(ABC):
+    """
+    任务队列后端基类
+
+    所有队列后端必须继承此类并实现以下方法。
+    任务以字典形式返回，包含 TASK_FIELDS 中的所有键，
+    时间字段统一为 UTC 'YYYY-MM-DD HH:MM:SS' 字符串（与 SQLite CURRENT_TIMESTAMP 一致）。
+    """
+
+    # 后端名称（用于日志和健康检查）
+    BACKEND_NAME: str = "unknown"
+
+    # 认领和续约时设置的租约时长（秒）
+    lease_seconds: int = TASK_LEASE_SECONDS
+
+    # 引擎亲和等待时长（秒）
+    affinity_wait_seconds: float = TASK_AFFINITY_WAIT
+
+    @abstractmethod
+    def create_task(
+        self,
+        file_name: str,
+        file_path: str,
+        backend: str = "pipeline",
+        options: dict = None,
+        priority: int = 0,
+        user_id: str = None,
+        cache_key: str = None,
+        result_path: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
+    ) -> str:
+        """
+        创建新任务，返回 task_id
+
+        cache_key 为结果缓存键（见 result_cache_key），任务完成后 Worker 据此写入结果缓存；
+        提供 result_path 时（结果缓存命中）任务直接创建为 completed 状态，markdown_path / json_path 为其中的结果文件，
+        上传文件已删除，file_path 为 None
+        """
+        pass
+
+    @abstractmethod
+    def create_tasks(self, tasks: List[Dict]) -> List[str]:
+        """原子地批量创建任务（每项的键与 create_task 的参数相同），返回与输入顺序一致的 task_id 列表"""
+        pass
+
+    @abstractmethod
+    def get_next_task(self, worker_id: str, max_retries: int = 3) -> Optional[Dict]:
+        """
+        原子地认领下一个待处理任务，没有任务时返回 None
+
+        引擎亲和（affinity_wait_seconds > 0 时）：
+        - 同等优先级下优先认领本 Worker 已预热引擎的任务（见 register_worker）
+        - 其他在线 Worker 已预热、本 Worker 未预热的后端，其任务在创建后 affinity_wait_seconds 内留给这些 Worker
+        """
+        pass
+
+    @abstractmethod
+    def claim_tasks(self, worker_id: str, n: int = 1) -> List[Dict]:
+        """原子地批量认领最多 n 个待处理任务"""
+        pass
+
+    @abstractmethod
+    def claim_batch_tasks(
+        self, worker_id: str, n: int, backends: Iterable[str], file_exts: Iterable[str], options: Dict
+    ) -> List[Dict]:
+        """
+        原子地认领最多 n 个可以合并进同一微批的待处理任务
+
+        只认领同时满足以下条件的任务，其余任务留在队列中由其他 Worker 处理：
+        - backend 属于 backends，file_path 的扩展名（不区分大小写）属于 file_exts，不是分片子任务
+        - batch_options(任务选项) 与 options 相同（options 为批内首个任务的 batch_options）
+        - 不是其他 Worker 预热后端的预留任务（引擎亲和，同 get_next_task）
+
+        Returns:
+            已标记为 processing 的任务列表（按优先级、创建时间排序）
+        """
+        pass
+
+    @abstractmethod
+    def update_task_status(
+        self,
+        task_id: str,
+        status: str,
+        result_path: str = None,
+        error_message: str = None,
+        worker_id: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
+    ) -> bool:
+        """
+        更新任务状态，返回是否更新成功
+
+        完成时同时记录结果目录中的 Markdown / JSON 文件路径（见 find_result_files），查询结果时无需遍历目录
+        """
+        pass
+
+    @abstractmethod
+    def set_result_files(self, task_id: str, markdown_path: Optional[str], json_path: Optional[str]):
+        """补记已完成任务的结果文件路径（记录结果文件路径之前完成的任务，首次查询时补齐）"""
+        pass
+
+    @abstractmethod
+    def get_task(self, task_id: str) -> Optional[Dict]:
+        """查询任务详情，不存在时返回 None"""
+        pass
+
+    @abstractmethod
+    def create_child_tasks(self, parent: Dict, shard_options: List[dict], file_path: str = None) -> List[str]:
+        """
+        为父任务原子地创建一批子任务（大文件分片处理）
+
+        子任务继承父任务的文件名、优先级，使用 MinerU Pipeline 处理，不关联用户（不出现在用户的任务列表中）
+
+        Args:
+            parent: 父任务字典
+            shard_options: 每个子任务的处理选项（通常包含 start_page_id / end_page_id / shard_index）
+            file_path: 子任务处理的文件（默认使用父任务的文件，例如去水印后的 PDF）
+
+        Returns:
+            子任务 ID 列表（与 shard_options 顺序一致）
+        """
+        pass
+
+    @abstractmethod
+    def get_child_tasks(self, parent_task_id: str) -> List[Dict]:
+        """获取父任务的全部子任务"""
+        pass
+
+    @abstractmethod
+    def claim_child_task(self, parent_task_id: str, worker_id: str) -> Optional[Dict]:
+        """原子地认领父任务的一个待处理子任务（持有父任务的 Worker 用于处理剩余分片），没有时返回 None"""
+        pass
+
+    @abstractmethod
+    def get_cached_result(self, cache_key: str) -> Optional[str]:
+        """查询结果缓存，命中时刷新使用时间并返回结果目录（目录已不存在的条目会被删除）"""
+        pass
+
+    @abstractmethod
+    def put_cached_result(self, cache_key: str, result_path: str, size_bytes: int = 0):
+        """写入结果缓存（同一缓存键以最新结果为准）"""
+        pass
+
+    @abstractmethod
+    def evict_result_cache(self, max_bytes: int) -> int:
+        """按最近最少使用淘汰缓存条目，直到缓存总大小不超过 max_bytes，返回淘汰的条目数"""
+        pass
+
+    @abstractmethod
+    def update_progress(self, task_id: str, stage: str, done: int = 0, total: Optional[int] = None):
+        """记录任务某个处理阶段的进度（total 为 None 时保留之前的值）"""
+        pass
+
+    @abstractmethod
+    def get_progress(self, task_id: str) -> Optional[Dict]:
+        """获取任务进度摘要（见 build_progress），没有记录时返回 None"""
+        pass
+
+    @abstractmethod
+    def clear_progress(self, task_id: str):
+        """清除任务的进度记录"""
+        pass
+
+    @abstractmethod
+    def record_task_metrics(self, metrics: Dict):
+        """写入任务资源统计（字段见 TASK_METRIC_FIELDS，同一任务以最后一次处理为准）"""
+        pass
+
+    @abstractmethod
+    def get_task_metrics(self, task_id: str) -> Optional[Dict]:
+        """获取任务的资源统计，没有记录时返回 None"""
+        pass
+
+    @abstractmethod
+    def get_task_metrics_summary(self, since: Optional[str] = None, backend: Optional[str] = None) -> List[Dict]:
+        """
+        按处理后端汇总资源统计（见 build_metrics_summary）
+
+        - since: 只统计该时间之后记录的任务，UTC 'YYYY-MM-DD HH:MM:SS'
+        - backend: 只统计指定后端
+        """
+        pass
+
+    @abstractmethod
+    def get_queue_stats(self) -> Dict[str, int]:
+        """获取各状态的任务数量"""
+        pass
+
+    @abstractmethod
+    def get_latest_event_id(self) -> Optional[str]:
+        """任务变更流中最新事件的 ID（变更流为空时返回 None），订阅方从这里开始读取"""
+        pass
+
+    @abstractmethod
+    def get_task_events(self, after_id: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """
+        按发生顺序读取 after_id 之后的任务变更事件（字段见 TASK_EVENT_FIELDS，event_id 为字符串）
+
+        任务创建、状态迁移（认领、完成、失败、取消、租约回收等）和进度更新都会写入变更流，
+        最多保留最近 TASK_EVENTS_RETAIN 条
+        """
+        pass
+
+    @abstractmethod
+    def get_queue_depth(self) -> Dict[str, Dict[str, int]]:
+        """获取 pending / processing 任务按处理后端的数量：{status: {backend: count}}"""
+        pass
+
+    @abstractmethod
+    def get_tasks_by_status(self, status: str, limit: int = 100) -> List[Dict]:
+        """按状态获取任务列表（按创建时间倒序）"""
+        pass
+
+    @abstractmethod
+    def list_tasks(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+        backend: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[Dict]:
+        """
+        获取任务列表（按 created_at, task_id 倒序），支持游标分页
+
+        - user_id / status / backend: 精确筛选
+        - created_after / created_before: 创建时间范围 [after, before)，UTC 'YYYY-MM-DD HH:MM:SS'
+        - cursor: 上一页最后一个任务的 encode_cursor()，返回其之后的任务
+        - fields: 字段投影（见 resolve_fields），未知字段抛出 ValueError
+        """
+        pass
+
+    @abstractmethod
+    def cleanup_old_task_files(self, days: int = 7) -> int:
+        """清理旧任务的结果文件（保留任务记录），返回删除的目录数"""
+        pass
+
+    @abstractmethod
+    def cleanup_old_task_records(self, days: int = 30) -> int:
+        """永久删除旧任务记录，返回删除的记录数"""
+        pass
+
+    @abstractmethod
+    def renew_leases(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        """为 Worker 仍持有的 processing 任务续约，返回续约成功的任务 ID（不在列表中的任务已失去租约）"""
+        pass
+
+    @abstractmethod
+    def release_task(self, task_id: str, worker_id: str) -> bool:
+        """
+        将 Worker 仍持有、尚未开始处理的任务放回队列（retry_count 不变）
+
+        只有 status = 'processing' 且 worker_id 匹配时才生效：租约已被回收并由其他 Worker 认领、
+        或已被取消的任务不受影响。返回是否放回成功
+        """
+        pass
+
+    @abstractmethod
+    def reclaim_expired_leases(self) -> int:
+        """将租约已过期的 processing 任务放回队列（retry_count + 1），返回回收的任务数"""
+        pass
+
+    @abstractmethod
+    def register_worker(self, worker_id: str, backends: List[str]):
+        """
+        登记 Worker 心跳及其已预热的处理后端（引擎已加载，无需冷启动即可处理的任务 backend）
+
+        超过租约时长未心跳的 Worker 视为离线，不参与亲和调度
+        """
+        pass
+
+    @abstractmethod
+    def unregister_worker(self, worker_id: str):
+        """移除 Worker 登记（Worker 正常退出时调用）"""
+        pass
+
+    @abstractmethod
+    def list_workers(self) -> List[Dict]:
+        """列出在线 Worker：[{worker_id, backends, heartbeat_at}]"""
+        pass
+
+    @abstractmethod
+    def reset_stale_tasks(self, timeout_minutes: int = 60) -> int:
+        """重置超时且没有租约的 processing 任务为 pending，返回重置的任务数"""
+        pass
+
+    def archive_old_tasks(self, days: int = 30, chunk_size: int = 1000) -> int:
+        """将旧的终态任务迁移到归档存储，返回归档的记录数（不支持归档的后端返回 0）"""
+        return 0
+
+    def reconcile_queue_stats(self) -> Dict[str, int]:
+        """校准状态计数，返回有偏差的状态及偏差值（统计本身精确的后端返回空字典）"""
+        return {}
+
+    def describe(self) -> str:
+        """返回后端位置描述（用于日志，不应包含密码等敏感信息）"""
+        return self.BACKEND_NAME
+
+    def close(self):
+        """释放连接等资源"""
+        pass
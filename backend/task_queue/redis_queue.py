@@ -0,0 +1,1155 @@
+"""
+Redis Task Queue - Redis 协议任务队列后端
+
+数据结构（键名统一带前缀，默认 tianshu:）：
+- {prefix}task:{task_id}        Hash   任务元数据（字段与 SQLite tasks 表一致）
+- {prefix}queue                 ZSet   待处理队列，score = -priority * 1e13 + 创建时间(ms)，
+                                       ZRANGE 0 即为 (priority DESC, created_at ASC) 顺序
+- {prefix}status:{status}       ZSet   各状态的任务索引，score = 创建时间(ms)，ZCARD 即为状态计数
+- {prefix}tasks                 ZSet   所有任务，score = 创建时间(ms)
+- {prefix}user:{user_id}        ZSet   用户的任务，score = 创建时间(ms)
+- {prefix}leases                ZSet   processing 任务的租约，score = 租约到期时间(ms)
+- {prefix}progress:{task_id}    Hash   任务各阶段进度，field = 阶段名，value = JSON
+- {prefix}children:{task_id}    ZSet   父任务的子任务（大文件分片），score = 分片序号
+- {prefix}workers               Hash   Worker 登记，field = worker_id，value = JSON {backends, heartbeat_ms}
+- {prefix}metrics               Hash   任务资源统计，field = task_id，value = JSON（字段见 TASK_METRIC_FIELDS）
+- {prefix}metrics_index         ZSet   资源统计的记录时间，score = 记录时间(ms)
+- {prefix}events                Stream 任务变更流（创建、状态迁移、进度更新），约保留最近 TASK_EVENTS_RETAIN 条
+
+认领和状态迁移通过 Lua 脚本在服务端原子执行，多个节点的 Worker 可以安全并发认领。
+兼容所有实现 Redis 协议和 EVALSHA 的服务（Redis、Valkey、KeyDB 等）。
+"""
+
+import json
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from .base import (
+    BATCH_OPTION_DEFAULTS,
+    TaskQueue,
+    TASK_EVENTS_RETAIN,
+    TASK_EVENT_FIELDS,
+    TASK_FIELDS,
+    TASK_METRIC_FIELDS,
+    TASK_STATUSES,
+    aggregate_task_metrics,
+    build_metrics_summary,
+    build_progress,
+    decode_cursor,
+    resolve_fields,
+)
+
+# 优先级编码到 score 时的倍数（毫秒时间戳约 1.8e12 < 1e13）
+# double 精确表示 2^53 ≈ 9e15 以内的整数，因此优先级需限制在 ±800 以内
+PRIORITY_SCALE = 10**13
+MAX_PRIORITY = 800
+
+# 整数字段（Redis 中以字符串存储，读取时转换）
+INT_FIELDS = ("priority", "retry_count")
+
+# 向任务变更流追加状态事件（修改状态的脚本共用，ARGV[1] 为前缀）
+_EMIT_STATUS = f"""
+local function emit_status(id, status)
+    redis.call('XADD', ARGV[1] .. 'events', 'MAXLEN', '~', {TASK_EVENTS_RETAIN}, '*',
+        'task_id', id, 'type', 'status', 'status', status)
+end
+"""
+
+# 将一个 pending 任务标记为 processing 并获得租约（认领脚本共用）
+# ARGV: prefix, worker_id, n / parent_task_id, now, lease_expires_at, lease_expires_ms
+_CLAIM_ONE = (
+    _EMIT_STATUS
+    + """
+local prefix = ARGV[1]
+local function claim(id)
+    redis.call('ZREM', prefix .. 'queue', id)
+    local created = redis.call('ZSCORE', prefix .. 'status:pending', id)
+    redis.call('ZREM', prefix .. 'status:pending', id)
+    redis.call('ZADD', prefix .. 'status:processing', created or 0, id)
+    redis.call('HSET', prefix .. 'task:' .. id, 'status', 'processing', 'started_at', ARGV[4], 'worker_id', ARGV[2],
+        'lease_expires_at', ARGV[5])
+    redis.call('ZADD', prefix .. 'leases', ARGV[6], id)
+    emit_status(id, 'processing')
+end
+"""
+)
+
+# 原子认领：从待处理队列头部取出最多 N 个任务并标记为 processing（同时获得租约）
+# KEYS: 无（键名由前缀拼接，不支持 Redis Cluster）
+# ARGV: prefix, worker_id, n, now, lease_expires_at, lease_expires_ms
+CLAIM_SCRIPT = (
+    _CLAIM_ONE
+    + """
+local ids = redis.call('ZRANGE', prefix .. 'queue', 0, tonumber(ARGV[3]) - 1)
+for _, id in ipairs(ids) do
+    claim(id)
+end
+return ids
+"""
+)
+
+# 引擎亲和认领：按队列顺序扫描头部最多 scan_limit 个任务，
+# 选取第一个可认领任务（后端未被其他 Worker 预热或已等待超过亲和时长），
+# 同等优先级下若有本 Worker 已预热后端的任务则优先选取
+# ARGV: prefix, worker_id, warm(逗号分隔), now, lease_expires_at, lease_expires_ms,
+#       reserved(逗号分隔), cutoff_ms, scan_limit
+AFFINITY_CLAIM_SCRIPT = (
+    _CLAIM_ONE
+    + """
+local function set_of(csv)
+    local set = {}
+    for name in string.gmatch(csv, '[^,]+') do
+        set[name] = true
+    end
+    return set
+end
+local warm = set_of(ARGV[3])
+local reserved = set_of(ARGV[7])
+local cutoff = tonumber(ARGV[8])
+local chosen, chosen_priority
+for _, id in ipairs(redis.call('ZRANGE', prefix .. 'queue', 0, tonumber(ARGV[9]) - 1)) do
+    local fields = redis.call('HMGET', prefix .. 'task:' .. id, 'backend', 'priority')
+    local backend = fields[1] or ''
+    local priority = tonumber(fields[2] or '0')
+    if chosen and priority < chosen_priority then
+        break
+    end
+    if warm[backend] then
+        chosen = id
+        break
+    end
+    if not chosen then
+        local created = tonumber(redis.call('ZSCORE', prefix .. 'status:pending', id) or '0')
+        if not reserved[backend] or created <= cutoff then
+            chosen = id
+            chosen_priority = priority
+        end
+    end
+end
+if chosen then
+    claim(chosen)
+    return chosen
+end
+return false
+"""
+)
+
+# 微批认领：按队列顺序扫描头部最多 scan_limit 个任务，认领最多 n 个可合并的任务
+# （后端、扩展名匹配，不是子任务，选项与批内首个任务相同，且不是其他 Worker 的预留任务）
+# ARGV: prefix, worker_id, n, now, lease_expires_at, lease_expires_ms,
+#       backends(逗号分隔), file_exts(逗号分隔), options([[key, default, value], ...] JSON),
+#       reserved(逗号分隔), cutoff_ms, scan_limit
+BATCH_CLAIM_SCRIPT = (
+    _CLAIM_ONE
+    + """
+local function set_of(csv)
+    local set = {}
+    for name in string.gmatch(csv, '[^,]+') do
+        set[name] = true
+    end
+    return set
+end
+local backends = set_of(ARGV[7])
+local exts = set_of(ARGV[8])
+local rules = cjson.decode(ARGV[9])
+local reserved = set_of(ARGV[10])
+local cutoff = tonumber(ARGV[11])
+
+local function matches(id)
+    local fields = redis.call('HMGET', prefix .. 'task:' .. id, 'backend', 'file_path', 'options', 'parent_task_id')
+    if not backends[fields[1] or ''] or fields[4] then
+        return false
+    end
+    local ext = string.match(string.lower(fields[2] or ''), '%.[^./]*$')
+    if not ext or not exts[ext] then
+        return false
+    end
+    if reserved[fields[1]] and tonumber(redis.call('ZSCORE', prefix .. 'status:pending', id) or '0') > cutoff then
+        return false
+    end
+    local ok, options = pcall(cjson.decode, fields[3] or '{}')
+    if not ok or type(options) ~= 'table' then
+        return false
+    end
+    for _, rule in ipairs(rules) do
+        local value = options[rule[1]]
+        if value == nil or value == cjson.null then
+            value = rule[2]
+        end
+        if value ~= rule[3] then
+            return false
+        end
+    end
+    return true
+end
+
+local ids = {}
+for _, id in ipairs(redis.call('ZRANGE', prefix .. 'queue', 0, tonumber(ARGV[12]) - 1)) do
+    if matches(id) then
+        claim(id)
+        table.insert(ids, id)
+        if #ids >= tonumber(ARGV[3]) then
+            break
+        end
+    end
+end
+return ids
+"""
+)
+
+# 原子认领父任务的一个待处理子任务
+# ARGV: prefix, worker_id, parent_task_id, now, lease_expires_at, lease_expires_ms
+CLAIM_CHILD_SCRIPT = (
+    _CLAIM_ONE
+    + """
+for _, id in ipairs(redis.call('ZRANGE', prefix .. 'children:' .. ARGV[3], 0, -1)) do
+    if redis.call('HGET', prefix .. 'task:' .. id, 'status') == 'pending' then
+        claim(id)
+        return id
+    end
+end
+return false
+"""
+)
+
+# 续约：只续约仍由该 Worker 持有的 processing 任务
+# ARGV: prefix, worker_id, lease_expires_at, lease_expires_ms, task_id*
+RENEW_SCRIPT = """
+local prefix = ARGV[1]
+local renewed = {}
+for i = 5, #ARGV do
+    local key = prefix .. 'task:' .. ARGV[i]
+    local fields = redis.call('HMGET', key, 'status', 'worker_id')
+    if fields[1] == 'processing' and fields[2] == ARGV[2] then
+        redis.call('HSET', key, 'lease_expires_at', ARGV[3])
+        redis.call('ZADD', prefix .. 'leases', ARGV[4], ARGV[i])
+        table.insert(renewed, ARGV[i])
+    end
+end
+return renewed
+"""
+
+# 回收过期租约：将到期的 processing 任务放回待处理队列
+# ARGV: prefix, now_ms
+RECLAIM_SCRIPT = (
+    _EMIT_STATUS
+    + """
+local prefix = ARGV[1]
+local ids = redis.call('ZRANGEBYSCORE', prefix .. 'leases', '-inf', '(' .. ARGV[2])
+local count = 0
+for _, id in ipairs(ids) do
+    redis.call('ZREM', prefix .. 'leases', id)
+    local key = prefix .. 'task:' .. id
+    if redis.call('HGET', key, 'status') == 'processing' then
+        local created = redis.call('ZSCORE', prefix .. 'status:processing', id) or 0
+        redis.call('ZREM', prefix .. 'status:processing', id)
+        redis.call('ZADD', prefix .. 'status:pending', created, id)
+        redis.call('HSET', key, 'status', 'pending')
+        redis.call('HDEL', key, 'worker_id', 'started_at', 'lease_expires_at')
+        redis.call('HINCRBY', key, 'retry_count', 1)
+        local priority = tonumber(redis.call('HGET', key, 'priority') or '0')
+        redis.call('ZADD', prefix .. 'queue', -priority * 1e13 + created, id)
+        emit_status(id, 'pending')
+        count = count + 1
+    end
+end
+return count
+"""
+)
+
+# 原子状态迁移（带前置条件检查）
+# ARGV: prefix, task_id, new_status, expected_status('' 表示不检查), expected_worker('' 表示不检查),
+#       incr_retry('1'/'0'), n_set, [field, value]*n_set, [field_to_delete]*
+TRANSITION_SCRIPT = (
+    _EMIT_STATUS
+    + """
+local prefix = ARGV[1]
+local id = ARGV[2]
+local new_status = ARGV[3]
+local key = prefix .. 'task:' .. id
+local cur = redis.call('HGET', key, 'status')
+if not cur then
+    return 0
+end
+if ARGV[4] ~= '' and cur ~= ARGV[4] then
+    return 0
+end
+if ARGV[5] ~= '' and redis.call('HGET', key, 'worker_id') ~= ARGV[5] then
+    return 0
+end
+
+local created = redis.call('ZSCORE', prefix .. 'status:' .. cur, id) or redis.call('ZSCORE', prefix .. 'tasks', id) or 0
+redis.call('ZREM', prefix .. 'status:' .. cur, id)
+redis.call('ZADD', prefix .. 'status:' .. new_status, created, id)
+redis.call('ZREM', prefix .. 'queue', id)
+redis.call('ZREM', prefix .. 'leases', id)
+redis.call('HDEL', key, 'lease_expires_at')
+
+local n_set = tonumber(ARGV[7])
+local idx = 8
+for i = 1, n_set do
+    redis.call('HSET', key, ARGV[idx], ARGV[idx + 1])
+    idx = idx + 2
+end
+for i = idx, #ARGV do
+    redis.call('HDEL', key, ARGV[i])
+end
+redis.call('HSET', key, 'status', new_status)
+if ARGV[6] == '1' then
+    redis.call('HINCRBY', key, 'retry_count', 1)
+end
+
+if new_status == 'pending' then
+    local priority = tonumber(redis.call('HGET', key, 'priority') or '0')
+    redis.call('ZADD', prefix .. 'queue', -priority * 1e13 + created, id)
+end
+if cur ~= new_status then
+    emit_status(id, new_status)
+end
+return 1
+"""
+)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _format_ts(dt: datetime) -> str:
+    """格式化为与 SQLite CURRENT_TIMESTAMP 一致的 UTC 字符串"""
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _ts_to_ms(value: str) -> int:
+    """将 'YYYY-MM-DD HH:MM:SS' UTC 字符串转换为毫秒时间戳（与索引 score 一致）"""
+    dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+class RedisTaskQueue(TaskQueue):
+    """Redis 协议任务队列后端"""
+
+    BACKEND_NAME = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", key_prefix: str = "tianshu:", client=None):
+        """
+        初始化 Redis 队列
+
+        Args:
+            url: Redis 连接 URL（redis://[:password@]host:port/db）
+            key_prefix: 键名前缀，多套部署共用一个 Redis 时用于隔离
+            client: 已创建的 Redis 客户端（可选，需 decode_responses=True）
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("redis is required for the Redis queue backend. Install with: pip install redis")
+
+            client = redis.Redis.from_url(url, decode_responses=True)
+
+        self.url = url
+        self.prefix = key_prefix
+        self.client = client
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._transition = client.register_script(TRANSITION_SCRIPT)
+        self._renew = client.register_script(RENEW_SCRIPT)
+        self._reclaim = client.register_script(RECLAIM_SCRIPT)
+        self._claim_child = client.register_script(CLAIM_CHILD_SCRIPT)
+        self._affinity_claim = client.register_script(AFFINITY_CLAIM_SCRIPT)
+        self._batch_claim = client.register_script(BATCH_CLAIM_SCRIPT)
+
+    def describe(self) -> str:
+        """返回不含密码的连接描述"""
+        if "@" in self.url:
+            scheme, rest = self.url.split("://", 1)
+            return f"{scheme}://***@{rest.split('@', 1)[1]}"
+        return self.url
+
+    # ------------------------------------------------------------------
+    # 内部工具
+    # ------------------------------------------------------------------
+
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+
+    def _decode(self, data: Dict[str, str]) -> Optional[Dict]:
+        """将 Redis Hash 转换为与 SQLite 一致的任务字典"""
+        if not data:
+            return None
+        task = {field: data.get(field) for field in TASK_FIELDS}
+        for field in INT_FIELDS:
+            task[field] = int(task[field]) if task[field] is not None else 0
+        return task
+
+    def _load_tasks(self, task_ids: List[str]) -> List[Dict]:
+        """批量读取任务（保持传入顺序，跳过已不存在的任务）"""
+        if not task_ids:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(self._key("task", task_id))
+        return [task for task in map(self._decode, pipe.execute()) if task]
+
+    def _move(
+        self,
+        task_id: str,
+        status: str,
+        expected_status: str = "",
+        expected_worker: str = "",
+        set_fields: Optional[Dict[str, str]] = None,
+        del_fields: tuple = (),
+        incr_retry: bool = False,
+    ) -> bool:
+        """执行原子状态迁移脚本"""
+        set_fields = set_fields or {}
+        args = [
+            self.prefix,
+            task_id,
+            status,
+            expected_status,
+            expected_worker or "",
+            "1" if incr_retry else "0",
+            len(set_fields),
+        ]
+        for field, value in set_fields.items():
+            args.extend([field, value])
+        args.extend(del_fields)
+        return bool(self._transition(keys=[], args=args))
+
+    def _iter_status_ids(self, status: str, batch: int = 1000):
+        """按创建时间顺序遍历某状态下的任务 ID"""
+        start = 0
+        while True:
+            ids = self.client.zrange(self._key("status", status), start, start + batch - 1)
+            if not ids:
+                return
+            yield from ids
+            start += batch
+
+    def _delete_task(self, task: Dict):
+        """删除任务及其所有索引"""
+        task_id = task["task_id"]
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self._key("task", task_id))
+        pipe.delete(self._key("progress", task_id))
+        pipe.delete(self._key("children", task_id))
+        pipe.zrem(self._key("queue"), task_id)
+        pipe.zrem(self._key("leases"), task_id)
+        pipe.zrem(self._key("tasks"), task_id)
+        for status in TASK_STATUSES:
+            pipe.zrem(self._key("status", status), task_id)
+        if task.get("user_id"):
+            pipe.zrem(self._key("user", task["user_id"]), task_id)
+        pipe.execute()
+
+    def _add_event(self, pipe, task_id: str, **fields):
+        """在 pipeline 中追加一条任务变更事件"""
+        fields = {k: v for k, v in fields.items() if v is not None}
+        pipe.xadd(self._key("events"), {"task_id": task_id, **fields}, maxlen=TASK_EVENTS_RETAIN, approximate=True)
+
+    # ------------------------------------------------------------------
+    # TaskQueue 接口
+    # ------------------------------------------------------------------
+
+    def create_task(
+        self,
+        file_name: str,
+        file_path: str,
+        backend: str = "pipeline",
+        options: dict = None,
+        priority: int = 0,
+        user_id: str = None,
+        cache_key: str = None,
+        result_path: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
+    ) -> str:
+        """创建新任务（写入 Hash 并加入待处理队列，使用 MULTI 保证原子性；结果缓存命中时直接创建为 completed）"""
+        pipe = self.client.pipeline(transaction=True)
+        task_id = self._add_task(
+            pipe,
+            _utc_now(),
+            file_name=file_name,
+            file_path=file_path,
+            backend=backend,
+            options=options,
+            priority=priority,
+            user_id=user_id,
+            cache_key=cache_key,
+            result_path=result_path,
+            markdown_path=markdown_path,
+            json_path=json_path,
+        )
+        pipe.execute()
+        return task_id
+
+    def create_tasks(self, tasks: List[Dict]) -> List[str]:
+        """批量创建任务（所有任务在同一个 MULTI 中写入，一次网络往返）"""
+        now = _utc_now()
+        pipe = self.client.pipeline(transaction=True)
+        task_ids = [self._add_task(pipe, now, **task) for task in tasks]
+        pipe.execute()
+        return task_ids
+
+    def _add_task(
+        self,
+        pipe,
+        now: datetime,
+        file_name: str,
+        file_path: str,
+        backend: str = "pipeline",
+        options: dict = None,
+        priority: int = 0,
+        user_id: str = None,
+        cache_key: str = None,
+        result_path: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
+    ) -> str:
+        """在 pipeline 中追加创建一个任务的命令，返回 task_id"""
+        task_id = str(uuid.uuid4())
+        created_ms = int(now.timestamp() * 1000)
+        priority = max(-MAX_PRIORITY, min(MAX_PRIORITY, int(priority or 0)))
+
+        mapping = {
+            "task_id": task_id,
+            "file_name": file_name,
+            "status": "pending",
+            "priority": priority,
+            "backend": backend,
+            "options": json.dumps(options or {}),
+            "created_at": _format_ts(now),
+            "retry_count": 0,
+        }
+        if file_path:
+            mapping["file_path"] = file_path
+        if user_id:
+            mapping["user_id"] = user_id
+        if cache_key:
+            mapping["cache_key"] = cache_key
+        if result_path:
+            mapping.update(
+                status="completed",
+                result_path=result_path,
+                started_at=mapping["created_at"],
+                completed_at=mapping["created_at"],
+            )
+            if markdown_path:
+                mapping["markdown_path"] = markdown_path
+            if json_path:
+                mapping["json_path"] = json_path
+
+        pipe.hset(self._key("task", task_id), mapping=mapping)
+        pipe.zadd(self._key("tasks"), {task_id: created_ms})
+        pipe.zadd(self._key("status", mapping["status"]), {task_id: created_ms})
+        if not result_path:
+            pipe.zadd(self._key("queue"), {task_id: -priority * PRIORITY_SCALE + created_ms})
+        if user_id:
+            pipe.zadd(self._key("user", user_id), {task_id: created_ms})
+        self._add_event(pipe, task_id, type="status", status=mapping["status"])
+        return task_id
+
+    # 亲和认领时最多扫描的队列头部任务数（超出部分按普通顺序等待）
+    AFFINITY_SCAN_LIMIT = 1000
+
+    def get_next_task(self, worker_id: str, max_retries: int = 3) -> Optional[Dict]:
+        """获取下一个待处理任务（Lua 脚本原子认领，无需重试）"""
+        warm, reserved = self._affinity_backends(worker_id)
+        if not warm and not reserved:
+            tasks = self.claim_tasks(worker_id, 1)
+            return tasks[0] if tasks else None
+
+        now = _utc_now()
+        cutoff_ms = int(now.timestamp() * 1000 - self.affinity_wait_seconds * 1000)
+        task_id = self._affinity_claim(
+            keys=[],
+            args=[
+                self.prefix,
+                worker_id,
+                ",".join(warm),
+                _format_ts(now),
+                *self._lease_args(now),
+                ",".join(reserved),
+                cutoff_ms,
+                self.AFFINITY_SCAN_LIMIT,
+            ],
+        )
+        return self.get_task(task_id) if task_id else None
+
+    def _affinity_backends(self, worker_id: str):
+        """读取引擎亲和信息：(本 Worker 已预热的后端, 仅由其他在线 Worker 预热的后端)"""
+        if self.affinity_wait_seconds <= 0:
+            return [], []
+
+        warm, others = set(), set()
+        for worker in self.list_workers():
+            (warm if worker["worker_id"] == worker_id else others).update(worker["backends"])
+        return sorted(warm), sorted(others - warm)
+
+    def claim_tasks(self, worker_id: str, n: int = 1) -> List[Dict]:
+        """批量认领最多 n 个任务（单次 Lua 脚本调用）"""
+        if n <= 0:
+            return []
+        now = _utc_now()
+        lease_args = self._lease_args(now)
+        task_ids = self._claim(keys=[], args=[self.prefix, worker_id, n, _format_ts(now), *lease_args])
+        return self._load_tasks(task_ids)
+
+    def claim_batch_tasks(
+        self, worker_id: str, n: int, backends: Iterable[str], file_exts: Iterable[str], options: Dict
+    ) -> List[Dict]:
+        """认领最多 n 个可以合并进同一微批的任务（单次 Lua 脚本调用，在服务端按条件过滤）"""
+        backends, file_exts = list(backends), [ext.lower() for ext in file_exts]
+        if n <= 0 or not backends or not file_exts:
+            return []
+        _, reserved = self._affinity_backends(worker_id)
+        rules = [[key, default, options.get(key, default)] for key, default in BATCH_OPTION_DEFAULTS.items()]
+        now = _utc_now()
+        task_ids = self._batch_claim(
+            keys=[],
+            args=[
+                self.prefix,
+                worker_id,
+                n,
+                _format_ts(now),
+                *self._lease_args(now),
+                ",".join(backends),
+                ",".join(file_exts),
+                json.dumps(rules),
+                ",".join(reserved),
+                int(now.timestamp() * 1000 - self.affinity_wait_seconds * 1000),
+                self.AFFINITY_SCAN_LIMIT,
+            ],
+        )
+        return self._load_tasks(task_ids)
+
+    def _lease_args(self, now: datetime) -> list:
+        """租约到期时间（字符串, 毫秒）"""
+        expires = now + timedelta(seconds=self.lease_seconds)
+        return [_format_ts(expires), int(expires.timestamp() * 1000)]
+
+    def update_task_status(
+        self,
+        task_id: str,
+        status: str,
+        result_path: str = None,
+        error_message: str = None,
+        worker_id: str = None,
+        markdown_path: str = None,
+        json_path: str = None,
+    ) -> bool:
+        """更新任务状态（前置条件与 SQLite 后端一致）"""
+        now = _format_ts(_utc_now())
+
+        if status == "completed":
+            fields = {"completed_at": now}
+            values = {"result_path": result_path, "markdown_path": markdown_path, "json_path": json_path}
+            fields.update({k: v for k, v in values.items() if v is not None})
+            success = self._move(
+                task_id,
+                status,
+                expected_status="processing",
+                expected_worker=worker_id,
+                set_fields=fields,
+                del_fields=tuple(k for k, v in values.items() if v is None),
+            )
+        elif status == "failed":
+            fields = {"completed_at": now}
+            if error_message is not None:
+                fields["error_message"] = error_message
+            success = self._move(
+                task_id,
+                status,
+                expected_status="processing",
+                expected_worker=worker_id,
+                set_fields=fields,
+                del_fields=() if error_message is not None else ("error_message",),
+            )
+        elif status == "cancelled":
+            # 只取消尚未结束的任务（已完成或失败的任务不会被覆盖）
+            success = any(
+                self._move(task_id, status, expected_status=current, set_fields={"completed_at": now})
+                for current in ("pending", "processing")
+            )
+        elif status == "pending":
+            success = self._move(task_id, status, del_fields=("worker_id", "started_at"))
+        else:
+            success = self._move(task_id, status)
+
+        if not success and status in ["completed", "failed"]:
+            logger.debug(f"Status update failed: task_id={task_id}, status={status}, worker_id={worker_id}")
+
+        return success
+
+    def get_task(self, task_id: str) -> Optional[Dict]:
+        """查询任务详情"""
+        return self._decode(self.client.hgetall(self._key("task", task_id)))
+
+    def set_result_files(self, task_id: str, markdown_path: Optional[str], json_path: Optional[str]):
+        """补记已完成任务的结果文件路径"""
+        key = self._key("task", task_id)
+        if self.client.hget(key, "status") != "completed":
+            return
+        values = {"markdown_path": markdown_path, "json_path": json_path}
+        pipe = self.client.pipeline(transaction=True)
+        for field, value in values.items():
+            if value is None:
+                pipe.hdel(key, field)
+            else:
+                pipe.hset(key, field, value)
+        pipe.execute()
+
+    def create_child_tasks(self, parent: Dict, shard_options: List[dict], file_path: str = None) -> List[str]:
+        """为父任务创建一批子任务（MULTI 保证原子性，子任务按分片顺序记录在 children 索引中，后端和所属用户与父任务相同）"""
+        now = _utc_now()
+        created_ms = int(now.timestamp() * 1000)
+        priority = int(parent.get("priority") or 0)
+        children_key = self._key("children", parent["task_id"])
+
+        task_ids = []
+        pipe = self.client.pipeline(transaction=True)
+        for index, options in enumerate(shard_options):
+            task_id = str(uuid.uuid4())
+            task_ids.append(task_id)
+            mapping = {
+                "task_id": task_id,
+                "file_name": parent["file_name"],
+                "file_path": file_path or parent["file_path"],
+                "status": "pending",
+                "priority": priority,
+                "backend": parent["backend"],
+                "options": json.dumps(options),
+                "created_at": _format_ts(now),
+                "retry_count": 0,
+                "parent_task_id": parent["task_id"],
+            }
+            if parent.get("user_id"):
+                mapping["user_id"] = parent["user_id"]
+                pipe.zadd(self._key("user", parent["user_id"]), {task_id: created_ms})
+            pipe.hset(self._key("task", task_id), mapping=mapping)
+            pipe.zadd(self._key("tasks"), {task_id: created_ms})
+            pipe.zadd(self._key("status", "pending"), {task_id: created_ms})
+            pipe.zadd(self._key("queue"), {task_id: -priority * PRIORITY_SCALE + created_ms})
+            pipe.zadd(children_key, {task_id: index})
+            self._add_event(pipe, task_id, type="status", status="pending")
+        pipe.execute()
+        return task_ids
+
+    def get_child_tasks(self, parent_task_id: str) -> List[Dict]:
+        """获取父任务的全部子任务（按分片顺序）"""
+        return self._load_tasks(self.client.zrange(self._key("children", parent_task_id), 0, -1))
+
+    def claim_child_task(self, parent_task_id: str, worker_id: str) -> Optional[Dict]:
+        """认领父任务的一个待处理子任务（单次 Lua 脚本调用）"""
+        now = _utc_now()
+        args = [self.prefix, worker_id, parent_task_id, _format_ts(now), *self._lease_args(now)]
+        task_id = self._claim_child(keys=[], args=args)
+        return self.get_task(task_id) if task_id else None
+
+    def get_cached_result(self, cache_key: str) -> Optional[str]:
+        """查询结果缓存（命中时刷新 LRU 时间，结果目录已被清理的条目会被删除）"""
+        key = self._key("cache", cache_key)
+        result_path = self.client.hget(key, "result_path")
+        if not result_path:
+            return None
+
+        if not Path(result_path).exists():
+            self._drop_cache_entries([cache_key])
+            return None
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hincrby(key, "hit_count", 1)
+        pipe.zadd(self._key("cache_lru"), {cache_key: int(_utc_now().timestamp() * 1000)})
+        pipe.execute()
+        return result_path
+
+    def put_cached_result(self, cache_key: str, result_path: str, size_bytes: int = 0):
+        """写入结果缓存（Hash 保存条目，ZSet 按最近使用时间排序）"""
+        now = _utc_now()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(
+            self._key("cache", cache_key),
+            mapping={"result_path": result_path, "size_bytes": int(size_bytes), "created_at": _format_ts(now)},
+        )
+        pipe.zadd(self._key("cache_lru"), {cache_key: int(now.timestamp() * 1000)})
+        pipe.execute()
+
+    def evict_result_cache(self, max_bytes: int) -> int:
+        """按最近最少使用（LRU）淘汰结果缓存条目（只删除条目，结果目录由 cleanup_old_task_files 清理）"""
+        cache_keys = self.client.zrange(self._key("cache_lru"), 0, -1)
+        if not cache_keys:
+            return 0
+
+        pipe = self.client.pipeline(transaction=False)
+        for cache_key in cache_keys:
+            pipe.hget(self._key("cache", cache_key), "size_bytes")
+        sizes = [int(size or 0) for size in pipe.execute()]
+
+        total = sum(sizes)
+        evicted = []
+        for cache_key, size in zip(cache_keys, sizes):
+            if total <= max_bytes:
+                break
+            evicted.append(cache_key)
+            total -= size
+
+        self._drop_cache_entries(evicted)
+        return len(evicted)
+
+    def _drop_cache_entries(self, cache_keys: List[str]):
+        if not cache_keys:
+            return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(*[self._key("cache", cache_key) for cache_key in cache_keys])
+        pipe.zrem(self._key("cache_lru"), *cache_keys)
+        pipe.execute()
+
+    def update_progress(self, task_id: str, stage: str, done: int = 0, total: Optional[int] = None):
+        """记录任务处理进度（单个 Hash 字段保存一个阶段）"""
+        key = self._key("progress", task_id)
+        now = _utc_now().timestamp()
+        previous = self.client.hget(key, stage)
+        entry = json.loads(previous) if previous else {"started": now, "total": None}
+        entry.update(done=done, updated=now)
+        if total is not None:
+            entry["total"] = total
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(key, stage, json.dumps(entry))
+        self._add_event(pipe, task_id, type="progress", stage=stage, done=done, total=entry["total"])
+        pipe.execute()
+
+    def get_progress(self, task_id: str) -> Optional[Dict]:
+        """获取任务进度摘要"""
+        now = _utc_now().timestamp()
+        stages = []
+        for stage, value in self.client.hgetall(self._key("progress", task_id)).items():
+            entry = json.loads(value)
+            stages.append(
+                {
+                    "stage": stage,
+                    "done": entry["done"],
+                    "total": entry["total"],
+                    "started_at": _format_ts(datetime.fromtimestamp(entry["started"], timezone.utc)),
+                    "updated_at": _format_ts(datetime.fromtimestamp(entry["updated"], timezone.utc)),
+                    "duration": entry["updated"] - entry["started"],
+                    "elapsed": now - entry["started"],
+                }
+            )
+        stages.sort(key=lambda item: item["elapsed"], reverse=True)
+        return build_progress(stages)
+
+    def clear_progress(self, task_id: str):
+        """清除任务的进度记录"""
+        self.client.delete(self._key("progress", task_id))
+
+    def record_task_metrics(self, metrics: Dict):
+        """写入任务资源统计（同一任务重新处理时覆盖之前的记录）"""
+        now = _utc_now()
+        record = {field: metrics.get(field) for field in TASK_METRIC_FIELDS}
+        record["stages"] = metrics.get("stages") or {}
+        record["recorded_at"] = _format_ts(now)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._key("metrics"), record["task_id"], json.dumps(record))
+        pipe.zadd(self._key("metrics_index"), {record["task_id"]: int(now.timestamp() * 1000)})
+        pipe.execute()
+
+    def get_task_metrics(self, task_id: str) -> Optional[Dict]:
+        """获取任务的资源统计"""
+        value = self.client.hget(self._key("metrics"), task_id)
+        return json.loads(value) if value else None
+
+    def get_task_metrics_summary(self, since: Optional[str] = None, backend: Optional[str] = None) -> List[Dict]:
+        """按处理后端汇总资源统计（按记录时间索引取出时间范围内的记录，在客户端累计）"""
+        task_ids = self.client.zrangebyscore(self._key("metrics_index"), _ts_to_ms(since) if since else "-inf", "+inf")
+
+        def records():
+            for start in range(0, len(task_ids), 1000):
+                for value in self.client.hmget(self._key("metrics"), task_ids[start : start + 1000]):
+                    if value:
+                        record = json.loads(value)
+                        if backend is None or record["backend"] == backend:
+                            yield record
+
+        return build_metrics_summary(*aggregate_task_metrics(records()))
+
+    def get_queue_stats(self) -> Dict[str, int]:
+        """获取队列统计信息（各状态 ZSet 的 ZCARD，O(1)）"""
+        pipe = self.client.pipeline(transaction=False)
+        for status in TASK_STATUSES:
+            pipe.zcard(self._key("status", status))
+        counts = pipe.execute()
+        return {status: count for status, count in zip(TASK_STATUSES, counts) if count}
+
+    def get_latest_event_id(self) -> Optional[str]:
+        """任务变更流中最新事件的 ID"""
+        entries = self.client.xrevrange(self._key("events"), count=1)
+        return entries[0][0] if entries else None
+
+    def get_task_events(self, after_id: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """读取任务变更事件（XREAD 非阻塞读取 after_id 之后的条目，流 ID 的毫秒部分即事件时间）"""
+        streams = self.client.xread({self._key("events"): after_id or "0-0"}, count=limit)
+        events = []
+        for _, entries in streams:
+            for event_id, data in entries:
+                event = {field: data.get(field) for field in TASK_EVENT_FIELDS}
+                event["event_id"] = event_id
+                for field in ("done", "total"):
+                    if event[field] is not None:
+                        event[field] = int(event[field])
+                created = datetime.fromtimestamp(int(event_id.split("-")[0]) / 1000, timezone.utc)
+                event["created_at"] = created.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                events.append(event)
+        return events
+
+    def get_queue_depth(self) -> Dict[str, Dict[str, int]]:
+        """获取 pending / processing 任务按处理后端的数量（按状态索引分批读取 backend 字段，耗时与未结束任务数成正比）"""
+        depth: Dict[str, Dict[str, int]] = {}
+        for status in ("pending", "processing"):
+            task_ids = list(self._iter_status_ids(status))
+            for start in range(0, len(task_ids), 1000):
+                pipe = self.client.pipeline(transaction=False)
+                for task_id in task_ids[start : start + 1000]:
+                    pipe.hget(self._key("task", task_id), "backend")
+                for backend in pipe.execute():
+                    if backend is not None:
+                        counts = depth.setdefault(status, {})
+                        counts[backend] = counts.get(backend, 0) + 1
+        return depth
+
+    def get_tasks_by_status(self, status: str, limit: int = 100) -> List[Dict]:
+        """根据状态获取任务列表"""
+        return self.list_tasks(status=status, limit=limit)
+
+    def list_tasks(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+        backend: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[Dict]:
+        """
+        获取任务列表（按创建时间倒序，游标分页）
+
+        在最匹配的 ZSet 索引上按 score（创建时间毫秒）倒序扫描，
+        同 score 的成员按 task_id 倒序排列，与 SQLite 的 (created_at, task_id) 顺序一致。
+        时间范围直接映射为 score 区间，其余筛选条件在扫描时过滤。
+        """
+        columns = resolve_fields(fields)
+
+        if user_id is not None:
+            index_key = self._key("user", user_id)
+        elif status:
+            index_key = self._key("status", status)
+        else:
+            index_key = self._key("tasks")
+
+        max_score = f"({_ts_to_ms(created_before)}" if created_before else "+inf"
+        min_score = _ts_to_ms(created_after) if created_after else "-inf"
+
+        # 游标定位：优先使用游标任务在索引中的精确 score，任务已删除时退回到其创建时间（秒精度）
+        after_score, after_id = None, None
+        if cursor:
+            cursor_created_at, after_id = decode_cursor(cursor)
+            after_score = self.client.zscore(index_key, after_id)
+            if after_score is None:
+                after_score = _ts_to_ms(cursor_created_at) + 999
+            if max_score == "+inf" or after_score < float(max_score.lstrip("(")):
+                max_score = after_score
+
+        need_filter = (user_id is not None and bool(status)) or bool(backend)
+        page = limit if not need_filter else max(limit, 200)
+        tasks = []
+        offset = 0
+        while len(tasks) < limit:
+            entries = self.client.zrevrangebyscore(
+                index_key, max_score, min_score, start=offset, num=page, withscores=True
+            )
+            if not entries:
+                break
+            offset += len(entries)
+
+            task_ids = [
+                task_id
+                for task_id, score in entries
+                if after_score is None or score < after_score or task_id < after_id
+            ]
+            for task in self._load_tasks(task_ids):
+                if user_id is not None and status and task["status"] != status:
+                    continue
+                if backend and task["backend"] != backend:
+                    continue
+                tasks.append({field: task[field] for field in columns})
+                if len(tasks) >= limit:
+                    break
+        return tasks
+
+    def cleanup_old_task_files(self, days: int = 7) -> int:
+        """
+        清理旧任务的结果文件（保留任务记录，清空 result_path）
+
+        缓存命中的任务与原任务共用结果目录：保留期内被结果缓存命中过、或仍被保留期内的任务引用的目录不删除
+        """
+        cutoff_dt = _utc_now() - timedelta(days=days)
+        cutoff = _format_ts(cutoff_dt)
+        cutoff_ms = int(cutoff_dt.timestamp() * 1000)
+        file_count = 0
+
+        in_use = set()
+        for cache_key in self.client.zrangebyscore(self._key("cache_lru"), cutoff_ms, "+inf"):
+            result_path = self.client.hget(self._key("cache", cache_key), "result_path")
+            if result_path:
+                in_use.add(result_path)
+
+        expired = []
+        for status in ("completed", "failed"):
+            for task_id in list(self._iter_status_ids(status)):
+                key = self._key("task", task_id)
+                completed_at, result_path = self.client.hmget(key, "completed_at", "result_path")
+                if not result_path:
+                    continue
+                if not completed_at or completed_at >= cutoff:
+                    in_use.add(result_path)
+                else:
+                    expired.append((task_id, key, result_path))
+
+        for task_id, key, result_path in expired:
+            if result_path in in_use:
+                continue
+            path = Path(result_path)
+            if not path.exists():
+                # 共用目录已随其他任务一起清理（结果缓存命中的任务）
+                self.client.hdel(key, "result_path", "markdown_path", "json_path")
+            elif path.is_dir():
+                try:
+                    shutil.rmtree(path)
+                    file_count += 1
+                    self.client.hdel(key, "result_path", "markdown_path", "json_path")
+                except Exception as e:
+                    logger.warning(f"Failed to delete result files for task {task_id}: {e}")
+
+        # 删除指向已清理目录的缓存条目
+        stale = []
+        for cache_key in self.client.zrangebyscore(self._key("cache_lru"), "-inf", f"({cutoff_ms}"):
+            result_path = self.client.hget(self._key("cache", cache_key), "result_path")
+            if not result_path or not Path(result_path).exists():
+                stale.append(cache_key)
+        self._drop_cache_entries(stale)
+
+        return file_count
+
+    def cleanup_old_task_records(self, days: int = 30) -> int:
+        """永久删除旧任务记录（所有终态：completed / failed / cancelled）"""
+        cutoff = _format_ts(_utc_now() - timedelta(days=days))
+        deleted_count = 0
+
+        for status in ("completed", "failed", "cancelled"):
+            for task_id in list(self._iter_status_ids(status)):
+                task = self.get_task(task_id)
+                if task and task["completed_at"] and task["completed_at"] < cutoff:
+                    self._delete_task(task)
+                    deleted_count += 1
+
+        # 同期的任务资源统计
+        stale = self.client.zrangebyscore(self._key("metrics_index"), "-inf", f"({_ts_to_ms(cutoff)}")
+        for start in range(0, len(stale), 1000):
+            chunk = stale[start : start + 1000]
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hdel(self._key("metrics"), *chunk)
+            pipe.zrem(self._key("metrics_index"), *chunk)
+            pipe.execute()
+
+        return deleted_count
+
+    def renew_leases(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        """为 Worker 仍持有的任务续约（单次 Lua 脚本调用）"""
+        if not task_ids:
+            return []
+        return self._renew(keys=[], args=[self.prefix, worker_id, *self._lease_args(_utc_now()), *task_ids])
+
+    def release_task(self, task_id: str, worker_id: str) -> bool:
+        """将 Worker 仍持有的任务放回队列（迁移脚本同时校验状态和 worker_id）"""
+        return self._move(
+            task_id,
+            "pending",
+            expected_status="processing",
+            expected_worker=worker_id,
+            del_fields=("worker_id", "started_at"),
+        )
+
+    def reclaim_expired_leases(self) -> int:
+        """回收租约过期的任务（Lua 脚本原子执行，与续约不会交错）"""
+        now_ms = int(_utc_now().timestamp() * 1000)
+        return int(self._reclaim(keys=[], args=[self.prefix, now_ms]))
+
+    def register_worker(self, worker_id: str, backends: List[str]):
+        """登记 Worker 心跳及已预热的处理后端"""
+        value = json.dumps({"backends": sorted(set(backends)), "heartbeat_ms": int(_utc_now().timestamp() * 1000)})
+        self.client.hset(self._key("workers"), worker_id, value)
+
+    def unregister_worker(self, worker_id: str):
+        """移除 Worker 登记"""
+        self.client.hdel(self._key("workers"), worker_id)
+
+    def list_workers(self) -> List[Dict]:
+        """列出在线 Worker（租约时长内有心跳），同时清理一天以上未心跳的离线 Worker 记录"""
+        now_ms = int(_utc_now().timestamp() * 1000)
+        live_cutoff = now_ms - self.lease_seconds * 1000
+        stale_cutoff = now_ms - 86400 * 1000
+        workers, stale = [], []
+        for worker_id, value in self.client.hgetall(self._key("workers")).items():
+            try:
+                info = json.loads(value)
+            except ValueError:
+                stale.append(worker_id)
+                continue
+            heartbeat_ms = info.get("heartbeat_ms", 0)
+            if heartbeat_ms < stale_cutoff:
+                stale.append(worker_id)
+            elif heartbeat_ms >= live_cutoff:
+                heartbeat_at = datetime.fromtimestamp(heartbeat_ms / 1000, timezone.utc)
+                workers.append(
+                    {
+                        "worker_id": worker_id,
+                        "backends": info.get("backends", []),
+                        "heartbeat_at": _format_ts(heartbeat_at),
+                    }
+                )
+        if stale:
+            self.client.hdel(self._key("workers"), *stale)
+        return sorted(workers, key=lambda w: w["worker_id"])
+
+    def reset_stale_tasks(self, timeout_minutes: int = 60) -> int:
+        """重置超时且没有租约的 processing 任务为 pending"""
+        cutoff = _format_ts(_utc_now() - timedelta(minutes=timeout_minutes))
+        reset_count = 0
+
+        for task_id in list(self._iter_status_ids("processing")):
+            started_at, lease = self.client.hmget(self._key("task", task_id), "started_at", "lease_expires_at")
+            if started_at and not lease and started_at < cutoff:
+                if self._move(
+                    task_id,
+                    "pending",
+                    expected_status="processing",
+                    del_fields=("worker_id",),
+                    incr_retry=True,
+                ):
+                    reset_count += 1
+
+        return reset_count
+
+    def close(self):
+        """关闭连接池"""
+        try:
+            self.client.close()
+        except Exception:
+            pass
@@ -17,9 +17,12 @@ MinerU Tianshu - Task Scheduler (Optional)
 """
 
 import asyncio
+import os
 import aiohttp
 from loguru import logger
-from task_db import TaskDB
+from task_queue import create_task_queue
+from task_notifier import TaskNotifier
+from metrics_exporter import LEASES_RECLAIMED, STALE_TASKS_RESET, start_metrics_server
 import signal
 
 
@@ -46,6 +49,10 @@ class TaskScheduler:
         cleanup_old_files_days=7,
         cleanup_old_records_days=0,
         worker_auto_mode=True,
+        archive_after_days=30,
+        lease_check_interval=10,
+        result_cache_max_gb=20,
+        metrics_port=0,
     ):
         """
         初始化调度器
@@ -58,6 +65,10 @@ class TaskScheduler:
             cleanup_old_files_days: 清理多少天前的结果文件（0=禁用，默认7天）
             cleanup_old_records_days: 清理多少天前的数据库记录（0=禁用，不推荐删除）
             worker_auto_mode: Worker 是否启用自动循环模式
+            archive_after_days: 将多少天前完成的任务移入归档表（0=禁用，默认30天）
+            lease_check_interval: 回收过期任务租约的检查间隔（秒，默认10秒）
+            result_cache_max_gb: 结果缓存引用的结果总大小上限（GB，超出按 LRU 淘汰，0=不限制）
+            metrics_port: Prometheus / OpenMetrics 指标端口（导出队列深度、在线 Worker 和故障恢复计数，0=禁用）
         """
         self.litserve_url = litserve_url
         self.monitor_interval = monitor_interval
@@ -66,7 +77,12 @@ class TaskScheduler:
         self.cleanup_old_files_days = cleanup_old_files_days
         self.cleanup_old_records_days = cleanup_old_records_days
         self.worker_auto_mode = worker_auto_mode
-        self.db = TaskDB()
+        self.archive_after_days = archive_after_days
+        self.lease_check_interval = lease_check_interval
+        self.result_cache_max_gb = result_cache_max_gb
+        self.metrics_port = metrics_port
+        self.db = create_task_queue()
+        self.task_notifier = TaskNotifier()
         self.running = True
 
     async def check_worker_health(self, session: aiohttp.ClientSession):
@@ -91,6 +107,21 @@ class TaskScheduler:
             logger.error(f"Health check error: {e}")
             return None
 
+    async def lease_reclaim_loop(self):
+        """
+        租约回收循环：独立于监控间隔快速运行，Worker 崩溃后任务在租约到期后数秒内重新入队
+        """
+        while self.running:
+            try:
+                reclaimed = self.db.reclaim_expired_leases()
+                if reclaimed > 0:
+                    LEASES_RECLAIMED.inc(reclaimed)
+                    logger.warning(f"♻️  Reclaimed {reclaimed} tasks with expired leases")
+                    self.task_notifier.notify()
+            except Exception as e:
+                logger.error(f"Lease reclaim error: {e}")
+            await asyncio.sleep(self.lease_check_interval)
+
     async def schedule_loop(self):
         """
         主监控循环
@@ -100,7 +131,8 @@ class TaskScheduler:
         logger.info(f"   Worker Mode: {'Auto-Loop' if self.worker_auto_mode else 'Scheduler-Driven'}")
         logger.info(f"   Monitor Interval: {self.monitor_interval}s")
         logger.info(f"   Health Check Interval: {self.health_check_interval}s")
-        logger.info(f"   Stale Task Timeout: {self.stale_task_timeout}m")
+        logger.info(f"   Stale Task Timeout: {self.stale_task_timeout}m (tasks without lease)")
+        logger.info(f"   Lease Check Interval: {self.lease_check_interval}s (lease: {self.db.lease_seconds}s)")
         if self.cleanup_old_files_days > 0:
             logger.info(f"   Cleanup Old Files: {self.cleanup_old_files_days} days")
         else:
@@ -109,11 +141,19 @@ class TaskScheduler:
             logger.info(f"   Cleanup Old Records: {self.cleanup_old_records_days} days (Not Recommended)")
         else:
             logger.info("   Cleanup Old Records: Disabled (Keep Forever)")
+        if self.archive_after_days > 0:
+            logger.info(f"   Archive Finished Tasks: {self.archive_after_days} days")
+        else:
+            logger.info("   Archive Finished Tasks: Disabled")
+        if self.result_cache_max_gb > 0:
+            logger.info(f"   Result Cache Limit: {self.result_cache_max_gb} GB (LRU)")
 
         health_check_counter = 0
         stale_task_counter = 0
         cleanup_counter = 0
 
+        lease_task = asyncio.create_task(self.lease_reclaim_loop())
+
         async with aiohttp.ClientSession() as session:
             while self.running:
                 try:
@@ -141,13 +181,15 @@ class TaskScheduler:
                         else:
                             logger.warning("⚠️  Workers health check failed")
 
-                    # 3. 定期重置超时任务
+                    # 3. 定期重置超时任务（仅限没有租约的任务，有租约的由 lease_reclaim_loop 回收）
                     stale_task_counter += 1
                     if stale_task_counter * self.monitor_interval >= self.stale_task_timeout * 60:
                         stale_task_counter = 0
                         reset_count = self.db.reset_stale_tasks(self.stale_task_timeout)
                         if reset_count > 0:
+                            STALE_TASKS_RESET.inc(reset_count)
                             logger.warning(f"⚠️  Reset {reset_count} stale tasks (timeout: {self.stale_task_timeout}m)")
+                            self.task_notifier.notify()
 
                     # 4. 定期清理旧任务文件和记录
                     cleanup_counter += 1
@@ -156,6 +198,12 @@ class TaskScheduler:
                     if cleanup_counter >= cleanup_interval_cycles:
                         cleanup_counter = 0
 
+                        # 按 LRU 淘汰超出容量的结果缓存条目（被淘汰的目录随后按保留期正常清理）
+                        if self.result_cache_max_gb > 0:
+                            evicted = self.db.evict_result_cache(max_bytes=int(self.result_cache_max_gb * 1024**3))
+                            if evicted > 0:
+                                logger.info(f"🗂️  Evicted {evicted} result cache entries")
+
                         # 清理旧结果文件（保留数据库记录）
                         if self.cleanup_old_files_days > 0:
                             logger.info(f"🧹 Cleaning up result files older than {self.cleanup_old_files_days} days...")
@@ -172,6 +220,17 @@ class TaskScheduler:
                             if record_count > 0:
                                 logger.warning(f"⚠️  Deleted {record_count} task records permanently")
 
+                        # 归档旧的终态任务，保持热表精简（记录仍可通过 get_task 查询）
+                        if self.archive_after_days > 0:
+                            archived_count = self.db.archive_old_tasks(days=self.archive_after_days)
+                            if archived_count > 0:
+                                logger.info(f"📦 Archived {archived_count} finished tasks")
+
+                        # 校准队列状态计数（修复可能的计数偏差）
+                        drift = self.db.reconcile_queue_stats()
+                        if drift:
+                            logger.warning(f"⚠️  Queue counters drifted, rebuilt: {drift}")
+
                     # 等待下一次监控
                     await asyncio.sleep(self.monitor_interval)
 
@@ -179,6 +238,7 @@ class TaskScheduler:
                     logger.error(f"Scheduler loop error: {e}")
                     await asyncio.sleep(self.monitor_interval)
 
+        lease_task.cancel()
         logger.info("⏹️  Task scheduler stopped")
 
     def start(self):
@@ -193,6 +253,9 @@ class TaskScheduler:
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
 
+        if self.metrics_port > 0:
+            start_metrics_server(self.metrics_port, queue=self.db)
+
         # 运行调度循环
         asyncio.run(self.schedule_loop())
 
@@ -244,6 +307,30 @@ if __name__ == "__main__":
         default=0,
         help="Delete DB records older than N days (0=disable, NOT recommended)",
     )
+    parser.add_argument(
+        "--archive-after-days",
+        type=int,
+        default=30,
+        help="Move finished tasks older than N days to the archive table (0=disable, default: 30)",
+    )
+    parser.add_argument(
+        "--lease-check-interval",
+        type=int,
+        default=10,
+        help="Interval in seconds for requeueing tasks with expired leases (default: 10)",
+    )
+    parser.add_argument(
+        "--result-cache-max-gb",
+        type=float,
+        default=20,
+        help="Evict least recently used result cache entries above N GB (0=unlimited, default: 20)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=int(os.getenv("SCHEDULER_METRICS_PORT", "0")),
+        help="Serve Prometheus/OpenMetrics metrics on this port (0=disable, default: SCHEDULER_METRICS_PORT or 0)",
+    )
     parser.add_argument("--wait-for-workers", action="store_true", help="Wait for workers to be ready before starting")
     parser.add_argument("--no-worker-auto-mode", action="store_true", help="Disable worker auto-loop mode assumption")
 
@@ -272,6 +359,10 @@ if __name__ == "__main__":
         cleanup_old_files_days=args.cleanup_old_files_days,
         cleanup_old_records_days=args.cleanup_old_records_days,
         worker_auto_mode=not args.no_worker_auto_mode,
+        archive_after_days=args.archive_after_days,
+        lease_check_interval=args.lease_check_interval,
+        result_cache_max_gb=args.result_cache_max_gb,
+        metrics_port=args.metrics_port,
     )
 
     try:
@@ -0,0 +1,57 @@
+"""
+任务队列测试夹具
+
+- task_db: 临时目录下的 SQLite TaskDB
+- redis_queue: 基于 fakeredis 进程内服务的 RedisTaskQueue（Lua 脚本在 fakeredis 中执行）
+"""
+
+import pytest
+
+
+@pytest.fixture
+def make_task_db(tmp_path):
+    """创建打开同一个数据库文件的 TaskDB 实例（模拟多个 Worker 进程）"""
+    from task_db import TaskDB
+
+    instances = []
+
+    def make():
+        db = TaskDB(tmp_path / "tianshu.db")
+        db.affinity_wait_seconds = 0
+        instances.append(db)
+        return db
+
+    yield make
+    for db in instances:
+        db.close()
+
+
+@pytest.fixture
+def task_db(make_task_db):
+    return make_task_db()
+
+
+@pytest.fixture
+def redis_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def make_redis_queue(redis_server):
+    """创建连接同一个 fakeredis 服务的队列实例（模拟多个 Worker 进程）"""
+    import fakeredis
+    from task_queue.redis_queue import RedisTaskQueue
+
+    def make():
+        queue = RedisTaskQueue(client=fakeredis.FakeRedis(server=redis_server, decode_responses=True))
+        # 测试默认关闭引擎亲和，认领顺序只由优先级和创建时间决定
+        queue.affinity_wait_seconds = 0
+        return queue
+
+    return make
+
+
+@pytest.fixture
+def redis_queue(make_redis_queue):
+    return make_redis_queue()
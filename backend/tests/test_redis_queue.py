@@ -0,0 +1,294 @@
+"""
+RedisTaskQueue 测试（fakeredis 进程内服务，认领 / 迁移 / 续约 / 回收均通过 Lua 脚本执行）
+"""
+
+import threading
+import time
+
+from task_queue import batch_options, encode_cursor
+
+
+def create(queue, name, priority=0, **kwargs):
+    """创建任务并等待 2ms，保证创建时间（毫秒 score）互不相同"""
+    task_id = queue.create_task(name, f"/tmp/{name}", priority=priority, **kwargs)
+    time.sleep(0.002)
+    return task_id
+
+
+def test_claim_order_priority_then_created_at(redis_queue):
+    low_old = create(redis_queue, "low_old.pdf", priority=0)
+    high_old = create(redis_queue, "high_old.pdf", priority=5)
+    low_new = create(redis_queue, "low_new.pdf", priority=0)
+    high_new = create(redis_queue, "high_new.pdf", priority=5)
+
+    claimed = [redis_queue.get_next_task("w1")["task_id"] for _ in range(4)]
+
+    assert claimed == [high_old, high_new, low_old, low_new]
+    assert redis_queue.get_next_task("w1") is None
+
+
+def test_claim_tasks_batch_marks_processing_with_lease(redis_queue):
+    ids = [create(redis_queue, f"f{i}.pdf") for i in range(5)]
+
+    tasks = redis_queue.claim_tasks("w1", 3)
+
+    assert [t["task_id"] for t in tasks] == ids[:3]
+    for task in tasks:
+        assert task["status"] == "processing"
+        assert task["worker_id"] == "w1"
+        assert task["started_at"] and task["lease_expires_at"]
+    assert redis_queue.get_queue_stats() == {"pending": 2, "processing": 3}
+
+
+def test_concurrent_claim_never_hands_out_a_task_twice(make_redis_queue):
+    seed = make_redis_queue()
+    ids = {seed.create_task(f"f{i}.pdf", f"/tmp/f{i}.pdf") for i in range(60)}
+    claimed = {}
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        queue = make_redis_queue()
+        while True:
+            tasks = queue.claim_tasks(worker_id, 2)
+            if not tasks:
+                return
+            with lock:
+                for task in tasks:
+                    claimed.setdefault(task["task_id"], []).append(worker_id)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(claimed) == ids
+    assert all(len(owners) == 1 for owners in claimed.values())
+    assert seed.get_queue_stats() == {"processing": 60}
+
+
+def test_completion_is_guarded_by_worker_id(redis_queue):
+    task_id = create(redis_queue, "a.pdf")
+    redis_queue.get_next_task("w1")
+
+    assert redis_queue.update_task_status(task_id, "completed", result_path="/r", worker_id="w2") is False
+    assert redis_queue.get_task(task_id)["status"] == "processing"
+
+    assert redis_queue.update_task_status(task_id, "completed", result_path="/r", worker_id="w1") is True
+    task = redis_queue.get_task(task_id)
+    assert task["status"] == "completed"
+    assert task["result_path"] == "/r"
+    assert task["lease_expires_at"] is None
+
+    # 已完成的任务不能再被标记为失败
+    assert redis_queue.update_task_status(task_id, "failed", error_message="late", worker_id="w1") is False
+
+
+def test_renew_only_extends_leases_still_held(redis_queue):
+    mine = create(redis_queue, "mine.pdf")
+    theirs = create(redis_queue, "theirs.pdf")
+    redis_queue.get_next_task("w1")
+    redis_queue.get_next_task("w2")
+
+    assert redis_queue.renew_leases("w1", [mine, theirs]) == [mine]
+    assert redis_queue.renew_leases("w1", []) == []
+
+
+def test_expired_lease_is_reclaimed_once(redis_queue):
+    task_id = create(redis_queue, "a.pdf")
+    redis_queue.lease_seconds = -1
+    redis_queue.get_next_task("w1")
+
+    assert redis_queue.reclaim_expired_leases() == 1
+    assert redis_queue.reclaim_expired_leases() == 0
+
+    task = redis_queue.get_task(task_id)
+    assert task["status"] == "pending"
+    assert task["retry_count"] == 1
+    assert task["worker_id"] is None
+
+    # 原 Worker 的完成被拒绝，任务由新 Worker 重新认领
+    assert redis_queue.update_task_status(task_id, "completed", result_path="/r", worker_id="w1") is False
+    redis_queue.lease_seconds = 30
+    assert redis_queue.get_next_task("w2")["task_id"] == task_id
+
+
+def test_renewed_lease_is_not_reclaimed(redis_queue):
+    task_id = create(redis_queue, "a.pdf")
+    redis_queue.lease_seconds = -1
+    redis_queue.get_next_task("w1")
+    redis_queue.lease_seconds = 30
+
+    assert redis_queue.renew_leases("w1", [task_id]) == [task_id]
+    assert redis_queue.reclaim_expired_leases() == 0
+    assert redis_queue.get_task(task_id)["status"] == "processing"
+
+
+def test_list_tasks_cursor_paging(redis_queue):
+    ids = [create(redis_queue, f"f{i}.pdf") for i in range(7)]
+    newest_first = list(reversed(ids))
+
+    pages, cursor = [], None
+    while True:
+        page = redis_queue.list_tasks(limit=3, cursor=cursor, fields=["status"])
+        if not page:
+            break
+        assert set(page[0]) == {"task_id", "created_at", "status"}
+        pages.append([t["task_id"] for t in page])
+        cursor = encode_cursor(page[-1])
+
+    assert pages == [newest_first[0:3], newest_first[3:6], newest_first[6:7]]
+
+
+def test_list_tasks_filters(redis_queue):
+    a = create(redis_queue, "a.pdf", user_id="u1")
+    b = create(redis_queue, "b.pdf", user_id="u1")
+    c = create(redis_queue, "c.pdf", user_id="u2")
+    redis_queue.get_next_task("w1")
+
+    assert [t["task_id"] for t in redis_queue.list_tasks(user_id="u1")] == [b, a]
+    assert [t["task_id"] for t in redis_queue.list_tasks(user_id="u1", status="processing")] == [a]
+    assert [t["task_id"] for t in redis_queue.list_tasks(status="pending")] == [c, b]
+
+
+def test_queue_stats_follow_transitions(redis_queue):
+    ids = [create(redis_queue, f"f{i}.pdf") for i in range(4)]
+    redis_queue.create_task("cached.pdf", "/tmp/cached.pdf", result_path="/r")
+    assert redis_queue.get_queue_stats() == {"pending": 4, "completed": 1}
+
+    redis_queue.claim_tasks("w1", 3)
+    redis_queue.update_task_status(ids[0], "completed", result_path="/r", worker_id="w1")
+    redis_queue.update_task_status(ids[1], "failed", error_message="boom", worker_id="w1")
+    redis_queue.update_task_status(ids[3], "cancelled")
+
+    assert redis_queue.get_queue_stats() == {"processing": 1, "completed": 2, "failed": 1, "cancelled": 1}
+    assert redis_queue.get_task(ids[1])["error_message"] == "boom"
+
+
+def test_progress_and_change_feed(redis_queue):
+    task_id = create(redis_queue, "a.pdf")
+    start = redis_queue.get_latest_event_id()
+    redis_queue.get_next_task("w1")
+    redis_queue.update_progress(task_id, "pages", 2, 10)
+    redis_queue.update_task_status(task_id, "completed", result_path="/r", worker_id="w1")
+
+    progress = redis_queue.get_progress(task_id)
+    assert progress["stage"] == "pages"
+    assert (progress["done"], progress["total"]) == (2, 10)
+
+    events = redis_queue.get_task_events(start)
+    assert [(e["type"], e["status"] or e["stage"]) for e in events] == [
+        ("status", "processing"),
+        ("progress", "pages"),
+        ("status", "completed"),
+    ]
+    assert redis_queue.get_task_events(events[-1]["event_id"]) == []
+
+
+def test_cleanup_removes_all_terminal_statuses(redis_queue):
+    done, failed, cancelled, pending = [create(redis_queue, f"f{i}.pdf") for i in range(4)]
+    redis_queue.claim_tasks("w1", 2)
+    redis_queue.update_task_status(done, "completed", result_path="/r", worker_id="w1")
+    redis_queue.update_task_status(failed, "failed", error_message="boom", worker_id="w1")
+    redis_queue.update_task_status(cancelled, "cancelled")
+
+    assert redis_queue.cleanup_old_task_records(days=1) == 0
+    # days=-1：截止时间在未来，所有终态任务都已"过期"
+    assert redis_queue.cleanup_old_task_records(days=-1) == 3
+    assert redis_queue.get_task(cancelled) is None
+    assert redis_queue.get_queue_stats() == {"pending": 1}
+    assert redis_queue.get_task(pending)["status"] == "pending"
+
+
+def test_release_task_is_guarded_by_worker_id(redis_queue):
+    first = create(redis_queue, "first.pdf")
+    second = create(redis_queue, "second.pdf")
+    redis_queue.claim_tasks("w1", 2)
+
+    assert redis_queue.release_task(first, "w2") is False
+    assert redis_queue.release_task(first, "w1") is True
+    task = redis_queue.get_task(first)
+    assert (task["status"], task["worker_id"], task["retry_count"]) == ("pending", None, 0)
+    assert redis_queue.release_task(first, "w1") is False
+
+    # 放回的任务保持原有队列位置；已取消的任务不会被放回
+    redis_queue.update_task_status(second, "cancelled")
+    assert redis_queue.release_task(second, "w1") is False
+    assert redis_queue.get_queue_stats() == {"pending": 1, "cancelled": 1}
+    assert redis_queue.get_next_task("w2")["task_id"] == first
+
+
+def test_claim_batch_tasks_only_takes_compatible_tasks(redis_queue):
+    def add(name, backend="pipeline", **options):
+        return create(redis_queue, name, backend=backend, options=options)
+
+    head = add("head.pdf", start_page_id=None)
+    add("formula_off.pdf", formula_enable=False)
+    add("vlm.pdf", backend="vlm-transformers")
+    add("doc.docx")
+    add("watermark.pdf", remove_watermark=True)
+    plain = add("plain.pdf")
+    image = add("scan.PNG", backend="auto", formula_enable=True)
+    parent = redis_queue.get_task(add("big.pdf", formula_enable=False))
+    redis_queue.create_child_tasks(parent, [{"start_page_id": 0}])
+
+    def claim(worker_id, n=10):
+        tasks = redis_queue.claim_batch_tasks(worker_id, n, ("pipeline", "auto"), (".pdf", ".png"), batch_options({}))
+        return [t["task_id"] for t in tasks]
+
+    assert claim("w1", 2) == [head, plain]
+    assert claim("w1") == [image]
+    assert claim("w1") == []
+    assert redis_queue.get_task(image)["worker_id"] == "w1"
+
+
+def test_claim_batch_tasks_respects_affinity(redis_queue):
+    task_id = create(redis_queue, "a.pdf")
+    redis_queue.affinity_wait_seconds = 60
+    redis_queue.register_worker("w2", ["pipeline"])
+
+    assert redis_queue.claim_batch_tasks("w1", 1, ("pipeline",), (".pdf",), batch_options({})) == []
+    redis_queue.register_worker("w1", ["pipeline"])
+    claimed = redis_queue.claim_batch_tasks("w1", 1, ("pipeline",), (".pdf",), batch_options({}))
+    assert [t["task_id"] for t in claimed] == [task_id]
+
+
+def test_cleanup_keeps_results_shared_with_recent_cache_hits(redis_queue, tmp_path):
+    result_dir = tmp_path / "result"
+    result_dir.mkdir()
+    original = create(redis_queue, "a.pdf", cache_key="k")
+    redis_queue.get_next_task("w1")
+    redis_queue.update_task_status(original, "completed", result_path=str(result_dir), worker_id="w1")
+    redis_queue.put_cached_result("k", str(result_dir), 1)
+    hit = redis_queue.create_task("a.pdf", None, cache_key="k", result_path=str(result_dir))
+    assert redis_queue.get_task(hit)["file_path"] is None
+
+    # 缓存条目被淘汰、原任务已过期，但缓存命中的新任务仍在保留期内
+    assert redis_queue.evict_result_cache(0) == 1
+    redis_queue.client.hset(redis_queue._key("task", original), "completed_at", "2000-01-01 00:00:00")
+    assert redis_queue.cleanup_old_task_files(days=7) == 0
+    assert result_dir.exists()
+
+    assert redis_queue.cleanup_old_task_files(days=-1) == 1
+    assert not result_dir.exists()
+    assert redis_queue.get_task(hit)["result_path"] is None
+
+
+def test_child_tasks_inherit_parent_and_cancel_skips_finished_shards(redis_queue):
+    parent_id = create(redis_queue, "big.pdf", backend="auto", user_id="u1")
+    redis_queue.get_next_task("w1")
+    parent = redis_queue.get_task(parent_id)
+    child_ids = redis_queue.create_child_tasks(parent, [{"shard_index": i} for i in range(3)])
+    children = redis_queue.get_child_tasks(parent["task_id"])
+    assert {(c["backend"], c["user_id"]) for c in children} == {("auto", "u1")}
+    assert {t["task_id"] for t in redis_queue.list_tasks(user_id="u1")} == {parent["task_id"], *child_ids}
+
+    done, running = [t["task_id"] for t in redis_queue.claim_tasks("w1", 2)]
+    (waiting,) = set(child_ids) - {done, running}
+    redis_queue.update_task_status(done, "completed", result_path="/r", worker_id="w1")
+
+    # 按过期的快照取消：已完成的分片保持 completed
+    for child in children:
+        redis_queue.update_task_status(child["task_id"], "cancelled")
+    statuses = [redis_queue.get_task(i)["status"] for i in (done, running, waiting)]
+    assert statuses == ["completed", "cancelled", "cancelled"]
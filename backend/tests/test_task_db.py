@@ -0,0 +1,265 @@
+"""
+TaskDB 测试（临时目录下的 SQLite 数据库：租约认领 / 续约 / 回收、Worker 校验、状态计数触发器）
+"""
+
+import threading
+
+import pytest
+
+from task_queue import batch_options
+
+
+def set_column(db, task_id, column, modifier):
+    """把时间列改为相对当前时间的值（SQLite 时间精度为秒，测试直接改库模拟时间流逝）"""
+    with db.get_cursor() as cursor:
+        cursor.execute(f"UPDATE tasks SET {column} = datetime('now', ?) WHERE task_id = ?", (modifier, task_id))
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "select_update"])
+def claim_path(request, monkeypatch):
+    """claim_tasks 分别走 UPDATE ... RETURNING 和 SELECT + UPDATE 兼容路径"""
+    from task_db import TaskDB
+
+    if request.param and not TaskDB._SUPPORTS_RETURNING:
+        pytest.skip("SQLite < 3.35 不支持 RETURNING")
+    monkeypatch.setattr(TaskDB, "_SUPPORTS_RETURNING", request.param)
+    return request.param
+
+
+def test_get_next_task_claims_by_priority(task_db):
+    ids = {p: task_db.create_task(f"p{p}.pdf", f"/tmp/p{p}.pdf", priority=p) for p in (1, 5, 3)}
+
+    assert task_db.get_next_task("w1")["task_id"] == ids[5]
+
+    task = task_db.get_task(ids[5])
+    assert task["status"] == "processing"
+    assert task["worker_id"] == "w1"
+    assert task["lease_expires_at"]
+    assert [task_db.get_next_task("w1")["task_id"] for _ in range(2)] == [ids[3], ids[1]]
+    assert task_db.get_next_task("w1") is None
+
+
+def test_claim_tasks_batch(task_db, claim_path):
+    ids = {p: task_db.create_task(f"p{p}.pdf", f"/tmp/p{p}.pdf", priority=p) for p in range(5)}
+
+    tasks = task_db.claim_tasks("w1", 3)
+
+    assert [t["task_id"] for t in tasks] == [ids[4], ids[3], ids[2]]
+    for task in tasks:
+        assert task["status"] == "processing"
+        assert task["worker_id"] == "w1"
+        assert task["started_at"] and task["lease_expires_at"]
+    assert task_db.get_queue_stats() == {"pending": 2, "processing": 3}
+    assert task_db.claim_tasks("w1", 0) == []
+
+
+def test_concurrent_claim_never_hands_out_a_task_twice(make_task_db, claim_path):
+    seed = make_task_db()
+    ids = {seed.create_task(f"f{i}.pdf", f"/tmp/f{i}.pdf") for i in range(40)}
+    claimed = {}
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        db = make_task_db()
+        while True:
+            tasks = db.claim_tasks(worker_id, 2)
+            if not tasks:
+                return
+            with lock:
+                for task in tasks:
+                    claimed.setdefault(task["task_id"], []).append(worker_id)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(claimed) == ids
+    assert all(len(owners) == 1 for owners in claimed.values())
+    assert seed.get_queue_stats() == {"processing": 40}
+
+
+def test_completion_is_guarded_by_worker_id(task_db):
+    task_id = task_db.create_task("a.pdf", "/tmp/a.pdf")
+    task_db.get_next_task("w1")
+
+    assert task_db.update_task_status(task_id, "completed", result_path="/r", worker_id="w2") is False
+    assert task_db.get_task(task_id)["status"] == "processing"
+
+    assert task_db.update_task_status(task_id, "completed", result_path="/r", worker_id="w1") is True
+    task = task_db.get_task(task_id)
+    assert task["status"] == "completed"
+    assert task["result_path"] == "/r"
+    assert task["completed_at"]
+
+    # 已完成的任务不能再被标记为失败
+    assert task_db.update_task_status(task_id, "failed", error_message="late", worker_id="w1") is False
+
+
+def test_renew_only_extends_leases_still_held(task_db):
+    mine = task_db.create_task("mine.pdf", "/tmp/mine.pdf", priority=1)
+    theirs = task_db.create_task("theirs.pdf", "/tmp/theirs.pdf")
+    task_db.get_next_task("w1")
+    task_db.get_next_task("w2")
+    set_column(task_db, mine, "lease_expires_at", "+1 seconds")
+    before = task_db.get_task(mine)["lease_expires_at"]
+
+    assert task_db.renew_leases("w1", [mine, theirs]) == [mine]
+    assert task_db.renew_leases("w1", []) == []
+    assert task_db.get_task(mine)["lease_expires_at"] > before
+    assert task_db.reclaim_expired_leases() == 0
+
+
+def test_expired_lease_is_reclaimed_once(task_db):
+    task_id = task_db.create_task("a.pdf", "/tmp/a.pdf")
+    task_db.get_next_task("w1")
+    set_column(task_db, task_id, "lease_expires_at", "-1 seconds")
+
+    assert task_db.reclaim_expired_leases() == 1
+    assert task_db.reclaim_expired_leases() == 0
+
+    task = task_db.get_task(task_id)
+    assert task["status"] == "pending"
+    assert task["retry_count"] == 1
+    assert task["worker_id"] is None
+    assert task["lease_expires_at"] is None
+
+    # 原 Worker 的完成和续约都被拒绝，任务由新 Worker 重新认领
+    assert task_db.update_task_status(task_id, "completed", result_path="/r", worker_id="w1") is False
+    assert task_db.renew_leases("w1", [task_id]) == []
+    assert task_db.get_next_task("w2")["task_id"] == task_id
+    assert task_db.update_task_status(task_id, "completed", result_path="/r", worker_id="w1") is False
+    assert task_db.update_task_status(task_id, "completed", result_path="/r", worker_id="w2") is True
+
+
+def test_queue_counters_match_reconcile(task_db, claim_path):
+    ids = [task_db.create_task(f"f{i}.pdf", f"/tmp/f{i}.pdf", priority=10 - i) for i in range(6)]
+    assert task_db.get_queue_stats() == {"pending": 6}
+    assert task_db.reconcile_queue_stats() == {}
+
+    task_db.claim_tasks("w1", 4)
+    task_db.update_task_status(ids[0], "completed", result_path="/r", worker_id="w1")
+    task_db.update_task_status(ids[1], "failed", error_message="boom", worker_id="w1")
+    task_db.update_task_status(ids[5], "cancelled")
+    assert task_db.get_queue_stats() == {"pending": 1, "processing": 2, "completed": 1, "failed": 1, "cancelled": 1}
+    assert task_db.reconcile_queue_stats() == {}
+
+    for task_id in (ids[0], ids[1], ids[5]):
+        set_column(task_db, task_id, "completed_at", "-40 days")
+    assert task_db.archive_old_tasks(days=30) == 3
+    assert task_db.get_queue_stats() == {"pending": 1, "processing": 2}
+    assert task_db.reconcile_queue_stats() == {}
+    # 归档后仍可查询
+    assert task_db.get_task(ids[5])["status"] == "cancelled"
+
+    task_db.update_task_status(ids[2], "cancelled")
+    set_column(task_db, ids[2], "completed_at", "-40 days")
+    # 热表和归档表中的所有终态任务都会被删除
+    assert task_db.cleanup_old_task_records(days=30) == 4
+    assert task_db.get_task(ids[5]) is None
+    assert task_db.get_queue_stats() == {"pending": 1, "processing": 1}
+    assert task_db.reconcile_queue_stats() == {}
+
+
+def test_reconcile_repairs_drift(task_db):
+    task_db.create_task("a.pdf", "/tmp/a.pdf")
+    with task_db.get_cursor() as cursor:
+        cursor.execute("UPDATE queue_counters SET count = 5 WHERE status = 'pending'")
+
+    assert task_db.reconcile_queue_stats() == {"pending": -4}
+    assert task_db.get_queue_stats() == {"pending": 1}
+    assert task_db.reconcile_queue_stats() == {}
+
+
+def test_release_task_is_guarded_by_worker_id(task_db):
+    task_id = task_db.create_task("a.pdf", "/tmp/a.pdf")
+    task_db.get_next_task("w1")
+
+    assert task_db.release_task(task_id, "w2") is False
+    assert task_db.release_task(task_id, "w1") is True
+    task = task_db.get_task(task_id)
+    assert (task["status"], task["worker_id"], task["retry_count"]) == ("pending", None, 0)
+    assert task_db.release_task(task_id, "w1") is False
+
+    # 已取消的任务不会被放回队列
+    task_db.get_next_task("w1")
+    task_db.update_task_status(task_id, "cancelled")
+    assert task_db.release_task(task_id, "w1") is False
+    assert task_db.get_task(task_id)["status"] == "cancelled"
+
+
+def test_claim_batch_tasks_only_takes_compatible_tasks(task_db):
+    def create(name, priority, backend="pipeline", **options):
+        return task_db.create_task(name, f"/tmp/{name}", backend=backend, options=options, priority=priority)
+
+    head = create("head.pdf", 9, start_page_id=None)
+    create("formula_off.pdf", 8, formula_enable=False)
+    create("vlm.pdf", 7, backend="vlm-transformers")
+    create("doc.docx", 6)
+    create("watermark.pdf", 5, remove_watermark=True)
+    plain = create("plain.pdf", 4)
+    image = create("scan.PNG", 3, backend="auto", formula_enable=True)
+    parent = task_db.get_task(create("big.pdf", 2, formula_enable=False))
+    task_db.create_child_tasks(parent, [{"start_page_id": 0}])
+
+    def claim(worker_id, n=10):
+        tasks = task_db.claim_batch_tasks(worker_id, n, ("pipeline", "auto"), (".pdf", ".png"), batch_options({}))
+        return [t["task_id"] for t in tasks]
+
+    assert claim("w1", 2) == [head, plain]
+    assert claim("w1") == [image]
+    assert claim("w1") == []
+    assert task_db.get_queue_stats() == {"pending": 6, "processing": 3}
+    assert task_db.get_task(image)["worker_id"] == "w1"
+
+
+def test_claim_batch_tasks_respects_affinity(task_db):
+    task_id = task_db.create_task("a.pdf", "/tmp/a.pdf")
+    task_db.affinity_wait_seconds = 60
+    task_db.register_worker("w2", ["pipeline"])
+
+    assert task_db.claim_batch_tasks("w1", 1, ("pipeline",), (".pdf",), batch_options({})) == []
+    task_db.register_worker("w1", ["pipeline"])
+    claimed = task_db.claim_batch_tasks("w1", 1, ("pipeline",), (".pdf",), batch_options({}))
+    assert [t["task_id"] for t in claimed] == [task_id]
+
+
+def test_cleanup_keeps_results_shared_with_recent_cache_hits(task_db, tmp_path):
+    result_dir = tmp_path / "result"
+    result_dir.mkdir()
+    original = task_db.create_task("a.pdf", "/tmp/a.pdf", cache_key="k")
+    task_db.get_next_task("w1")
+    task_db.update_task_status(original, "completed", result_path=str(result_dir), worker_id="w1")
+    task_db.put_cached_result("k", str(result_dir), 1)
+    hit = task_db.create_task("a.pdf", None, cache_key="k", result_path=str(result_dir))
+    assert task_db.get_task(hit)["file_path"] is None
+
+    # 缓存条目被淘汰、原任务已过期，但缓存命中的新任务仍在保留期内
+    assert task_db.evict_result_cache(0) == 1
+    set_column(task_db, original, "completed_at", "-10 days")
+    assert task_db.cleanup_old_task_files(days=7) == 0
+    assert result_dir.exists()
+
+    set_column(task_db, hit, "completed_at", "-10 days")
+    assert task_db.cleanup_old_task_files(days=7) == 1
+    assert not result_dir.exists()
+    assert task_db.get_task(hit)["result_path"] is None
+
+
+def test_child_tasks_inherit_parent_and_cancel_skips_finished_shards(task_db):
+    parent_id = task_db.create_task("big.pdf", "/tmp/big.pdf", backend="auto", user_id="u1")
+    task_db.get_next_task("w1")
+    parent = task_db.get_task(parent_id)
+    child_ids = task_db.create_child_tasks(parent, [{"shard_index": i} for i in range(3)])
+    children = task_db.get_child_tasks(parent["task_id"])
+    assert {(c["backend"], c["user_id"]) for c in children} == {("auto", "u1")}
+
+    done, running = [t["task_id"] for t in task_db.claim_tasks("w1", 2)]
+    (waiting,) = set(child_ids) - {done, running}
+    task_db.update_task_status(done, "completed", result_path="/r", worker_id="w1")
+
+    # 按过期的快照取消：已完成的分片保持 completed
+    for child in children:
+        task_db.update_task_status(child["task_id"], "cancelled")
+    assert [task_db.get_task(i)["status"] for i in (done, running, waiting)] == ["completed", "cancelled", "cancelled"]
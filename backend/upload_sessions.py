@@ -0,0 +1,213 @@
+"""
+MinerU Tianshu - Upload Sessions
+天枢可续传分块上传
+
+大文件（如数 GB 的视频）分块上传，连接中断后只需重传缺失的分块：
+1. 创建上传会话：声明文件名、大小（和可选的整体 SHA-256），服务端预分配目标文件
+2. 按偏移量上传分块：分块直接写入目标文件的对应位置，可并发上传；
+   每个分块计算 SHA-256，客户端提供校验值时不一致的分块不会被记录
+3. 完成上传：检查分块齐全并计算整体哈希（结果缓存和完整性校验），文件移动到上传目录后创建任务
+
+会话状态保存在上传目录下（.sessions/{upload_id}/），不依赖进程内存，
+多个 API Server 进程共享上传目录时分块可以发往任意进程：
+- session.json  会话信息（用户、文件名、大小、分块大小、过期时间）
+- data          预分配的目标文件
+- chunks/{n}    已接收的分块，内容为分块的 SHA-256（写入成功后才创建）
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+# 分块大小范围（字节）
+MIN_CHUNK_SIZE = 1 << 20
+MAX_CHUNK_SIZE = 1 << 26
+DEFAULT_CHUNK_SIZE = 1 << 23
+
+# 单个会话最多的分块数（限制 chunks/ 目录的文件数）
+MAX_CHUNKS = 100000
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadSessionStore:
+    """上传会话存储（方法均为同步文件操作，API Server 在线程池中调用）"""
+
+    def __init__(self, upload_dir: Path, ttl_seconds: int = 86400, max_size: int = 0):
+        """
+        Args:
+            upload_dir: 上传目录（与 Worker 共享）
+            ttl_seconds: 会话有效期（秒），过期未完成的会话在创建新会话时清理
+            max_size: 单个文件的最大字节数（0 表示不限制）
+        """
+        self.upload_dir = Path(upload_dir)
+        self.root = self.upload_dir / ".sessions"
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+
+    def _dir(self, upload_id: str) -> Path:
+        if not _UPLOAD_ID.match(upload_id or ""):
+            raise KeyError(upload_id)
+        return self.root / upload_id
+
+    def create(
+        self,
+        user_id: str,
+        file_name: str,
+        file_size: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        sha256: Optional[str] = None,
+    ) -> Dict:
+        """
+        创建上传会话并预分配目标文件
+
+        Raises:
+            ValueError: 文件名、大小或分块大小不合法
+        """
+        file_name = Path(file_name or "").name
+        if not file_name or file_name.startswith("."):
+            raise ValueError("Invalid file_name")
+        if file_size <= 0:
+            raise ValueError("file_size must be positive")
+        if self.max_size and file_size > self.max_size:
+            raise ValueError(f"File too large (max {self.max_size} bytes)")
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+        chunk_count = -(-file_size // chunk_size)
+        if chunk_count > MAX_CHUNKS:
+            raise ValueError(f"Too many chunks ({chunk_count} > {MAX_CHUNKS}), use a larger chunk_size")
+        if sha256 is not None and not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+            raise ValueError("sha256 must be a hex digest")
+
+        self.sweep_expired()
+
+        upload_id = uuid.uuid4().hex
+        session_dir = self.root / upload_id
+        (session_dir / "chunks").mkdir(parents=True)
+        with open(session_dir / "data", "wb") as f:
+            f.truncate(file_size)
+
+        now = time.time()
+        session = {
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "file_name": file_name,
+            "file_size": file_size,
+            "chunk_size": chunk_size,
+            "chunk_count": chunk_count,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+        (session_dir / "session.json").write_text(json.dumps(session))
+        return session
+
+    def get(self, upload_id: str) -> Optional[Dict]:
+        """读取会话信息（不存在或已过期时返回 None）"""
+        try:
+            session = json.loads((self._dir(upload_id) / "session.json").read_text())
+        except (KeyError, OSError, ValueError):
+            return None
+        if session["expires_at"] < time.time():
+            return None
+        return session
+
+    def received_chunks(self, upload_id: str) -> Dict[int, str]:
+        """已接收的分块 {序号: SHA-256}"""
+        chunks = {}
+        for path in (self._dir(upload_id) / "chunks").iterdir():
+            if path.name.isdigit():
+                chunks[int(path.name)] = path.read_text()
+        return chunks
+
+    def chunk_range(self, session: Dict, offset: int) -> tuple:
+        """
+        偏移量对应的分块 (序号, 长度)
+
+        Raises:
+            ValueError: 偏移量未按分块大小对齐或超出文件大小
+        """
+        if offset < 0 or offset >= session["file_size"] or offset % session["chunk_size"]:
+            raise ValueError(f"offset must be a multiple of chunk_size ({session['chunk_size']}) within the file")
+        return offset // session["chunk_size"], min(session["chunk_size"], session["file_size"] - offset)
+
+    def open_chunk(self, upload_id: str, index: int, offset: int):
+        """
+        打开目标文件并定位到分块偏移（每个请求单独打开，不同分块可并发写入）
+
+        重传已接收的分块时先清除其标记，写入中断的分块视为缺失
+        """
+        session_dir = self._dir(upload_id)
+        (session_dir / "chunks" / str(index)).unlink(missing_ok=True)
+        f = open(session_dir / "data", "r+b")
+        f.seek(offset)
+        return f
+
+    def mark_chunk(self, upload_id: str, index: int, sha256: str):
+        """记录分块已接收（先写临时文件再改名，标记文件存在即分块完整）"""
+        chunks_dir = self._dir(upload_id) / "chunks"
+        tmp = chunks_dir / f".{index}.{uuid.uuid4().hex}"
+        tmp.write_text(sha256)
+        os.replace(tmp, chunks_dir / str(index))
+
+    def complete(self, upload_id: str, dest_path: Path) -> str:
+        """
+        完成上传：校验分块齐全和整体哈希，将文件移动到 dest_path
+
+        Returns:
+            文件内容的 SHA-256
+
+        Raises:
+            KeyError: 会话不存在（已完成或已过期）
+            ValueError: 分块不完整或整体哈希不一致（会话保留，可补传后重试）
+        """
+        session = self.get(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        missing = session["chunk_count"] - len(self.received_chunks(upload_id))
+        if missing:
+            raise ValueError(f"Upload incomplete: {missing} chunks missing")
+
+        session_dir = self._dir(upload_id)
+        content_hash = hashlib.sha256()
+        with open(session_dir / "data", "rb") as f:
+            while True:
+                block = f.read(1 << 23)
+                if not block:
+                    break
+                content_hash.update(block)
+        digest = content_hash.hexdigest()
+        if session["sha256"] and digest != session["sha256"]:
+            raise ValueError(f"File checksum mismatch: expected {session['sha256']}, got {digest}")
+
+        os.replace(session_dir / "data", dest_path)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return digest
+
+    def delete(self, upload_id: str):
+        """删除会话及已上传的数据"""
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def sweep_expired(self) -> int:
+        """清理过期的会话，返回清理数量"""
+        if not self.root.exists():
+            return 0
+        count = 0
+        now = time.time()
+        for session_dir in self.root.iterdir():
+            try:
+                session = json.loads((session_dir / "session.json").read_text())
+                expired = session["expires_at"] < now
+            except (OSError, ValueError, KeyError):
+                # 创建中断的会话按目录修改时间判断
+                expired = session_dir.stat().st_mtime + self.ttl_seconds < now
+            if expired:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                count += 1
+        return count
@@ -2,6 +2,7 @@
 Backend 工具函数模块
 """
 
+from .archive_utils import is_archive, iter_archive_members
 from .pdf_utils import convert_pdf_to_images
 
-__all__ = ["convert_pdf_to_images"]
+__all__ = ["convert_pdf_to_images", "is_archive", "iter_archive_members"]
@@ -0,0 +1,67 @@
+"""
+压缩包处理工具函数
+"""
+
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# 批量提交时按压缩包展开的文件类型
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(filename: str) -> bool:
+    """是否为支持展开的 zip / tar 压缩包"""
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _member_file_name(name: str) -> Optional[str]:
+    """
+    压缩包成员的文件名
+
+    只保留最后一级文件名（避免路径穿越），跳过隐藏文件和 macOS 元数据（__MACOSX、._*）
+    """
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or "__MACOSX" in parts:
+        return None
+    file_name = parts[-1]
+    if file_name.startswith(".") or file_name in ("..", "/"):
+        return None
+    return file_name
+
+
+def iter_archive_members(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    逐个读取压缩包中的文件（流式，不解压到临时目录）
+
+    zip 通过中央目录逐个打开成员（fileobj 需可 seek），tar 以流模式按顺序读取（支持 gz/bz2/xz 压缩）
+
+    Args:
+        fileobj: 压缩包文件对象
+        filename: 压缩包文件名（用于判断格式）
+
+    Yields:
+        (文件名, 成员文件对象)，成员文件对象只在下一次迭代之前有效
+
+    Raises:
+        zipfile.BadZipFile / tarfile.TarError: 压缩包损坏或格式不支持
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                file_name = _member_file_name(info.filename)
+                if file_name:
+                    with archive.open(info) as member:
+                        yield file_name, member
+        return
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            file_name = _member_file_name(info.name)
+            if file_name:
+                yield file_name, archive.extractfile(info)
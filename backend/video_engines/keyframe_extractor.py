@@ -6,7 +6,7 @@
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from loguru import logger
 import imagehash
 from PIL import Image
@@ -263,9 +263,14 @@ class VideoOCREngine:
 
         return self._ocr_engine
 
-    def process(self, video_path: str, output_path: str) -> Dict[str, Any]:
+    def process(
+        self, video_path: str, output_path: str, progress_callback: Optional[Callable] = None
+    ) -> Dict[str, Any]:
         """
         处理视频：提取关键帧并进行 OCR
+
+        Args:
+            progress_callback: 进度回调 callback(stage, done, total)（可选）
         """
         video_path = Path(video_path)
         output_path = Path(output_path)
@@ -277,6 +282,8 @@ class VideoOCREngine:
 
         try:
             # Stage 1-4: 提取关键帧
+            if progress_callback:
+                progress_callback("keyframe_extraction", 0, None)
             keyframes = self.keyframe_extractor.extract(str(video_path), str(temp_dir))
 
             if len(keyframes) == 0:
@@ -290,6 +297,8 @@ class VideoOCREngine:
             results = []
             for idx, kf in enumerate(keyframes):
                 logger.info(f"   处理 {idx+1}/{len(keyframes)}: {Path(kf.image_path).name}")
+                if progress_callback:
+                    progress_callback("keyframe_ocr", idx, len(keyframes))
 
                 try:
                     # 调用 OCR 引擎
@@ -328,6 +337,9 @@ class VideoOCREngine:
                         }
                     )
 
+            if progress_callback:
+                progress_callback("keyframe_ocr", len(keyframes), len(keyframes))
+
             # Stage 6: 文本去重
             logger.info("🔄 Stage 6: 文本去重...")
             unique_results = self._deduplicate_text(results)
@@ -10,7 +10,7 @@
 
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 from threading import Lock
 from loguru import logger
 import subprocess
@@ -234,6 +234,8 @@ class VideoProcessingEngine:
         enable_keyframe_ocr: bool = False,
         ocr_backend: str = "paddleocr-vl",
         keep_keyframes: bool = False,
+        progress_callback: Optional[Callable] = None,
+        audio_path: Optional[str] = None,
         **kwargs,
     ) -> Dict[str, Any]:
         """
@@ -248,6 +250,8 @@ class VideoProcessingEngine:
             enable_keyframe_ocr: 是否启用关键帧OCR（默认False，仅音频转写）
             ocr_backend: OCR引擎（paddleocr-vl）
             keep_keyframes: 是否保留关键帧图像
+            progress_callback: 进度回调 callback(stage, done, total)（可选）
+            audio_path: 已提取的音频文件（可选，调用方已提前提取时跳过步骤 1）
             **kwargs: 其他参数
 
         Returns:
@@ -267,13 +271,20 @@ class VideoProcessingEngine:
             logger.info("📥 Step 1/3: Extracting audio from video...")
             logger.info("=" * 60)
 
-            audio_path = self.extract_audio(video_path=str(video_path), audio_format="wav")
+            if audio_path is None:
+                if progress_callback:
+                    progress_callback("extract_audio", 0, None)
+                audio_path = self.extract_audio(video_path=str(video_path), audio_format="wav")
+            else:
+                logger.info(f"   Using pre-extracted audio: {Path(audio_path).name}")
 
             # 步骤 2: 音频转文字
             logger.info("=" * 60)
             logger.info("📝 Step 2/3: Transcribing audio...")
             logger.info("=" * 60)
 
+            if progress_callback:
+                progress_callback("transcription", 0, None)
             audio_engine = self._load_audio_engine()
 
             # 使用 SenseVoice 进行语音识别
@@ -293,7 +304,9 @@ class VideoProcessingEngine:
 
                     ocr_engine = VideoOCREngine(ocr_backend=ocr_backend, keep_keyframes=keep_keyframes)
 
-                    keyframe_result = ocr_engine.process(video_path=str(video_path), output_path=str(output_path))
+                    keyframe_result = ocr_engine.process(
+                        video_path=str(video_path), output_path=str(output_path), progress_callback=progress_callback
+                    )
 
                     logger.info(f"✅ Extracted {keyframe_result['total_keyframes']} keyframes")
 
@@ -302,6 +315,8 @@ class VideoProcessingEngine:
                     logger.debug("Continuing with audio transcription only...")
 
             # 步骤 4: 合并结果
+            if progress_callback:
+                progress_callback("merge", 0, None)
             logger.info("=" * 60)
             logger.info("📊 Step 4: Merging results...")
             logger.info("=" * 60)
@@ -9,6 +9,7 @@ import type {
   TaskListResponse,
   ApiResponse,
   TaskStatus,
+  TaskEvent,
 } from './types'
 
 /**
@@ -83,6 +84,49 @@ export async function getTaskStatus(
   return response.data
 }
 
+/**
+ * 订阅任务状态推送（WebSocket）
+ *
+ * 先推送每个任务的当前状态，之后推送状态变化和进度更新，所有任务结束后推送 end 并关闭连接。
+ * onClose 的参数表示是否正常结束（收到 end），连接失败或中断时为 false，调用方应退回轮询。
+ */
+export function subscribeTaskEvents(
+  taskIds: string[],
+  onEvent: (event: TaskEvent) => void,
+  onClose?: (ended: boolean) => void
+): () => void {
+  const baseURL = (apiClient.defaults.baseURL || window.location.origin).replace(/^http/, 'ws')
+  const params = new URLSearchParams({ task_ids: taskIds.join(',') })
+  const token = localStorage.getItem('auth_token')
+  if (token) {
+    params.set('token', token)
+  }
+
+  let ended = false
+  let socket: WebSocket
+  try {
+    socket = new WebSocket(`${baseURL}/api/v1/task-events/ws?${params}`)
+  } catch (err) {
+    console.error('订阅任务状态失败:', err)
+    onClose?.(false)
+    return () => {}
+  }
+
+  socket.onmessage = (message) => {
+    const event = JSON.parse(message.data) as TaskEvent
+    if (event.event === 'end') {
+      ended = true
+    }
+    onEvent(event)
+  }
+  socket.onclose = () => onClose?.(ended)
+
+  return () => {
+    socket.onclose = null
+    socket.close()
+  }
+}
+
 /**
  * 取消任务
  */
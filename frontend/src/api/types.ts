@@ -151,6 +151,40 @@ export interface Task {
     json_content?: any
     json_available?: boolean
   } | null
+  progress?: TaskProgress | null
+}
+
+// 任务处理进度
+export interface TaskProgress {
+  stage: string
+  done: number
+  total: number | null
+  percent: number | null
+  eta_seconds: number | null
+  updated_at: string
+  stages: {
+    stage: string
+    done: number
+    total: number | null
+    started_at: string
+    duration_seconds: number
+  }[]
+}
+
+// 任务状态推送事件（/api/v1/task-events/ws）
+export interface TaskEvent {
+  event: 'status' | 'progress' | 'ping' | 'end' | 'error'
+  data?: {
+    task_id?: string
+    status?: TaskStatus
+    stage?: string
+    done?: number
+    total?: number | null
+    error_message?: string | null
+    updated_at?: string
+    tasks?: Record<string, TaskStatus>
+  } | null
+  detail?: string
 }
 
 // 任务提交响应
@@ -211,6 +245,7 @@ export interface TaskListResponse {
   success: boolean
   count: number
   tasks: Task[]
+  next_cursor?: string | null
 }
 
 // 通用响应
@@ -158,7 +158,10 @@ export const useTaskStore = defineStore('task', () => {
   }
 
   /**
-   * 轮询任务状态
+   * 跟踪任务状态直到结束
+   *
+   * 优先订阅服务端推送：状态变化时立即重新获取任务详情，进度更新最多每 interval 毫秒刷新一次；
+   * 推送不可用或连接中断时退回按 interval 轮询
    */
   function pollTaskStatus(
     taskId: string,
@@ -168,22 +171,29 @@ export const useTaskStore = defineStore('task', () => {
   ): () => void {
     let timerId: number | null = null
     let stopped = false
+    let unsubscribe: (() => void) | null = null
+
+    const isFinished = (status: TaskStatus) =>
+      status === 'completed' || status === 'failed' || status === 'cancelled'
+
+    const refresh = async () => {
+      const response = await fetchTaskStatus(taskId, false, format)
+
+      if (onUpdate && currentTask.value) {
+        onUpdate(currentTask.value)
+      }
+
+      // 如果任务完成或失败，停止跟踪
+      if (isFinished(response.status)) {
+        stopped = true
+      }
+    }
 
     const poll = async () => {
       if (stopped) return
 
       try {
-        const response = await fetchTaskStatus(taskId, false, format)
-
-        if (onUpdate && currentTask.value) {
-          onUpdate(currentTask.value)
-        }
-
-        // 如果任务完成或失败，停止轮询
-        if (response.status === 'completed' || response.status === 'failed' || response.status === 'cancelled') {
-          stopped = true
-          return
-        }
+        await refresh()
 
         // 继续轮询
         if (!stopped) {
@@ -196,17 +206,46 @@ export const useTaskStore = defineStore('task', () => {
       }
     }
 
-    // 开始轮询
-    poll()
-
-    // 返回停止函数
-    return () => {
+    const stop = () => {
       stopped = true
       if (timerId) {
         clearTimeout(timerId)
         timerId = null
       }
+      if (unsubscribe) {
+        unsubscribe()
+        unsubscribe = null
+      }
     }
+
+    // 订阅状态推送
+    unsubscribe = taskApi.subscribeTaskEvents(
+      [taskId],
+      (event) => {
+        if (stopped) return
+
+        if (event.event === 'status' && event.data?.status !== currentTask.value?.status) {
+          refresh().catch((err) => console.error('获取任务状态失败:', err))
+        } else if (event.event === 'progress' && !timerId) {
+          timerId = window.setTimeout(() => {
+            timerId = null
+            if (!stopped) {
+              refresh().catch((err) => console.error('获取任务状态失败:', err))
+            }
+          }, interval)
+        }
+      },
+      (ended) => {
+        unsubscribe = null
+        // 推送不可用或中断，退回轮询
+        if (!ended && !stopped) {
+          poll()
+        }
+      }
+    )
+
+    // 返回停止函数
+    return stop
   }
 
   /**